@@ -0,0 +1,116 @@
+"""
+Buffered recording and display of User Activity.
+
+Activities are collected in memory as they happen and inserted in
+batches, once ``ACTIVITY_BUFFER_SIZE`` have been collected or the oldest
+has been waiting for ``ACTIVITY_FLUSH_INTERVAL`` seconds. The buffer is
+checked at the end of each request by ``ActivityMiddleware`` and flushed
+when the process exits.
+"""
+import atexit
+import datetime
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import reverse
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.template.defaultfilters import slugify
+
+from soclone.models import Activity, Award, Badge
+from soclone.utils.buffer import BatchBuffer
+
+_buffer = BatchBuffer(settings.ACTIVITY_BUFFER_SIZE,
+                      settings.ACTIVITY_FLUSH_INTERVAL)
+
+def record(activity_type, user_id, obj, question_id=None, occurred_at=None):
+    """
+    Records that a User performed an Activity involving the given object,
+    which relates to the Question with the given id, if any.
+    """
+    if occurred_at is None:
+        occurred_at = datetime.datetime.now()
+    _buffer.append((user_id, question_id, activity_type,
+                    ContentType.objects.get_for_model(obj).id, obj.id,
+                    occurred_at))
+
+def flush(force=False):
+    """
+    Inserts buffered Activities if the buffer is full or old enough, or
+    if ``force`` is ``True``.
+    """
+    rows = _buffer.take(force)
+    if rows:
+        Activity.objects.insert_many(rows)
+
+atexit.register(flush, True)
+
+def record_award(instance, created=False, **kwargs):
+    """Records the awarding of a Badge as an Activity."""
+    if kwargs.get('raw', False) or not created:
+        return
+    record(Activity.AWARDED, instance.user_id, instance.badge,
+           occurred_at=instance.awarded_at)
+
+post_save.connect(record_award, sender=Award)
+
+def get_timeline(activities, before=None, count=None, viewer=None):
+    """
+    Retrieves a page of Activities from the given queryset, newest first,
+    starting after the Activity with the id given as ``before``.
+
+    Votes are private, so they're only included when they were cast by
+    the User given as ``viewer``.
+
+    Returns a two-tuple of a list of dicts describing each Activity and
+    the id to use as ``before`` to get the next page, or ``None`` if this
+    is the last page.
+    """
+    if count is None:
+        count = settings.ACTIVITY_PAGE_SIZE
+    if before is not None:
+        activities = activities.filter(id__lt=before)
+    if viewer is not None and viewer.is_authenticated():
+        activities = activities.filter(~Q(type=Activity.VOTED) |
+                                       Q(user=viewer.id))
+    else:
+        activities = activities.exclude(type=Activity.VOTED)
+    rows = list(activities.order_by('-id').values('id', 'type', 'user__id',
+        'user__username', 'question__id', 'question__title', 'object_id',
+        'occurred_at')[:count + 1])
+    next_before = None
+    if len(rows) > count:
+        rows = rows[:count]
+        next_before = rows[-1]['id']
+
+    badges = Badge.objects.in_bulk([row['object_id'] for row in rows
+                                    if row['type'] == Activity.AWARDED])
+    types = dict(Activity.TYPE_CHOICES)
+    timeline = []
+    for row in rows:
+        item = {
+            'id': row['id'],
+            'type': types[row['type']],
+            'username': row['user__username'],
+            'user_url': '%s%s/' % (reverse('user', args=[row['user__id']]),
+                                   row['user__username']),
+            'occurred_at': row['occurred_at'],
+        }
+        if row['type'] == Activity.AWARDED:
+            badge = badges.get(row['object_id'])
+            if badge is None:
+                continue
+            item['title'] = badge.name
+            item['url'] = badge.get_absolute_url()
+        elif row['question__id'] is not None:
+            item['title'] = row['question__title']
+            if row['type'] == Activity.ANSWERED:
+                item['url'] = reverse('answer', args=[row['object_id']])
+            else:
+                item['url'] = '%s%s/' % (
+                    reverse('question', args=[row['question__id']]),
+                    slugify(row['question__title']))
+        else:
+            continue
+        timeline.append(item)
+    return timeline, next_before
@@ -0,0 +1,303 @@
+"""
+A read-only JSON API for Questions, Answers, Tags and Users.
+
+Lists are paged with keyset cursors rather than page numbers - each
+response includes a ``next`` cursor which can be passed back as ``after``
+to get the following page, so deep pages cost the same as the first.
+
+The fields included for each item can be selected with a comma-separated
+``fields`` parameter. Rows are fetched with ``values()`` for only the
+fields needed, and whole responses are cached for ``API_CACHE_TIMEOUT``
+seconds, as they're the same for everyone.
+"""
+import base64
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from soclone.http import fast_dumps
+from soclone.models import Answer, Question, Tag
+from soclone.questions import OrderedQuestionView, all_question_views
+
+class ApiError(Exception):
+    """A problem with an API request, reported with the given status."""
+    def __init__(self, message, status=400):
+        super(ApiError, self).__init__(message)
+        self.message = message
+        self.status = status
+
+def api_response(view):
+    """
+    Decorates an API view which returns a dict, caching its serialised
+    response and reporting any ``ApiError`` it raises.
+    """
+    def wrapped(request, *args, **kwargs):
+        key = 'api:%s' % hashlib.md5(request.get_full_path()).hexdigest()
+        if settings.API_CACHE_TIMEOUT:
+            content = cache.get(key)
+            if content is not None:
+                return HttpResponse(content, mimetype='application/json')
+        try:
+            content = fast_dumps(view(request, *args, **kwargs))
+        except ApiError, e:
+            response = HttpResponse(fast_dumps({'error': e.message}),
+                                    mimetype='application/json')
+            response.status_code = e.status
+            return response
+        if settings.API_CACHE_TIMEOUT:
+            cache.set(key, content, settings.API_CACHE_TIMEOUT)
+        return HttpResponse(content, mimetype='application/json')
+    wrapped.__name__ = view.__name__
+    wrapped.__doc__ = view.__doc__
+    return wrapped
+
+#############
+# Resources #
+#############
+
+def _tag_list(tagnames):
+    return tagnames.split()
+
+class Resource(object):
+    """
+    Describes the fields which can be retrieved for a type of item, as a
+    dict mapping API field names to ``values()`` lookups, along with any
+    functions to convert retrieved values for display, keyed by API field
+    name.
+    """
+    def __init__(self, fields, default_fields, converters=None):
+        self.fields = fields
+        self.default_fields = default_fields
+        self.converters = converters or {}
+
+    def select_fields(self, request, param='fields'):
+        """
+        Determines the API field names requested with the given parameter,
+        falling back to the default fields.
+        """
+        names = [name for name in request.GET.get(param, '').split(',')
+                 if name]
+        if not names:
+            return self.default_fields
+        for name in names:
+            if name not in self.fields:
+                raise ApiError(u'Unknown field: %s' % name)
+        return names
+
+    def lookups(self, names):
+        return [self.fields[name] for name in names]
+
+    def to_dict(self, row, names):
+        """Converts a ``values()`` row to an API item dict."""
+        item = {}
+        for name in names:
+            value = row[self.fields[name]]
+            if name in self.converters:
+                value = self.converters[name](value)
+            elif isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            item[name] = value
+        return item
+
+question_resource = Resource({
+    'id': 'id',
+    'title': 'title',
+    'tags': 'tagnames',
+    'author_id': 'author__id',
+    'author': 'author__username',
+    'added_at': 'added_at',
+    'score': 'score',
+    'answer_count': 'answer_count',
+    'comment_count': 'comment_count',
+    'favourite_count': 'favourite_count',
+    'view_count': 'view_count',
+    'answer_accepted': 'answer_accepted',
+    'wiki': 'wiki',
+    'closed': 'closed',
+    'last_edited_at': 'last_edited_at',
+    'last_activity_at': 'last_activity_at',
+    'summary': 'summary',
+    'body': 'html',
+}, ('id', 'title', 'tags', 'author', 'added_at', 'score', 'answer_count',
+    'last_activity_at'), {'tags': _tag_list})
+
+answer_resource = Resource({
+    'id': 'id',
+    'author_id': 'author__id',
+    'author': 'author__username',
+    'added_at': 'added_at',
+    'score': 'score',
+    'comment_count': 'comment_count',
+    'accepted': 'accepted',
+    'wiki': 'wiki',
+    'last_edited_at': 'last_edited_at',
+    'body': 'html',
+}, ('id', 'author', 'added_at', 'score', 'accepted', 'body'))
+
+tag_resource = Resource({
+    'id': 'id',
+    'name': 'name',
+    'use_count': 'use_count',
+}, ('name', 'use_count'))
+
+user_resource = Resource({
+    'id': 'id',
+    'username': 'username',
+    'reputation': 'reputation',
+    'gold': 'gold',
+    'silver': 'silver',
+    'bronze': 'bronze',
+    'gravatar': 'gravatar',
+    'date_joined': 'date_joined',
+    'last_seen': 'last_seen',
+    'real_name': 'real_name',
+    'website': 'website',
+    'location': 'location',
+    'about': 'about',
+}, ('id', 'username', 'reputation', 'gold', 'silver', 'bronze'))
+
+##########
+# Paging #
+##########
+
+def encode_cursor(values):
+    """
+    Encodes the ordering values of the last item on a page as a cursor.
+
+    >>> encode_cursor([5, u'2008-10-01 12:00:00', 42])
+    'NQoyMDA4LTEwLTAxIDEyOjAwOjAwCjQy'
+    """
+    return base64.urlsafe_b64encode('\n'.join([
+        unicode(value).encode('utf-8') for value in values]))
+
+def decode_cursor(cursor, count):
+    """
+    Decodes a cursor holding the given number of values.
+
+    >>> decode_cursor('NQoyMDA4LTEwLTAxIDEyOjAwOjAwCjQy', 3)
+    ['5', '2008-10-01 12:00:00', '42']
+    """
+    try:
+        values = base64.urlsafe_b64decode(str(cursor)).split('\n')
+    except (TypeError, UnicodeError):
+        raise ApiError(u'Invalid cursor')
+    if len(values) != count:
+        raise ApiError(u'Invalid cursor')
+    return values
+
+def get_count(request):
+    try:
+        count = int(request.GET.get('count', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError(u'Invalid count')
+    return max(1, min(count, settings.API_MAX_PAGE_SIZE))
+
+def keyset_page(request, queryset, ordering, resource, names):
+    """
+    Retrieves a page of items from a QuerySet in the given order, which
+    must end with a unique field, starting after the cursor given in the
+    request, if any.
+
+    Returns a two-tuple of a list of item dicts and the cursor for the
+    next page, which is ``None`` if this is the last page.
+    """
+    opts = queryset.model._meta
+    fields = [field.lstrip('-') for field in ordering]
+    columns = ['%s.%s' % (opts.db_table, opts.get_field(field).column)
+               for field in fields]
+    if 'after' in request.GET:
+        values = decode_cursor(request.GET['after'], len(fields))
+        # (a, b) after (x, y) in descending order is (a < x) OR
+        # (a = x AND b < y), and so on.
+        conditions = []
+        params = []
+        for i in xrange(len(fields)):
+            parts = ['%s = %%s' % column for column in columns[:i]]
+            parts.append('%s %s %%s' % (columns[i],
+                         ordering[i].startswith('-') and '<' or '>'))
+            conditions.append('(%s)' % ' AND '.join(parts))
+            params.extend(values[:i + 1])
+        queryset = queryset.extra(where=['(%s)' % ' OR '.join(conditions)],
+                                  params=params)
+    count = get_count(request)
+    lookups = resource.lookups(names)
+    rows = list(queryset.order_by(*ordering).values(
+        *(lookups + [field for field in fields if field not in lookups]))[
+        :count + 1])
+    next_cursor = None
+    if len(rows) > count:
+        rows = rows[:count]
+        next_cursor = encode_cursor([rows[-1][field] for field in fields])
+    return [resource.to_dict(row, names) for row in rows], next_cursor
+
+#########
+# Views #
+#########
+
+QUESTION_LIST_VIEWS = dict([(view.id, view) for view in all_question_views
+                            if isinstance(view, OrderedQuestionView)])
+
+@api_response
+def questions(request):
+    """
+    Lists Questions in the order of any of the ordered Question list
+    views, optionally restricted to those with a given Tag.
+    """
+    view = QUESTION_LIST_VIEWS.get(request.GET.get('sort', 'newest'))
+    if view is None:
+        raise ApiError(u'Unknown sort: %s' % request.GET['sort'])
+    queryset = view.get_queryset()
+    if 'tagged' in request.GET:
+        queryset = queryset.filter(tags__name=request.GET['tagged'])
+    names = question_resource.select_fields(request)
+    items, next_cursor = keyset_page(request, queryset,
+        view.ordering + ('-id',), question_resource, names)
+    return {'questions': items, 'next': next_cursor}
+
+@api_response
+def question(request, question_id):
+    """Retrieves a Question and its Answers."""
+    names = question_resource.select_fields(request)
+    rows = list(Question.objects.filter(id=question_id).extra(
+        where=['NOT soclone_question.deleted']).values(
+        *question_resource.lookups(names)))
+    if not rows:
+        raise ApiError(u'Question not found', status=404)
+    item = question_resource.to_dict(rows[0], names)
+    answer_names = answer_resource.select_fields(request, 'answer_fields')
+    item['answers'] = [answer_resource.to_dict(row, answer_names)
+                       for row in Answer.objects.filter(question=question_id
+                           ).extra(where=['NOT soclone_answer.deleted']
+                           ).order_by('-score', 'id').values(
+                           *answer_resource.lookups(answer_names))]
+    return {'question': item}
+
+@api_response
+def tags(request):
+    """Lists Tags, most used first."""
+    names = tag_resource.select_fields(request)
+    items, next_cursor = keyset_page(request, Tag.objects.all(),
+        ('-use_count', '-id'), tag_resource, names)
+    return {'tags': items, 'next': next_cursor}
+
+@api_response
+def users(request):
+    """Lists Users, highest reputation first."""
+    names = user_resource.select_fields(request)
+    items, next_cursor = keyset_page(request, User.objects.all(),
+        ('-reputation', '-id'), user_resource, names)
+    return {'users': items, 'next': next_cursor}
+
+@api_response
+def user(request, user_id):
+    """Retrieves a User."""
+    names = user_resource.select_fields(request)
+    rows = list(User.objects.filter(id=user_id).values(
+        *user_resource.lookups(names)))
+    if not rows:
+        raise ApiError(u'User not found', status=404)
+    return {'user': user_resource.to_dict(rows[0], names)}
@@ -17,6 +17,7 @@ DELETE_COMMENTS           = 2000
 VIEW_OFFENSIVE_FLAGS      = 2000
 CLOSE_OTHER_QUESTIONS     = 3000
 LOCK_POSTS                = 4000
+DELETE_OTHER_POSTS        = 10000
 
 def can_vote_up(user):
     """Determines if a User can vote Questions and Answers up."""
@@ -76,8 +77,25 @@ def can_close_question(user, question):
         user.reputation >= CLOSE_OTHER_QUESTIONS or
         user.is_superuser)
 
+def can_accept_answer(user, question):
+    """
+    Determines if a User can accept an Answer to the given Question.
+    """
+    return user.is_authenticated() and user.id == question.author_id
+
+def can_delete_post(user, post):
+    """Determines if a User can delete or undelete a Question or Answer."""
+    return user.is_authenticated() and (
+        user.id == post.author_id or
+        user.reputation >= DELETE_OTHER_POSTS or
+        user.is_superuser)
+
 def can_lock_posts(user):
     """Determines if a User can lock Questions or Answers."""
     return user.is_authenticated() and (
         user.reputation >= LOCK_POSTS or
         user.is_superuser)
+
+def can_view_profiles(user):
+    """Determines if a User can view profiles of requests."""
+    return user.is_authenticated() and (user.is_staff or user.is_superuser)
@@ -0,0 +1,66 @@
+"""
+Measures the throughput of the JSON API in-process with Django's test
+Client, with and without response caching, alongside serialising the same
+Questions with Django's serializer as ``JsonResponse`` views do.
+
+Usage: benchmark-api.py [requests]
+
+Run create-benchmark-corpus.py first to have something to retrieve.
+"""
+import cgi
+import sys
+import time
+
+from django.conf import settings
+from django.test.client import Client
+from django.utils import simplejson
+
+from soclone.http import JsonResponse
+from soclone.models import Question
+
+request_count = 200
+if len(sys.argv) > 1:
+    request_count = int(sys.argv[1])
+
+client = Client()
+question_id = Question.objects.filter(deleted=False).values_list('id',
+                                                                 flat=True)[0]
+next_cursor = simplejson.loads(client.get('/api/1/questions/').content)['next']
+paths = [
+    '/api/1/questions/',
+    '/api/1/questions/?sort=votes&fields=id,title,score',
+    '/api/1/questions/?tagged=python',
+    '/api/1/questions/%s/' % question_id,
+    '/api/1/tags/',
+    '/api/1/users/',
+]
+if next_cursor is not None:
+    paths.append('/api/1/questions/?after=%s' % next_cursor)
+
+def serialised_questions():
+    questions = Question.objects.filter(deleted=False).order_by('-added_at')
+    return JsonResponse(questions[:settings.API_PAGE_SIZE])
+
+def time_requests(get):
+    started_at = time.time()
+    for i in xrange(request_count):
+        get()
+    elapsed = time.time() - started_at
+    return request_count / elapsed, elapsed * 1000 / request_count
+
+def report(name, get):
+    rate, latency = time_requests(get)
+    print '%-60s %8.1f/s %8.3fms' % (name, rate, latency)
+
+print '%s requests each' % request_count
+cache_timeout = settings.API_CACHE_TIMEOUT
+for cached in (False, True):
+    settings.API_CACHE_TIMEOUT = cached and (cache_timeout or 60) or 0
+    print cached and 'Cached:' or 'Uncached:'
+    for path in paths:
+        url, query = (path.split('?', 1) + [''])[:2]
+        data = dict(cgi.parse_qsl(query))
+        report(path[:60], lambda: client.get(url, data))
+settings.API_CACHE_TIMEOUT = cache_timeout
+print 'Serializer:'
+report('JsonResponse(QuerySet)', serialised_questions)
@@ -0,0 +1,73 @@
+"""
+Compares the time taken to handle simulated requests which each run a
+query, when opening a database connection per request as Django does by
+default, and when checking connections out of a pool.
+
+Usage: benchmark-connections.py [requests] [threads]
+
+Pooling can't be used with SQLite, as its connections can't be shared by
+threads.
+"""
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from soclone import pool
+
+request_count = 1000
+thread_count = 10
+if len(sys.argv) > 1:
+    request_count = int(sys.argv[1])
+if len(sys.argv) > 2:
+    thread_count = int(sys.argv[2])
+requests_per_thread = max(request_count // thread_count, 1)
+
+connection_pool = pool.ConnectionPool(pool.open_connection,
+    settings.DATABASE_POOL_SIZE or thread_count,
+    timeout=settings.DATABASE_POOL_TIMEOUT,
+    max_age=settings.DATABASE_POOL_MAX_AGE,
+    check_idle=settings.DATABASE_POOL_CHECK_IDLE)
+
+def query():
+    cursor = connection.cursor()
+    cursor.execute('SELECT 1')
+    cursor.fetchall()
+
+def per_request_connection():
+    query()
+    connection.close()
+
+def pooled_connection():
+    connection.connection = connection_pool.checkout()
+    query()
+    conn = connection.connection
+    connection.connection = None
+    connection_pool.checkin(conn)
+
+def run(simulate_request):
+    def simulate_requests():
+        for i in xrange(requests_per_thread):
+            simulate_request()
+    threads = [threading.Thread(target=simulate_requests)
+               for i in xrange(thread_count)]
+    started_at = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.time() - started_at
+
+print '%s requests in %s threads' % (requests_per_thread * thread_count,
+                                     thread_count)
+for name, simulate_request in (('per-request', per_request_connection),
+                               ('pooled', pooled_connection)):
+    elapsed = run(simulate_request)
+    print '%-12s %8.3fs %8.3fms/request' % (name, elapsed,
+        elapsed * 1000 / (requests_per_thread * thread_count))
+connection_pool.close_idle()
+
+for stat, value in sorted(connection_pool.stats.items()):
+    print '%-14s %s' % (stat, value)
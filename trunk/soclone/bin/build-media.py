@@ -0,0 +1,56 @@
+"""
+Builds the JavaScript and CSS bundles defined in MEDIA_BUNDLES, with
+fingerprinted filenames and precompressed copies, and writes a manifest
+of their filenames for the bundle template tag.
+"""
+import gzip
+import hashlib
+import os
+
+from django.conf import settings
+from django.utils import simplejson
+
+from soclone import bundles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def write(path, contents):
+    f = open(path, 'wb')
+    try:
+        f.write(contents)
+    finally:
+        f.close()
+
+bundle_root = os.path.join(settings.MEDIA_ROOT, bundles.BUNDLE_DIR)
+if not os.path.isdir(bundle_root):
+    os.makedirs(bundle_root)
+
+manifest = {}
+for name, files in sorted(settings.MEDIA_BUNDLES.items()):
+    contents = bundles.build_bundle(name, files, settings.MEDIA_ROOT)
+    base, extension = os.path.splitext(name)
+    filename = '%s.%s%s' % (base, hashlib.md5(contents).hexdigest()[:12],
+                            extension)
+    path = os.path.join(bundle_root, filename)
+    write(path, contents)
+    f = gzip.open('%s.gz' % path, 'wb', 9)
+    try:
+        f.write(contents)
+    finally:
+        f.close()
+    if brotli is not None:
+        write('%s.br' % path, brotli.compress(contents))
+    manifest[name] = filename
+    print '%s -> %s (%s bytes)' % (name, filename, len(contents))
+
+# Running processes reload the manifest periodically, so replace it in one
+# go to ensure they never read it half-written. Renaming over an existing
+# file fails on Windows, so it's removed first there.
+manifest_path = os.path.join(bundle_root, bundles.MANIFEST_FILENAME)
+write('%s.tmp' % manifest_path, simplejson.dumps(manifest))
+if os.name == 'nt' and os.path.exists(manifest_path):
+    os.remove(manifest_path)
+os.rename('%s.tmp' % manifest_path, manifest_path)
@@ -0,0 +1,17 @@
+"""
+Brings the sitemaps in SITEMAP_ROOT up to date, rewriting only the shards
+whose Questions have changed since the last run.
+
+Usage: build-sitemaps.py [--force]
+
+With --force, every shard is rewritten.
+"""
+import sys
+
+from soclone import sitemaps
+
+def log(message):
+    print message
+
+written = sitemaps.build(force='--force' in sys.argv[1:], log=log)
+print '%s shard(s) written' % len(written)
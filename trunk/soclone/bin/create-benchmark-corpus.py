@@ -0,0 +1,141 @@
+"""
+Fills the database with generated Users, Questions, Answers, Comments and
+Votes to benchmark against.
+
+Usage: create-benchmark-corpus.py [questions] [users] [password]
+
+Users are named ``benchmark-user-N`` and all share the given password,
+which defaults to ``benchmark``, so benchmarks can log in as them. They're
+given enough reputation to vote, comment and edit any Answer.
+"""
+import datetime
+import random
+import sys
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from soclone import auth
+from soclone.models import (Answer, AnswerRevision, Comment, Question,
+    QuestionRevision, Vote)
+
+question_count = 1000
+user_count = 100
+password = 'benchmark'
+if len(sys.argv) > 1:
+    question_count = int(sys.argv[1])
+if len(sys.argv) > 2:
+    user_count = int(sys.argv[2])
+if len(sys.argv) > 3:
+    password = sys.argv[3]
+
+TAGNAMES = ('python', 'django', 'java', 'c#', '.net', 'javascript',
+            'jquery', 'sql', 'postgresql', 'mysql', 'linux', 'regex', 'css',
+            'html', 'performance', 'algorithm', 'unicode', 'http', 'git')
+WORDS = ('how', 'do', 'I', 'get', 'the', 'list', 'of', 'files', 'in', 'a',
+         'directory', 'parse', 'date', 'string', 'query', 'faster', 'with',
+         'without', 'using', 'when', 'why', 'does', 'my', 'loop', 'fail',
+         'return', 'value', 'from', 'function', 'class', 'object', 'error')
+
+_random = random.Random(1234)
+
+def sentence(length):
+    return u' '.join([_random.choice(WORDS) for i in xrange(length)])
+
+def paragraphs(count):
+    return u''.join([u'<p>%s.</p>' % sentence(_random.randint(10, 40))
+                     for i in xrange(count)])
+
+def get_or_create_user(i):
+    username = 'benchmark-user-%s' % i
+    try:
+        return User.objects.get(username=username)
+    except User.DoesNotExist:
+        user = User.objects.create_user(username,
+            '%s@example.com' % username, password)
+        user.reputation = auth.EDIT_OTHER_POSTS
+        user.save()
+        return user
+
+def create_question(users, added_at):
+    author = _random.choice(users)
+    html = paragraphs(_random.randint(1, 4))
+    question = Question(
+        title            = sentence(_random.randint(4, 12)).capitalize() + u'?',
+        author           = author,
+        added_at         = added_at,
+        last_activity_at = added_at,
+        last_activity_by = author,
+        tagnames         = u' '.join(_random.sample(TAGNAMES,
+                                                    _random.randint(1, 5))),
+        html             = html,
+        summary          = html[3:183],
+    )
+    question.save()
+    QuestionRevision.objects.create(
+        question   = question,
+        revision   = 1,
+        title      = question.title,
+        author     = author,
+        revised_at = added_at,
+        tagnames   = question.tagnames,
+        summary    = u'asked question',
+        text       = html,
+    )
+    return question
+
+def create_answer(question, users, added_at):
+    author = _random.choice(users)
+    answer = Answer.objects.create(
+        question = question,
+        author   = author,
+        added_at = added_at,
+        html     = paragraphs(_random.randint(1, 3)),
+    )
+    AnswerRevision.objects.create(
+        answer     = answer,
+        revision   = 1,
+        author     = author,
+        revised_at = added_at,
+        summary    = u'added answer',
+        text       = answer.html,
+    )
+    Question.objects.adjust_answer_count(question.id, 1)
+    return answer
+
+def add_feedback(post, users, added_at):
+    content_type = ContentType.objects.get_for_model(post)
+    for user in _random.sample(users, _random.randint(0, min(5, len(users)))):
+        Vote.objects.create(content_type=content_type, object_id=post.id,
+            user=user, vote=_random.choice((Vote.VOTE_UP, Vote.VOTE_UP,
+                                            Vote.VOTE_DOWN)))
+    for i in xrange(_random.randint(0, 2)):
+        Comment.objects.create(content_type=content_type, object_id=post.id,
+            user=_random.choice(users), comment=sentence(12),
+            added_at=added_at)
+
+def create_corpus():
+    users = [get_or_create_user(i) for i in xrange(user_count)]
+    started_at = datetime.datetime.now() - datetime.timedelta(
+        minutes=question_count * 10)
+    for i in xrange(question_count):
+        added_at = started_at + datetime.timedelta(minutes=i * 10)
+        question = create_question(users, added_at)
+        add_feedback(question, users, added_at)
+        for j in xrange(_random.randint(0, 4)):
+            answer = create_answer(question, users,
+                added_at + datetime.timedelta(minutes=j + 1))
+            add_feedback(answer, users, added_at)
+        transaction.commit()
+        if (i + 1) % 100 == 0:
+            print '%s questions created' % (i + 1)
+
+transaction.enter_transaction_management()
+transaction.managed(True)
+try:
+    create_corpus()
+finally:
+    transaction.rollback()
+    transaction.leave_transaction_management()
+print '%s users and %s questions created' % (user_count, question_count)
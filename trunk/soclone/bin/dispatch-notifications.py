@@ -0,0 +1,9 @@
+"""
+Delivers Notifications for any Awards which Users haven't been notified
+of yet.
+"""
+from django.conf import settings
+
+from soclone import notifications
+
+notifications.dispatch_awards(settings.NOTIFICATION_AWARD_CHUNK_SIZE)
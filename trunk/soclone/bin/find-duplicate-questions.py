@@ -0,0 +1,24 @@
+"""
+Lists clusters of Questions which may be duplicates of each other.
+
+Pass --rebuild to recreate the duplicate detection buckets for every
+Question before searching for clusters.
+"""
+import sys
+
+from django.conf import settings
+
+from soclone.models import DuplicateBucket, Question
+
+if '--rebuild' in sys.argv:
+    DuplicateBucket.objects.rebuild()
+
+clusters = DuplicateBucket.objects.find_clusters(
+    settings.DUPLICATE_MIN_MATCHING_BUCKETS)
+clusters.sort(key=len, reverse=True)
+for ids in clusters:
+    questions = Question.objects.in_bulk(ids)
+    for id in ids:
+        if id in questions:
+            print ('%s\t%s' % (id, questions[id].title)).encode('utf-8')
+    print
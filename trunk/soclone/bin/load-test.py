@@ -0,0 +1,292 @@
+"""
+Drives a running instance with a mix of anonymous page views and changes
+made by Users logged in from the benchmark corpus, ramping up the number
+of concurrent clients until throughput stops improving.
+
+Usage: load-test.py [options]
+
+Run create-benchmark-corpus.py first - Question, Answer and Tag names and
+User names are read from the database, so this must be run with the same
+settings as the instance being tested. Throughput, latency percentiles and
+error rates are reported for each URL name at each level of concurrency.
+"""
+import cookielib
+import optparse
+import random
+import threading
+import time
+import urllib
+import urllib2
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from soclone.models import Answer, Question, Tag
+
+DEFAULT_MIX = 'question=80,list=10,vote=5,comment=3,answer=2'
+
+parser = optparse.OptionParser(usage='%prog [options]')
+parser.add_option('--url', default='http://localhost:8000',
+                  help='address of the instance to test [%default]')
+parser.add_option('--mix', default=DEFAULT_MIX,
+                  help='relative weights of each kind of request [%default]')
+parser.add_option('--duration', type='int', default=30,
+                  help='seconds to run at each level of concurrency [%default]')
+parser.add_option('--max-clients', type='int', default=128,
+                  help='highest number of concurrent clients [%default]')
+parser.add_option('--min-gain', type='float', default=0.05,
+                  help='smallest throughput increase from doubling the '
+                       'clients before the instance is considered to be '
+                       'saturated [%default]')
+parser.add_option('--max-error-rate', type='float', default=0.01,
+                  help='error rate at which the instance is considered to '
+                       'be saturated [%default]')
+parser.add_option('--password', default='benchmark',
+                  help='password of the benchmark Users [%default]')
+options, args = parser.parse_args()
+
+WORDS = ('load', 'test', 'request', 'response', 'latency', 'throughput',
+         'query', 'cache', 'thread', 'connection', 'page', 'answer')
+
+def sentence(length):
+    return ' '.join([random.choice(WORDS) for i in xrange(length)])
+
+question_ids = list(Question.objects.filter(deleted=False).order_by(
+    '-id').values_list('id', flat=True)[:5000])
+answer_ids = list(Answer.objects.filter(deleted=False).order_by(
+    '-id').values_list('id', flat=True)[:5000])
+tag_names = list(Tag.objects.order_by('-use_count').values_list('name',
+                                                               flat=True)[:100])
+usernames = list(User.objects.filter(
+    username__startswith='benchmark-user-').values_list('username',
+                                                        flat=True))
+if not question_ids or not answer_ids or not usernames:
+    parser.error('there is no benchmark corpus - run '
+                 'create-benchmark-corpus.py first')
+
+####################
+# Kinds of request #
+####################
+
+# Each returns a tuple of (URL name, path, POST data or None, whether a
+# logged-in User is needed, whether the request is made with Ajax)
+
+def question_request():
+    return ('question', '/questions/%s/' % random.choice(question_ids),
+            None, False, False)
+
+def list_request():
+    return random.choice((
+        ('index', '/', None, False, False),
+        ('questions', '/questions/', None, False, False),
+        ('questions', '/questions/?sort=votes&page=%s' % random.randint(1, 5),
+         None, False, False),
+        ('unanswered', '/unanswered/', None, False, False),
+        ('tag', '/questions/tagged/%s/' % urllib.quote(
+            random.choice(tag_names).encode('utf-8')), None, False, False),
+    ))
+
+def vote_request():
+    if random.random() < 0.5:
+        return ('vote_on_question', '/questions/%s/vote/' %
+                random.choice(question_ids), {'type': 'up'}, True, True)
+    return ('vote_on_answer', '/answers/%s/vote/' % random.choice(answer_ids),
+            {'type': random.choice(('up', 'up', 'down'))}, True, True)
+
+def comment_request():
+    return ('add_question_comment', '/questions/%s/comment/' %
+            random.choice(question_ids), {'comment': sentence(8)}, True, True)
+
+def answer_request():
+    if random.random() < 0.5:
+        return ('add_answer', '/questions/%s/answer/' %
+                random.choice(question_ids),
+                {'text': sentence(30), 'submit': 'Submit'}, True, False)
+    return ('edit_answer', '/answers/%s/edit/' % random.choice(answer_ids),
+            {'text': sentence(30), 'summary': 'load test',
+             'submit': 'Submit'}, True, False)
+
+REQUESTS = {
+    'question': question_request,
+    'list': list_request,
+    'vote': vote_request,
+    'comment': comment_request,
+    'answer': answer_request,
+}
+
+def parse_mix(mix):
+    """
+    Parses a traffic mix of ``name=weight`` pairs into a list of
+    cumulative weights and request functions.
+    """
+    total = 0
+    weights = []
+    for part in mix.split(','):
+        name, weight = part.split('=')
+        if name not in REQUESTS:
+            parser.error('unknown kind of request: %s' % name)
+        total += float(weight)
+        weights.append((total, REQUESTS[name]))
+    return [(weight / total, function) for weight, function in weights]
+
+mix = parse_mix(options.mix)
+
+def choose_request():
+    r = random.random()
+    for weight, function in mix:
+        if r < weight:
+            return function()
+    return mix[-1][1]()
+
+###########
+# Clients #
+###########
+
+class NoRedirectProcessor(urllib2.HTTPErrorProcessor):
+    """
+    Returns every response as it is, so redirects aren't followed and
+    error statuses don't raise exceptions.
+    """
+    def http_response(self, request, response):
+        return response
+    https_response = http_response
+
+def build_opener(cookies=None):
+    handlers = [NoRedirectProcessor()]
+    if cookies is not None:
+        handlers.append(urllib2.HTTPCookieProcessor(cookies))
+    return urllib2.build_opener(*handlers)
+
+anonymous_opener = build_opener()
+
+def log_in(username):
+    """Logs in as a User, returning an opener which keeps the session."""
+    cookies = cookielib.CookieJar()
+    opener = build_opener(cookies)
+    opener.open(options.url + '/login/').read()
+    opener.open(options.url + '/login/', urllib.urlencode({
+        'username': username,
+        'password': options.password,
+        'next': '/',
+    })).read()
+    if not [cookie for cookie in cookies
+            if cookie.name == settings.AUTH_COOKIE_NAME]:
+        raise Exception('Unable to log in as %s' % username)
+    return opener
+
+class Results(object):
+    """Collects the latency and success of requests by URL name."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, name, latency, error):
+        self.lock.acquire()
+        try:
+            self.latencies.setdefault(name, []).append(latency)
+            if error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        finally:
+            self.lock.release()
+
+    def count(self):
+        return sum([len(latencies) for latencies in self.latencies.values()])
+
+    def error_count(self):
+        return sum(self.errors.values())
+
+def make_request(opener, path, data, ajax):
+    request = urllib2.Request(options.url + path)
+    if data is not None:
+        request.add_data(urllib.urlencode(data))
+    if ajax:
+        request.add_header('X-Requested-With', 'XMLHttpRequest')
+    response = opener.open(request)
+    try:
+        response.read()
+    finally:
+        response.close()
+    return response.code
+
+def client(opener, results, stop_at):
+    while time.time() < stop_at:
+        name, path, data, authenticated, ajax = choose_request()
+        started_at = time.time()
+        try:
+            status = make_request(authenticated and opener or
+                                  anonymous_opener, path, data, ajax)
+            error = status >= 400
+        except (urllib2.URLError, IOError):
+            error = True
+        results.add(name, time.time() - started_at, error)
+
+def percentile(sorted_values, p):
+    """
+    Finds the value at the given percentile with the nearest-rank method.
+
+    >>> percentile([1, 2, 3, 4], 50)
+    2
+    """
+    index = max(int(round(p / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[index]
+
+def report(results, elapsed):
+    print '%-22s %8s %8s %8s %8s %8s %8s' % ('name', 'req/s', 'errors',
+                                             'p50 ms', 'p90 ms', 'p99 ms',
+                                             'max ms')
+    for name in sorted(results.latencies):
+        latencies = sorted(results.latencies[name])
+        print '%-22s %8.1f %7.2f%% %8.1f %8.1f %8.1f %8.1f' % (name,
+            len(latencies) / elapsed,
+            100.0 * results.errors.get(name, 0) / len(latencies),
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 90) * 1000,
+            percentile(latencies, 99) * 1000,
+            latencies[-1] * 1000)
+
+def run(openers):
+    results = Results()
+    started_at = time.time()
+    stop_at = started_at + options.duration
+    threads = [threading.Thread(target=client, args=(opener, results,
+                                                     stop_at))
+               for opener in openers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.time() - started_at
+
+openers = []
+best = None
+client_count = 1
+while client_count <= options.max_clients:
+    # Each client is logged in as its own User, reusing those logged in
+    # for lower levels of concurrency
+    while len(openers) < client_count:
+        openers.append(log_in(usernames[len(openers) % len(usernames)]))
+    results, elapsed = run(openers[:client_count])
+    throughput = results.count() / elapsed
+    error_rate = results.error_count() / float(max(results.count(), 1))
+    print
+    print '%s client(s): %.1f requests/s, %.2f%% errors' % (client_count,
+        throughput, error_rate * 100)
+    report(results, elapsed)
+    if error_rate > options.max_error_rate:
+        print
+        print 'Saturated at %s client(s): error rate exceeded %.2f%%' % (
+            client_count, options.max_error_rate * 100)
+        break
+    if best is not None and throughput < best[1] * (1 + options.min_gain):
+        print
+        print ('Saturated at %s client(s): %.1f requests/s, no better than '
+               '%.1f requests/s with %s client(s)' % (client_count,
+               throughput, best[1], best[0]))
+        break
+    if best is None or throughput > best[1]:
+        best = (client_count, throughput)
+    client_count *= 2
+else:
+    print
+    print 'Not saturated with %s client(s)' % options.max_clients
@@ -0,0 +1,17 @@
+"""
+Merges one Tag into another, making the first Tag's name a synonym of
+the second.
+
+Usage: merge-tags.py SOURCE_TAG TARGET_TAG
+"""
+import sys
+
+from soclone.models import Tag
+
+if len(sys.argv) != 3:
+    print __doc__.strip()
+    sys.exit(1)
+
+source = Tag.objects.get(name=sys.argv[1])
+target = Tag.objects.get(name=sys.argv[2])
+Tag.objects.merge(source, target)
@@ -0,0 +1,16 @@
+"""
+Deletes old Activities - votes are kept for ACTIVITY_VOTE_RETENTION_DAYS
+days and everything else for ACTIVITY_RETENTION_DAYS days.
+"""
+import datetime
+
+from django.conf import settings
+
+from soclone.models import Activity
+
+now = datetime.datetime.now()
+Activity.objects.prune(
+    now - datetime.timedelta(days=settings.ACTIVITY_VOTE_RETENTION_DAYS),
+    types=[Activity.VOTED])
+Activity.objects.prune(
+    now - datetime.timedelta(days=settings.ACTIVITY_RETENTION_DAYS))
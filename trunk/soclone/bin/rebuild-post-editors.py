@@ -0,0 +1,3 @@
+from soclone.models import PostEditor
+
+PostEditor.objects.rebuild()
@@ -0,0 +1,3 @@
+from soclone.models import RelatedQuestion
+
+RelatedQuestion.objects.rebuild()
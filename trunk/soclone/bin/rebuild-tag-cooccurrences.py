@@ -0,0 +1,3 @@
+from soclone.models import TagCooccurrence
+
+TagCooccurrence.objects.rebuild()
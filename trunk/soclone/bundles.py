@@ -0,0 +1,130 @@
+"""
+Bundles of the JavaScript and CSS files used by each type of page.
+
+``bin/build-media.py`` concatenates and minifies the files in each bundle
+defined in ``MEDIA_BUNDLES``, writing them to ``MEDIA_ROOT/bundles/``
+with a hash of their contents in their filenames, along with gzipped
+(and, if the brotli module is available, brotli-compressed) copies and a
+manifest of the filenames. Bundle filenames change whenever their
+contents do, so the web server can serve them with far-future expiry
+headers and the precompressed copies as they are.
+
+The ``bundle`` template tag links to the built bundle, or to each of its
+files separately if bundles haven't been built or ``DEBUG`` is on.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.utils import simplejson
+
+from soclone.utils.cache import ReloadingValue
+
+try:
+    from jsmin import jsmin
+except ImportError:
+    jsmin = None
+
+BUNDLE_DIR = 'bundles'
+MANIFEST_FILENAME = 'manifest.json'
+
+TAG_TEMPLATES = {
+    'css': u'<link rel="stylesheet" type="text/css" href="%s" media="screen">',
+    'js': u'<script type="text/javascript" src="%s"></script>',
+}
+
+def bundle_type(name):
+    """Determines the type of a bundle from its name's extension."""
+    return os.path.splitext(name)[1][1:]
+
+css_comment_re = re.compile(r'/\*.*?\*/', re.DOTALL)
+css_space_re = re.compile(r'\s+')
+css_punctuation_re = re.compile(r'\s*([{};,>])\s*')
+
+def minify_css(css):
+    """
+    Removes comments and unnecessary whitespace from CSS.
+
+    >>> minify_css('a, b {\\n  color: red; /* note */\\n}\\n')
+    'a,b{color: red;}'
+    """
+    css = css_comment_re.sub('', css)
+    css = css_space_re.sub(' ', css)
+    return css_punctuation_re.sub(r'\1', css).strip()
+
+def minify_js(js):
+    """
+    Minifies JavaScript with jsmin if it's available, otherwise just
+    removes indentation and blank lines, which is always safe for the
+    scripts we use.
+
+    >>> minify_js('function a()\\n{\\n\\n    return 1;\\n}\\n')
+    'function a()\\n{\\nreturn 1;\\n}'
+    """
+    if jsmin is not None:
+        return jsmin(js)
+    return '\n'.join([line.strip() for line in js.splitlines()
+                      if line.strip()])
+
+MINIFIERS = {
+    'css': minify_css,
+    'js': minify_js,
+}
+
+# Separates files within a bundle, guarding against scripts which omit a
+# trailing semicolon.
+SEPARATORS = {
+    'css': '\n',
+    'js': ';\n',
+}
+
+def build_bundle(name, files, media_root):
+    """Creates the minified contents of a bundle."""
+    type = bundle_type(name)
+    contents = []
+    for path in files:
+        f = open(os.path.join(media_root, path), 'rb')
+        try:
+            contents.append(MINIFIERS[type](f.read()))
+        finally:
+            f.close()
+    return SEPARATORS[type].join(contents)
+
+def load_manifest():
+    """
+    Loads the manifest of built bundle filenames, returning an empty dict
+    if bundles haven't been built.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, BUNDLE_DIR, MANIFEST_FILENAME)
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        return {}
+    try:
+        return simplejson.loads(f.read())
+    finally:
+        f.close()
+
+_manifest = ReloadingValue(load_manifest, settings.MEDIA_MANIFEST_REFRESH)
+
+def get_manifest():
+    """
+    Retrieves the manifest of built bundle filenames, which is reloaded
+    periodically so running processes pick up newly built bundles without
+    a restart.
+    """
+    return _manifest.get()
+
+def render_bundle(name):
+    """
+    Creates tags which link to a built bundle, or to each of its files if
+    it hasn't been built or ``DEBUG`` is on.
+    """
+    tag_template = TAG_TEMPLATES[bundle_type(name)]
+    if not settings.DEBUG:
+        filename = get_manifest().get(name)
+        if filename is not None:
+            return tag_template % ('%s%s/%s' % (settings.MEDIA_URL,
+                                                BUNDLE_DIR, filename))
+    return u'\n'.join([tag_template % ('%s%s' % (settings.MEDIA_URL, path))
+                       for path in settings.MEDIA_BUNDLES[name]])
@@ -0,0 +1,124 @@
+"""
+Rendering of User "cards" - the gravatar, profile link, reputation score
+and badge counts displayed for a User alongside posts and in lists.
+
+Rendered cards are cached in memory, keyed on the User details they
+display, so a User who appears many times across lists is only rendered
+once until their details change.
+"""
+from django.conf import settings
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.core.urlresolvers import reverse
+from django.template.defaultfilters import pluralize
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from soclone.models import Badge
+from soclone.utils.cache import LRUCache
+
+GRAVATAR_TEMPLATE = ('<img width="%(size)s" height="%(size)s" '
+                     'src="http://www.gravatar.com/avatar/%(gravatar_hash)s'
+                     '?s=%(size)s&d=identicon&r=PG">')
+
+REPUTATION_TEMPLATE = '<span class="reputation-score">%s</span>'
+BADGE_TEMPLATE = ('<span title="%(count)s %(name)s badge%(plural)s">'
+                    '<span class="badge%(id)s">&bull;</span>'
+                    '<span class="badgecount">%(count)s</span>'
+                  '</span>')
+
+CARD_TEMPLATE = ('<div class="gravatar">%(gravatar)s</div>\n'
+                 '<div class="user-details">\n'
+                 '  <a href="%(url)s">%(username)s</a>\n'
+                 '  %(reputation)s\n'
+                 '</div>')
+
+CARD_FIELDS = ('id', 'username', 'gravatar', 'reputation', 'gold', 'silver',
+               'bronze')
+
+_reputations = LRUCache(settings.USER_CARD_CACHE_SIZE)
+_cards = LRUCache(settings.USER_CARD_CACHE_SIZE)
+
+def user_details(user, fields=CARD_FIELDS):
+    """
+    Retrieves a tuple of the given fields from a User object, or a dict
+    containing the appropriate values.
+    """
+    try:
+        return tuple([user[field] for field in fields])
+    except (TypeError, AttributeError, KeyError):
+        return tuple([getattr(user, field) for field in fields])
+
+def render_gravatar(gravatar_hash, size):
+    """Creates an ``<img>`` for a Gravatar with a given size."""
+    return mark_safe(GRAVATAR_TEMPLATE % {
+        'size': size,
+        'gravatar_hash': gravatar_hash,
+    })
+
+def render_reputation(reputation, gold, silver, bronze):
+    """
+    Creates a ``<span>`` for a reputation score and for each type of
+    badge held.
+    """
+    key = (reputation, gold, silver, bronze)
+    html = _reputations.get(key)
+    if html is None:
+        spans = [REPUTATION_TEMPLATE % intcomma(reputation)]
+        for badge, count in zip(Badge.TYPE_CHOICES, (gold, silver, bronze)):
+            if not count:
+                continue
+            spans.append(BADGE_TEMPLATE % {
+                'id': badge[0],
+                'name': badge[1],
+                'count': count,
+                'plural': pluralize(count),
+            })
+        html = mark_safe(u''.join(spans))
+        _reputations.set(key, html)
+    return html
+
+def _card_key(user, size, show_reputation):
+    return user_details(user) + (size, show_reputation)
+
+def _render_card(key):
+    (id, username, gravatar, reputation, gold, silver, bronze, size,
+     show_reputation) = key
+    if show_reputation:
+        reputation_html = render_reputation(reputation, gold, silver, bronze)
+    else:
+        reputation_html = u''
+    return mark_safe(CARD_TEMPLATE % {
+        'gravatar': render_gravatar(gravatar, size),
+        'url': '%s%s/' % (reverse('user', args=[id]), escape(username)),
+        'username': escape(username),
+        'reputation': reputation_html,
+    })
+
+def render_card(user, size=32, show_reputation=True):
+    """
+    Creates a card for the given User object, or a dict containing the
+    appropriate values.
+    """
+    key = _card_key(user, size, show_reputation)
+    html = _cards.get(key)
+    if html is None:
+        html = _render_card(key)
+        _cards.set(key, html)
+    return html
+
+def cache_cards(users, size=32, show_reputation=True):
+    """
+    Renders and caches cards for any of the given Users whose cards
+    aren't already cached, with a single cache lookup.
+
+    This is used to prepare the cards for a page of posts before it is
+    rendered, so the template tags which display them find them cached.
+    """
+    keys = set()
+    for user in users:
+        if user is not None:
+            keys.add(_card_key(user, size, show_reputation))
+    cached = _cards.get_many(keys)
+    for key in keys:
+        if key not in cached:
+            _cards.set(key, _render_card(key))
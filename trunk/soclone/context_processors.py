@@ -12,5 +12,17 @@ def auth(request):
         user = AnonymousUser()
     return {'user': user}
 
+def notifications(request):
+    """
+    Adds the number of unread Notifications the current User has, which is
+    cached rather than loaded on every request.
+    """
+    from soclone import notifications
+    if hasattr(request, 'user'):
+        count = notifications.unread_count(request.user)
+    else:
+        count = 0
+    return {'unread_notification_count': count}
+
 def request_path(request):
     return {'request_path': urllib.quote_plus(request.path)}
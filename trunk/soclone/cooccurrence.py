@@ -0,0 +1,64 @@
+"""
+An in-memory copy of the Tag co-occurrence matrix, used to find related
+Tags without querying the database.
+
+The matrix is loaded when first needed and reloaded in the background
+once it is older than ``TAG_MATRIX_REFRESH`` seconds, while the current
+copy continues to be served. Changes to the co-occurrence counts are
+written to the database as Questions are tagged and retagged, so they
+appear here on the next reload.
+"""
+import heapq
+
+from django.conf import settings
+
+from soclone.models import TagCooccurrence
+from soclone.utils.cache import ReloadingValue
+
+class TagMatrix(object):
+    """
+    Sparse Tag co-occurrence counts, keyed by Tag name. Must be treated
+    as read-only once built as it is shared between threads.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+
+    def related(self, tagnames, count):
+        """
+        Finds the ``count`` Tags which are most often used along with the
+        given Tags, scored by the total number of Questions they share
+        with each of the given Tags.
+
+        Returns a list of (name, score) two-tuples, highest score first.
+        """
+        scores = {}
+        for tagname in tagnames:
+            for other, question_count in self.rows.get(tagname, {}).iteritems():
+                scores[other] = scores.get(other, 0) + question_count
+        for tagname in tagnames:
+            scores.pop(tagname, None)
+        return [(name, score) for score, name in heapq.nlargest(count,
+                [(score, name) for name, score in scores.iteritems()])]
+
+def load_tag_matrix():
+    """Loads the Tag co-occurrence matrix from the database."""
+    rows = {}
+    for tagname, other, question_count in TagCooccurrence.objects.values_list(
+            'tag__name', 'other__name', 'question_count').iterator():
+        rows.setdefault(tagname, {})[other] = question_count
+    return TagMatrix(rows)
+
+_matrix = ReloadingValue(load_tag_matrix, settings.TAG_MATRIX_REFRESH)
+
+def get_tag_matrix():
+    """Retrieves the current Tag matrix, reloading it if stale."""
+    return _matrix.get()
+
+def related_tags(tagnames, count=None):
+    """
+    Finds the Tags most often used along with the given Tag names,
+    returning a list of (name, score) two-tuples.
+    """
+    if count is None:
+        count = settings.RELATED_TAG_COUNT
+    return get_tag_matrix().related(tagnames, count)
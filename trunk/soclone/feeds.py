@@ -0,0 +1,220 @@
+"""
+Atom feeds of the newest Questions, the newest Questions with each Tag
+and the newest Answers to each Question.
+
+The latest ``FEED_ENTRY_COUNT`` entries for each feed are loaded with a
+single query and cached, so polling feed readers don't cause any queries.
+Views which change what a feed would contain mark it for invalidation,
+and ``FeedMiddleware`` deletes the marked feeds once the request's
+transaction has been committed, so they can't be reloaded from data which
+is about to be rolled back. Serialised feeds are cached along with a stamp
+of the entries they were built from, and are only rebuilt when the entries
+have changed.
+
+Deleting a feed is only seen by every process if the cache is shared
+between them, so entries aren't cached at all unless ``CACHE_BACKEND`` is
+a shared cache such as memcached.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.http import Http404, HttpResponse
+from django.utils.feedgenerator import Atom1Feed
+
+from soclone import replica
+from soclone import stamps
+from soclone.models import Answer, Question, Tag
+from soclone.utils.cache import is_shared_cache
+
+QUESTION_ENTRY_FIELDS = ('id', 'title', 'author__username', 'added_at',
+                         'last_edited_at', 'html')
+ANSWER_ENTRY_FIELDS = ('id', 'author__username', 'added_at',
+                       'last_edited_at', 'html')
+
+_enabled = is_shared_cache(settings.CACHE_BACKEND)
+# Names of the feeds to be invalidated at the end of the current request
+_state = threading.local()
+
+def _cache_key(name):
+    return 'feeds:%s' % hashlib.md5(name.encode('utf-8')).hexdigest()
+
+def _question_entry(row):
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'url': Question(id=row['id'], title=row['title']).get_absolute_url(),
+        'author': row['author__username'],
+        'updated': row['last_edited_at'] or row['added_at'],
+        'html': row['html'],
+    }
+
+def _answer_entry(row):
+    return {
+        'id': row['id'],
+        'title': u'Answer by %s' % row['author__username'],
+        'url': reverse('answer', args=[row['id']]),
+        'author': row['author__username'],
+        'updated': row['last_edited_at'] or row['added_at'],
+        'html': row['html'],
+    }
+
+def _question_entries(questions):
+    return [_question_entry(row) for row in replica.route(questions).extra(
+        where=['NOT soclone_question.deleted']).order_by(
+        '-added_at', '-id').values(*QUESTION_ENTRY_FIELDS)[
+        :settings.FEED_ENTRY_COUNT]]
+
+def _load_newest_questions():
+    return {
+        'title': u'Newest Questions',
+        'url': reverse('questions'),
+        'entries': _question_entries(Question.objects.all()),
+    }
+
+def _load_tagged_questions(tag_name):
+    if not list(replica.route(Tag.objects.filter(name=tag_name)).values_list(
+            'id', flat=True)[:1]):
+        return None
+    return {
+        'title': u"Newest Questions tagged '%s'" % tag_name,
+        'url': reverse('tag', args=[tag_name]),
+        'entries': _question_entries(Question.objects.filter(
+            tags__name=tag_name)),
+    }
+
+def _load_question_answers(question_id):
+    question = list(replica.route(Question.objects.filter(id=question_id).extra(
+        where=['NOT soclone_question.deleted'])).values('id', 'title'))
+    if not question:
+        return None
+    question = Question(**question[0])
+    return {
+        'title': u'Answers to %s' % question.title,
+        'url': question.get_absolute_url(),
+        'entries': [_answer_entry(row) for row in replica.route(
+            Answer.objects.filter(question=question_id).extra(
+                where=['NOT soclone_answer.deleted'])).order_by(
+            '-added_at', '-id').values(*ANSWER_ENTRY_FIELDS)[
+            :settings.FEED_ENTRY_COUNT]],
+    }
+
+def get_feed(name, load, *args):
+    """
+    Retrieves the details and latest entries of the named feed, loading
+    and caching them with ``load`` and any additional arguments given if
+    necessary.
+
+    Returns ``None`` if ``load`` does, when there's nothing to feed.
+    """
+    if not _enabled:
+        return load(*args)
+    key = _cache_key(name)
+    feed = cache.get(key)
+    if feed is None:
+        feed = load(*args)
+        if feed is None:
+            return None
+        cache.set(key, feed, settings.FEED_CACHE_TIMEOUT)
+    return feed
+
+def _pending():
+    if not hasattr(_state, 'names'):
+        _state.names = set()
+    return _state.names
+
+def invalidate_question(question, tagnames=None):
+    """
+    Marks the feeds a Question belongs in for invalidation, along with the
+    feeds for the Tags in ``tagnames``, if given, for Tags it has just been
+    removed from.
+    """
+    names = _pending()
+    names.add('questions')
+    names.add('question:%s' % question.id)
+    tag_names = question.tagname_list()
+    if tagnames is not None:
+        tag_names += tagnames.split(u' ')
+    for tag_name in tag_names:
+        if tag_name:
+            names.add(u'tag:%s' % tag_name)
+
+def invalidate_answer(answer):
+    """Marks the feed an Answer belongs in for invalidation."""
+    _pending().add('question:%s' % answer.question_id)
+
+def flush_invalidations():
+    """Deletes the feeds which have been marked for invalidation."""
+    names = _pending()
+    if _enabled:
+        for name in names:
+            cache.delete(_cache_key(name))
+    names.clear()
+
+def discard_invalidations():
+    """Forgets the feeds which have been marked for invalidation."""
+    _pending().clear()
+
+def _stamp(feed):
+    return repr([(entry['id'], entry['updated'])
+                 for entry in feed['entries']])
+
+def _serialise(request, feed):
+    """Builds an Atom document for a feed with absolute links."""
+    atom = Atom1Feed(
+        title=feed['title'],
+        link=request.build_absolute_uri(feed['url']),
+        description=u'',
+        language=settings.LANGUAGE_CODE,
+        feed_url=request.build_absolute_uri(request.path),
+    )
+    for entry in feed['entries']:
+        link = request.build_absolute_uri(entry['url'])
+        atom.add_item(entry['title'], link, entry['html'],
+                      author_name=entry['author'], pubdate=entry['updated'],
+                      unique_id=link)
+    return atom.writeString('utf-8')
+
+def feed_response(request, name, load, *args):
+    """
+    Creates a response for the named feed, answering conditional GETs and
+    reusing its cached serialised form if the entries haven't changed
+    since it was built.
+    """
+    feed = get_feed(name, load, *args)
+    if feed is None:
+        raise Http404
+    stamp = _stamp(feed)
+    etag, response = stamps.check(request, lambda: stamp)
+    if response is not None:
+        return response
+    # Links are absolute, so documents are cached for each host
+    key = _cache_key(u'atom:%s:%s' % (request.get_host(), name))
+    cached = cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        content = cached[1]
+    else:
+        content = _serialise(request, feed)
+        cache.set(key, (stamp, content), settings.FEED_CACHE_TIMEOUT)
+    return stamps.set_etag(HttpResponse(content,
+        mimetype='application/atom+xml; charset=utf-8'), etag)
+
+#########
+# Views #
+#########
+
+def newest_questions(request):
+    """Feed of the newest Questions."""
+    return feed_response(request, 'questions', _load_newest_questions)
+
+def tagged_questions(request, tag_name):
+    """Feed of the newest Questions with a Tag."""
+    return feed_response(request, u'tag:%s' % tag_name,
+                         _load_tagged_questions, tag_name)
+
+def question_answers(request, question_id):
+    """Feed of the newest Answers to a Question."""
+    return feed_response(request, 'question:%s' % question_id,
+                         _load_question_answers, question_id)
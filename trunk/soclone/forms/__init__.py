@@ -9,7 +9,8 @@ from soclone.forms.widgets import MarkdownTextArea
 from soclone.models import Question
 
 RESERVED_TITLES = (u'answer', u'close', u'edit', u'delete', u'favourite',
-                   u'comment', u'flag', u'vote')
+                   u'comment', u'flag', u'vote', u'state',
+                   u'duplicates', u'timeline')
 
 WIKI_CHECKBOX_LABEL = u'community owned wiki question'
 
@@ -56,6 +57,8 @@ class AskQuestionForm(forms.Form):
     text  = forms.CharField(widget=MarkdownTextArea())
     tags  = TagnameField()
     wiki  = forms.BooleanField(required=False, label=WIKI_CHECKBOX_LABEL)
+    not_duplicate = forms.BooleanField(required=False,
+        label=u'my question is not a duplicate of any of these')
 
     clean_title = clean_question_title
 
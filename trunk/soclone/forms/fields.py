@@ -2,6 +2,8 @@ import re
 
 from django import forms
 
+from soclone.models import TagSynonym
+
 tagname_re = re.compile(r'^[-a-z0-9+#.]+$')
 tag_split_re = re.compile(r'[ ;,]')
 
@@ -10,6 +12,8 @@ class TagnameField(forms.CharField):
     A CharField which validates that a maximum of 5 space-separated
     tagnames have been entered, that each tag is at most 25
     characters long and that no duplicate tagnames were entered.
+
+    Tagnames which are synonyms of another Tag are replaced with its name.
     """
     def clean(self, value):
         value = super(TagnameField, self).clean(value)
@@ -29,4 +33,4 @@ class TagnameField(forms.CharField):
         if len(tagnames) != len(set(tagnames)):
             raise forms.ValidationError(u'The same tag was entered multiple '
                                         u'times.')
-        return u' '.join(tagnames)
+        return u' '.join(TagSynonym.objects.resolve(tagnames))
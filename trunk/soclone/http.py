@@ -3,6 +3,18 @@ from django.db.models.query import QuerySet
 from django.http import HttpResponse
 from django.utils import simplejson
 
+# Use the fastest JSON encoder available - the standalone simplejson has C
+# speedups which Django's bundled copy lacks.
+try:
+    import cjson
+    fast_dumps = cjson.encode
+except ImportError:
+    try:
+        import simplejson
+        fast_dumps = simplejson.dumps
+    except ImportError:
+        fast_dumps = simplejson.dumps
+
 class JsonResponse(HttpResponse):
     """From http://www.djangosnippets.org/snippets/154/"""
     def __init__(self, obj):
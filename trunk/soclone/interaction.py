@@ -0,0 +1,106 @@
+"""
+Caching of the state of a User's interactions with a Question page - the
+votes they've made on the Question and its Answers and whether or not
+they've favourited the Question.
+
+The state for a (User, Question) pair is loaded with a single query, then
+kept up to date in place as the User votes and favourites, so that the
+rest of the page doesn't need to vary by User.
+
+Updates made in place are only seen by every process if the cache is
+shared between them, so states aren't cached at all unless
+``CACHE_BACKEND`` is a shared cache such as memcached.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+
+from soclone.models import Answer, Vote
+from soclone.utils.cache import is_shared_cache
+
+_enabled = is_shared_cache(settings.CACHE_BACKEND)
+
+def _cache_key(user_id, question_id):
+    return 'interaction:%s:%s' % (user_id, question_id)
+
+def get_state(user, question_id):
+    """
+    Retrieves the interaction state for the given User and Question,
+    loading and caching it if necessary.
+
+    Anonymous users always get an empty state without the database or
+    cache being used.
+    """
+    if not user.is_authenticated():
+        return {
+            'question_vote': None,
+            'answer_votes': {},
+            'favourite': False,
+        }
+    if not _enabled:
+        return Vote.objects.get_interaction_state(user, question_id)
+    key = _cache_key(user.id, question_id)
+    state = cache.get(key)
+    if state is None:
+        state = Vote.objects.get_interaction_state(user, question_id)
+        cache.set(key, state, settings.INTERACTION_STATE_TIMEOUT)
+    return state
+
+def _update_state(user_id, question_id, update):
+    """
+    Applies an update function to a cached interaction state. States
+    which aren't cached are left alone, as they will be loaded with the
+    update in place when next needed.
+    """
+    if not _enabled:
+        return
+    key = _cache_key(user_id, question_id)
+    state = cache.get(key)
+    if state is not None:
+        update(state)
+        cache.set(key, state, settings.INTERACTION_STATE_TIMEOUT)
+
+def record_vote(user_id, post, vote):
+    """
+    Records a User's vote on a Question or Answer in their cached
+    interaction state for its Question.
+    """
+    if isinstance(post, Answer):
+        def update(state):
+            state['answer_votes'][post.id] = vote
+        _update_state(user_id, post.question_id, update)
+    else:
+        def update(state):
+            state['question_vote'] = vote
+        _update_state(user_id, post.id, update)
+
+def record_favourite(user_id, question_id, favourite):
+    """
+    Records whether or not a User has favourited a Question in their
+    cached interaction state for it.
+    """
+    def update(state):
+        state['favourite'] = favourite
+    _update_state(user_id, question_id, update)
+
+def invalidate(user_id, question_id):
+    """Discards a cached interaction state."""
+    if _enabled:
+        cache.delete(_cache_key(user_id, question_id))
+
+def invalidate_vote_interaction_state(instance, **kwargs):
+    """
+    Discards the cached interaction state affected by deletion of the
+    given Vote.
+    """
+    if instance.content_type.model_class() is Answer:
+        question_ids = Answer.objects.filter(
+            id=instance.object_id).values_list('question_id', flat=True)
+        if not question_ids:
+            return
+        question_id = question_ids[0]
+    else:
+        question_id = instance.object_id
+    invalidate(instance.user_id, question_id)
+
+post_delete.connect(invalidate_vote_interaction_state, sender=Vote)
@@ -24,5 +24,152 @@ var SOClone =
         {
             prettyPrint();
         }
+    },
+
+    /**
+     * Renders a preview of the Markdown text in a textarea using the
+     * server, displaying the result in the given preview element.
+     *
+     * Only one preview request is made at a time - if the text changes
+     * while a request is in progress, the latest text will be previewed
+     * once the request completes. Text which has already been previewed
+     * won't be sent again.
+     */
+    preview: function(url, textarea, preview)
+    {
+        var state = SOClone.preview.state;
+        var text = $(textarea).val();
+        if (state.busy)
+        {
+            state.pending = {url: url, textarea: textarea, preview: preview};
+            return;
+        }
+        if (text == state.lastText)
+        {
+            return;
+        }
+
+        state.busy = true;
+        state.lastText = text;
+        $.ajax({
+            type: "POST",
+            url: url,
+            data: {text: text},
+            dataType: "json",
+            success: function(data)
+            {
+                if (data.success)
+                {
+                    $(preview).html(data.html);
+                    SOClone.styleCode();
+                }
+            },
+            error: function()
+            {
+                // Allow the same text to be retried
+                state.lastText = null;
+            },
+            complete: function()
+            {
+                state.busy = false;
+                if (state.pending !== null)
+                {
+                    var pending = state.pending;
+                    state.pending = null;
+                    SOClone.preview(pending.url, pending.textarea,
+                                    pending.preview);
+                }
+            }
+        });
+    },
+
+    /**
+     * Looks up Questions which may be duplicates of the Question being
+     * asked, displaying links to them in the given list element and
+     * showing the given container only if any were found.
+     *
+     * A lookup is only made when the title has changed since the last
+     * lookup.
+     */
+    duplicates: function(url, title, textarea, list, container)
+    {
+        var state = SOClone.duplicates.state;
+        var titleText = $.trim($(title).val());
+        if (state.busy || titleText == state.lastTitle)
+        {
+            return;
+        }
+
+        state.busy = true;
+        state.lastTitle = titleText;
+        $.ajax({
+            type: "POST",
+            url: url,
+            data: {title: titleText, text: $(textarea).val()},
+            dataType: "json",
+            success: function(data)
+            {
+                if (!data.success)
+                {
+                    return;
+                }
+                $(list).empty();
+                $.each(data.questions, function(i, question)
+                {
+                    $(list).append($("<li>").append(
+                        $("<a>").attr("href", question.url)
+                                .text(question.title)));
+                });
+                $(container).toggle(data.questions.length > 0);
+            },
+            error: function()
+            {
+                state.lastTitle = null;
+            },
+            complete: function()
+            {
+                state.busy = false;
+            }
+        });
+    },
+
+    /**
+     * Suggests Tags which are often used along with those entered in a
+     * tag input, displaying them as links in the given container which
+     * add the Tag to the input when clicked.
+     */
+    relatedTags: function(url, input, container)
+    {
+        var tagnames = $.trim($(input).val());
+        if (!tagnames)
+        {
+            $(container).empty();
+            return;
+        }
+        $.getJSON(url, {tags: tagnames}, function(data)
+        {
+            if (!data.success)
+            {
+                return;
+            }
+            $(container).empty();
+            $.each(data.tags, function(i, tag)
+            {
+                $("<a>").attr({href: "#", "class": "tag", rel: "tag"})
+                        .text(tag.name)
+                        .click(function()
+                        {
+                            $(input).val($.trim($(input).val()) + " " +
+                                         tag.name);
+                            SOClone.relatedTags(url, input, container);
+                            return false;
+                        })
+                        .appendTo(container);
+                $(container).append(" ");
+            });
+        });
     }
 };
+
+SOClone.preview.state = {busy: false, pending: null, lastText: null};
+SOClone.duplicates.state = {busy: false, lastTitle: null};
@@ -0,0 +1,155 @@
+"""SOClone middleware."""
+from django.conf import settings
+from django.contrib.auth.middleware import \
+    AuthenticationMiddleware as BaseAuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import transaction
+from django.middleware.transaction import \
+    TransactionMiddleware as BaseTransactionMiddleware
+
+from soclone import activity
+from soclone import feeds
+from soclone import notifications
+from soclone import pool
+from soclone import presence
+from soclone import profiling
+from soclone import replica
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+def might_be_authenticated(request):
+    """
+    Determines whether or not a request might have been made by an
+    authenticated User, without loading their session.
+    """
+    return settings.AUTH_COOKIE_NAME in request.COOKIES
+
+class ConnectionPoolMiddleware(object):
+    """
+    Keeps database connections open between requests in a pool, if
+    ``DATABASE_POOL_SIZE`` is set.
+    """
+    def __init__(self):
+        if not settings.DATABASE_POOL_SIZE:
+            raise MiddlewareNotUsed
+        pool.install()
+
+class AuthenticationMiddleware(BaseAuthenticationMiddleware):
+    """
+    Only looks up the User for requests carrying the cookie which is set
+    when a User logs in - anyone else is anonymous without their session
+    being loaded, even if they have a stale session cookie.
+    """
+    def process_request(self, request):
+        if might_be_authenticated(request):
+            return super(AuthenticationMiddleware,
+                         self).process_request(request)
+        request.user = AnonymousUser()
+
+class TransactionMiddleware(BaseTransactionMiddleware):
+    """
+    Only manages transactions for requests which are expected to make
+    changes. Any writes made while handling safe requests are committed
+    as they happen.
+    """
+    def process_request(self, request):
+        if request.method not in SAFE_METHODS:
+            super(TransactionMiddleware, self).process_request(request)
+
+    def process_exception(self, request, exception):
+        if transaction.is_managed():
+            super(TransactionMiddleware, self).process_exception(request,
+                                                                 exception)
+
+class ActivityMiddleware(object):
+    """
+    Writes buffered Activities to the database once there are enough of
+    them or they've been waiting long enough.
+
+    This should be placed before TransactionMiddleware, so Activities are
+    written after the request's transaction has been committed.
+    """
+    def process_response(self, request, response):
+        activity.flush()
+        return response
+
+class NotificationMiddleware(object):
+    """
+    Delivers queued Notifications once there are enough of them or they've
+    been waiting long enough.
+
+    This should be placed before TransactionMiddleware, so Notifications
+    are delivered after the request's transaction has been committed.
+    """
+    def process_response(self, request, response):
+        notifications.dispatch()
+        return response
+
+class FeedMiddleware(object):
+    """
+    Deletes cached feeds which the request has changed.
+
+    This should be placed before TransactionMiddleware, so feeds are
+    deleted after the request's transaction has been committed, and are
+    left alone if it's rolled back.
+    """
+    def process_response(self, request, response):
+        feeds.flush_invalidations()
+        return response
+
+    def process_exception(self, request, exception):
+        feeds.discard_invalidations()
+
+class LastSeenMiddleware(object):
+    """
+    Records when authenticated Users were last seen.
+
+    This must be placed after AuthenticationMiddleware.
+    """
+    def process_request(self, request):
+        if request.user.is_authenticated():
+            presence.record(request.user.id)
+
+class ReplicaMiddleware(object):
+    """
+    Allows reads in safe requests to go to the replica database, except
+    for Users who recently made changes, who are marked with a cookie so
+    they read from the main database until the replica has caught up.
+
+    Only authenticated Users can make changes, so only their successful
+    unsafe requests set the cookie. Requests which are answered before
+    AuthenticationMiddleware runs don't have a User, so they never do.
+    """
+    def process_request(self, request):
+        replica.use_replica(request.method in SAFE_METHODS and
+            settings.REPLICA_STICKY_COOKIE_NAME not in request.COOKIES)
+
+    def process_response(self, request, response):
+        replica.use_replica(False)
+        user = getattr(request, 'user', None)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+            and user is not None and user.is_authenticated()):
+            response.set_cookie(settings.REPLICA_STICKY_COOKIE_NAME, '1',
+                                max_age=settings.REPLICA_STICKY_SECONDS)
+        return response
+
+class ProfilingMiddleware(object):
+    """
+    Profiles views for requests carrying a valid profiling token, or
+    picked at random according to ``PROFILE_SAMPLE_RATE``.
+
+    This should be placed last, so its ``process_view`` is called just
+    before the view and its ``process_response`` just after it, keeping
+    the work of other middleware out of profiles.
+    """
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if profiling.should_profile(request):
+            profiling.start(request, view_func)
+
+    def process_response(self, request, response):
+        profiling.finish(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        profiling.finish(request)
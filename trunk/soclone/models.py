@@ -1,35 +1,68 @@
 """SOClone Models."""
-import collections
 import datetime
 import hashlib
 import re
+import time
 
+from django.conf import settings
 from django.contrib.auth.models import User, UserManager
 from django.contrib.contenttypes import generic
 from django.contrib.contenttypes.models import ContentType
 from django.core.urlresolvers import reverse
 from django.db import connection, models, transaction
-from django.db.models import Q
+from django.db.backends.util import typecast_timestamp
 from django.db.models.signals import post_delete, post_save, pre_save
 from django.template.defaultfilters import slugify
 from django.utils import simplejson
+from django.utils.html import strip_tags
 
+from soclone.utils import minhash
 from soclone.utils.lists import flatten
+from soclone.utils.similarity import (SparseIndex, question_features,
+    top_similar)
+
+def replace_tagname(tagnames, source, target):
+    """
+    Replaces a Tag name in a space-separated list of Tag names, dropping
+    it instead if the replacement is already present.
+
+    >>> replace_tagname(u'python django', u'django', u'web')
+    u'python web'
+    >>> replace_tagname(u'web django python', u'django', u'web')
+    u'web python'
+    """
+    names = []
+    for name in tagnames.split():
+        if name == source:
+            name = target
+        if name not in names:
+            names.append(name)
+    return u' '.join(names)
 
 class TagManager(models.Manager):
     UPDATE_USE_COUNTS_QUERY = (
         'UPDATE soclone_tag '
         'SET use_count = ('
             'SELECT COUNT(*) FROM soclone_question_tags '
-            'WHERE tag_id = soclone_tag.id'
+            'INNER JOIN soclone_question '
+              'ON soclone_question.id = soclone_question_tags.question_id '
+            'WHERE soclone_question_tags.tag_id = soclone_tag.id '
+              'AND soclone_question.deleted = %%s'
         ') '
         'WHERE id IN (%s)')
+    ADJUST_USE_COUNTS_QUERY = (
+        'UPDATE soclone_tag SET use_count = use_count + %s '
+        'WHERE id IN (SELECT tag_id FROM soclone_question_tags '
+                     'WHERE question_id = %s)')
 
     def get_or_create_multiple(self, names, user):
         """
         Fetches a list of Tags with the given names, creating any Tags
         which don't exist when necesssary.
+
+        Names which are synonyms of another Tag are resolved to that Tag.
         """
+        names = TagSynonym.objects.resolve(names)
         tags = list(self.filter(name__in=names))
         if len(tags) < len(names):
             existing_names = set(tag.name for tag in tags)
@@ -39,14 +72,108 @@ class TagManager(models.Manager):
         return tags
 
     def update_use_counts(self, tags):
-        """Updates the given Tags with their current use counts."""
+        """
+        Updates the given Tags with their current use counts, which don't
+        include deleted Questions.
+        """
         if not tags:
             return
         cursor = connection.cursor()
         query = self.UPDATE_USE_COUNTS_QUERY % ','.join(['%s'] * len(tags))
-        cursor.execute(query, [tag.id for tag in tags])
+        cursor.execute(query, [False] + [tag.id for tag in tags])
         transaction.commit_unless_managed()
 
+    def adjust_use_counts(self, question_id, delta):
+        """
+        Adjusts the use counts of all the Tags used by the Question with
+        the given id with a single query.
+        """
+        cursor = connection.cursor()
+        cursor.execute(self.ADJUST_USE_COUNTS_QUERY, [delta, question_id])
+        transaction.commit_unless_managed()
+
+    MERGE_CHUNK_QUERY = (
+        'SELECT question_id FROM soclone_question_tags '
+        'WHERE tag_id = %s '
+        'LIMIT %s')
+    MERGE_TAGNAMES_QUERY = (
+        'SELECT id, tagnames FROM soclone_question '
+        'WHERE id IN (%s)')
+    UPDATE_TAGNAMES_QUERY = (
+        'UPDATE soclone_question SET tagnames = %s WHERE id = %s')
+    # These must be executed in order for each chunk of Questions, as the
+    # first relies on the source Tag association not yet having been
+    # removed. Each is paired with the names of its parameters, where None
+    # stands for the chunk's Question ids.
+    MERGE_QUERIES = (
+        ('INSERT INTO soclone_question_tags (question_id, tag_id) '
+         'SELECT question_id, %%s FROM soclone_question_tags '
+         'WHERE tag_id = %%s '
+           'AND question_id IN (%(ids)s) '
+           'AND question_id NOT IN (SELECT question_id '
+                                   'FROM soclone_question_tags '
+                                   'WHERE tag_id = %%s)',
+         ('target_id', 'source_id', None, 'target_id')),
+        ('DELETE FROM soclone_question_tags '
+         'WHERE tag_id = %%s AND question_id IN (%(ids)s)',
+         ('source_id', None)),
+    )
+
+    def merge(self, source, target, chunk_size=None, delay=None):
+        """
+        Merges the source Tag into the target Tag, making the source
+        Tag's name a synonym of the target Tag.
+
+        Questions are moved from the source Tag to the target Tag in
+        chunks of ``chunk_size`` Questions, each of which is committed
+        separately, pausing for ``delay`` seconds between chunks to limit
+        the load on the database. Tag use counts and co-occurrence counts
+        are updated once all Questions have been moved.
+        """
+        if chunk_size is None:
+            chunk_size = settings.TAG_MERGE_CHUNK_SIZE
+        if delay is None:
+            delay = settings.TAG_MERGE_DELAY
+
+        # Stop the source Tag from being used while we're merging
+        TagSynonym.objects.filter(target=source).update(target=target)
+        TagSynonym.objects.create(source=source.name, target=target)
+        TagSynonym.objects.clear_cache()
+
+        params = {
+            'source_id': source.id,
+            'target_id': target.id,
+        }
+        cursor = connection.cursor()
+        while True:
+            cursor.execute(self.MERGE_CHUNK_QUERY, [source.id, chunk_size])
+            question_ids = [row[0] for row in cursor.fetchall()]
+            if not question_ids:
+                break
+            ids = ','.join(['%s'] * len(question_ids))
+            # Tag names are rewritten here rather than in SQL, as string
+            # concatenation isn't portable between databases.
+            cursor.execute(self.MERGE_TAGNAMES_QUERY % ids, question_ids)
+            cursor.executemany(self.UPDATE_TAGNAMES_QUERY, [
+                (replace_tagname(tagnames, source.name, target.name),
+                 question_id)
+                for question_id, tagnames in cursor.fetchall()])
+            for query, param_names in self.MERGE_QUERIES:
+                query_params = []
+                for name in param_names:
+                    if name is None:
+                        query_params.extend(question_ids)
+                    else:
+                        query_params.append(params[name])
+                cursor.execute(query % {'ids': ids}, query_params)
+            transaction.commit_unless_managed()
+            if delay:
+                time.sleep(delay)
+
+        self.update_use_counts([target])
+        TagCooccurrence.objects.rebuild_for_tag(target)
+        source.delete()
+
 class Tag(models.Model):
     """A tag for Questions."""
     name       = models.CharField(max_length=24, unique=True)
@@ -65,6 +192,152 @@ class Tag(models.Model):
     def get_absolute_url(self):
         return reverse('tag', args=[self.name])
 
+class TagSynonymManager(models.Manager):
+    _cache = None
+
+    def get_synonyms(self):
+        """
+        Retrieves a dict mapping synonym Tag names to the names of the
+        Tags they should be replaced with.
+
+        The map is kept in memory for ``TAG_SYNONYM_REFRESH`` seconds, but
+        is reloaded as soon as a synonym is added, which is checked for
+        with a query for the latest id. Merges made by other processes,
+        which add a synonym before moving any Questions, take effect
+        immediately.
+        """
+        latest_id = list(self.order_by('-id').values_list('id',
+                                                          flat=True)[:1])
+        cache = self._cache
+        if (cache is None or cache[1] != latest_id or
+            time.time() - cache[0] >= settings.TAG_SYNONYM_REFRESH):
+            cache = (time.time(), latest_id,
+                     dict(self.values_list('source', 'target__name')))
+            self._cache = cache
+        return cache[2]
+
+    def clear_cache(self):
+        self._cache = None
+
+    def resolve(self, tagnames):
+        """
+        Replaces any synonyms in the given list of Tag names, removing
+        any duplicates this creates.
+        """
+        synonyms = self.get_synonyms()
+        resolved = []
+        for tagname in tagnames:
+            tagname = synonyms.get(tagname, tagname)
+            if tagname not in resolved:
+                resolved.append(tagname)
+        return resolved
+
+class TagSynonym(models.Model):
+    """A Tag name which should be replaced with another Tag."""
+    source   = models.CharField(max_length=24, unique=True)
+    target   = models.ForeignKey(Tag, related_name='synonyms')
+    added_at = models.DateTimeField(default=datetime.datetime.now)
+
+    objects = TagSynonymManager()
+
+    def __unicode__(self):
+        return u'%s -> %s' % (self.source, self.target_id)
+
+def tag_pairs(tag_ids):
+    """
+    Creates a set of every ordered pair of distinct Tag ids from the
+    given Tag ids.
+    """
+    return set([(a, b) for a in tag_ids for b in tag_ids if a != b])
+
+class TagCooccurrenceManager(models.Manager):
+    REBUILD_QUERY = (
+        'INSERT INTO soclone_tagcooccurrence '
+        '(tag_id, other_id, question_count) '
+        'SELECT a.tag_id, b.tag_id, COUNT(*) '
+        'FROM soclone_question_tags a '
+        'INNER JOIN soclone_question_tags b '
+            'ON b.question_id = a.question_id AND b.tag_id <> a.tag_id '
+        'GROUP BY a.tag_id, b.tag_id')
+
+    def update_for_question(self, old_tag_ids, new_tag_ids):
+        """
+        Applies the change in Tag co-occurrence counts caused by a
+        Question's Tags changing from the given old Tag ids to the given
+        new Tag ids.
+        """
+        old_pairs = tag_pairs(old_tag_ids)
+        new_pairs = tag_pairs(new_tag_ids)
+        added_pairs = new_pairs - old_pairs
+        removed_pairs = old_pairs - new_pairs
+        if not added_pairs and not removed_pairs:
+            return
+
+        cursor = connection.cursor()
+        if removed_pairs:
+            cursor.executemany(
+                'UPDATE soclone_tagcooccurrence '
+                'SET question_count = question_count - 1 '
+                'WHERE tag_id = %s AND other_id = %s', list(removed_pairs))
+            tag_ids = list(set([a for a, b in removed_pairs]))
+            cursor.execute(
+                'DELETE FROM soclone_tagcooccurrence '
+                'WHERE question_count <= 0 AND tag_id IN (%s)' %
+                ','.join(['%s'] * len(tag_ids)), tag_ids)
+        if added_pairs:
+            tag_ids = set([a for a, b in added_pairs])
+            existing_pairs = set(self.filter(tag__in=tag_ids,
+                other__in=tag_ids).values_list('tag', 'other'))
+            updates = [pair for pair in added_pairs if pair in existing_pairs]
+            if updates:
+                cursor.executemany(
+                    'UPDATE soclone_tagcooccurrence '
+                    'SET question_count = question_count + 1 '
+                    'WHERE tag_id = %s AND other_id = %s', updates)
+            inserts = [(a, b, 1) for a, b in added_pairs
+                       if (a, b) not in existing_pairs]
+            if inserts:
+                cursor.executemany(
+                    'INSERT INTO soclone_tagcooccurrence '
+                    '(tag_id, other_id, question_count) VALUES (%s, %s, %s)',
+                    inserts)
+        transaction.commit_unless_managed()
+
+    def rebuild(self):
+        """
+        Recalculates all Tag co-occurrence counts from Question Tag
+        associations, using a single set-based query.
+        """
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM soclone_tagcooccurrence')
+        cursor.execute(self.REBUILD_QUERY)
+        transaction.commit_unless_managed()
+
+    def rebuild_for_tag(self, tag):
+        """Recalculates all co-occurrence counts involving the given Tag."""
+        cursor = connection.cursor()
+        cursor.execute(
+            'DELETE FROM soclone_tagcooccurrence '
+            'WHERE tag_id = %s OR other_id = %s', [tag.id, tag.id])
+        cursor.execute(self.REBUILD_QUERY.replace('GROUP BY',
+            'WHERE a.tag_id = %s OR b.tag_id = %s GROUP BY'),
+            [tag.id, tag.id])
+        transaction.commit_unless_managed()
+
+class TagCooccurrence(models.Model):
+    """
+    The number of Questions which have been tagged with both of a pair of
+    Tags. Counts are stored for both orderings of each pair.
+    """
+    tag            = models.ForeignKey(Tag, related_name='cooccurrences')
+    other          = models.ForeignKey(Tag, related_name='cooccurrences_with')
+    question_count = models.PositiveIntegerField(default=0)
+
+    objects = TagCooccurrenceManager()
+
+    class Meta:
+        unique_together = ('tag', 'other')
+
 class QuestionManager(models.Manager):
     def update_tags(self, question, tagnames, user):
         """
@@ -85,6 +358,7 @@ class QuestionManager(models.Manager):
             modified_tags.extend(removed_tags)
             question.tags.remove(*removed_tags)
 
+        added_tags = []
         added_tagnames = updated_tagnames - current_tagnames
         if added_tagnames:
             added_tags = Tag.objects.get_or_create_multiple(added_tagnames,
@@ -94,6 +368,13 @@ class QuestionManager(models.Manager):
 
         if modified_tags:
             Tag.objects.update_use_counts(modified_tags)
+            removed_ids = set([t.id for t in removed_tags])
+            TagCooccurrence.objects.update_for_question(
+                [t.id for t in current_tags],
+                [t.id for t in current_tags if t.id not in removed_ids] +
+                [t.id for t in added_tags])
+            question.tagnames = tagnames
+            RelatedQuestion.objects.update_for_question(question)
             return True
 
         return False
@@ -105,6 +386,144 @@ class QuestionManager(models.Manager):
         """
         self.filter(id=question.id).update(
             answer_count=Answer.objects.for_question(question).count())
+        self.update_unanswered(question.id)
+
+    def adjust_answer_count(self, question_id, delta):
+        """
+        Applies a change in the number of visible Answers to the Question
+        with the given id.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE soclone_question SET answer_count = answer_count + %s '
+            'WHERE id = %s', [delta, question_id])
+        transaction.commit_unless_managed()
+        self.update_unanswered(question_id)
+
+    def wikify(self, question_id, wikified_at, min_answer_count=0):
+        """
+        Puts the Question with the given id and all of its Answers into
+        wiki mode if it has at least ``min_answer_count`` Answers, with a
+        single UPDATE for each table.
+
+        Returns ``True`` if the Question was put into wiki mode.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE soclone_question SET wiki = %s, wikified_at = %s '
+            'WHERE id = %s AND wiki = %s AND answer_count >= %s',
+            [True, wikified_at, question_id, False, min_answer_count])
+        wikified = cursor.rowcount > 0
+        if wikified:
+            cursor.execute(
+                'UPDATE soclone_answer SET wiki = %s, wikified_at = %s '
+                'WHERE question_id = %s AND wiki = %s',
+                [True, wikified_at, question_id, False])
+        transaction.commit_unless_managed()
+        return wikified
+
+    def soft_delete(self, question, user):
+        """
+        Deletes a Question while keeping it and everything related to it
+        in the database, so it can be undeleted.
+
+        Its votes, comments and favourites stay in place to be restored
+        on undeletion, but can't be added to while it's deleted. Its Tags'
+        use counts are decremented and any flags on it and its Answers are
+        resolved, each with a single query.
+
+        Returns ``True`` if the Question was deleted, ``False`` if it had
+        already been deleted.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE soclone_question '
+            'SET deleted = %s, deleted_at = %s, deleted_by_id = %s '
+            'WHERE id = %s AND deleted = %s',
+            [True, datetime.datetime.now(), user.id, question.id, False])
+        deleted = cursor.rowcount > 0
+        if deleted:
+            cursor.execute(Tag.objects.ADJUST_USE_COUNTS_QUERY,
+                           [-1, question.id])
+            ModerationQueueItem.objects.resolve_for_question(question.id)
+        transaction.commit_unless_managed()
+        return deleted
+
+    def undelete(self, question):
+        """
+        Undeletes a Question.
+
+        Returns ``True`` if the Question was undeleted, ``False`` if it
+        wasn't deleted.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE soclone_question '
+            'SET deleted = %s, deleted_at = NULL, deleted_by_id = NULL '
+            'WHERE id = %s AND deleted = %s', [False, question.id, True])
+        undeleted = cursor.rowcount > 0
+        if undeleted:
+            cursor.execute(Tag.objects.ADJUST_USE_COUNTS_QUERY,
+                           [1, question.id])
+        transaction.commit_unless_managed()
+        return undeleted
+
+    UPDATE_UNANSWERED_QUERY = (
+        'UPDATE soclone_question SET unanswered = CASE '
+            'WHEN answer_accepted = %%s OR EXISTS ('
+                'SELECT 1 FROM soclone_answer '
+                'WHERE soclone_answer.question_id = soclone_question.id '
+                  'AND soclone_answer.deleted = %%s '
+                  'AND soclone_answer.score > 0'
+            ') THEN %%s ELSE %%s END '
+        'WHERE %s')
+
+    def update_unanswered(self, question_id):
+        """
+        Updates whether or not the Question with the given id is
+        considered to be unanswered - it is unless it has an accepted
+        Answer or an Answer with a positive score.
+        """
+        cursor = connection.cursor()
+        cursor.execute(self.UPDATE_UNANSWERED_QUERY % 'id = %s',
+                       [True, False, False, True, question_id])
+        transaction.commit_unless_managed()
+
+    def update_unanswered_for_answer(self, answer_id):
+        """
+        Updates whether or not the Question which the Answer with the
+        given id belongs to is considered to be unanswered.
+        """
+        cursor = connection.cursor()
+        cursor.execute(self.UPDATE_UNANSWERED_QUERY % (
+                'id = (SELECT question_id FROM soclone_answer WHERE id = %s)'),
+            [True, False, False, True, answer_id])
+        transaction.commit_unless_managed()
+
+    SITEMAP_SHARDS_QUERY = (
+        'SELECT (id - 1) / %s AS shard, MAX(last_activity_at), COUNT(*) '
+        'FROM soclone_question '
+        'WHERE deleted = %s '
+        'GROUP BY shard')
+
+    def sitemap_shards(self, shard_size):
+        """
+        Summarises undeleted Questions in blocks of ``shard_size`` ids,
+        numbered from 0.
+
+        Returns a dict mapping block numbers to two-tuples of the latest
+        ``last_activity_at`` and the number of Questions in the block.
+        """
+        cursor = connection.cursor()
+        cursor.execute(self.SITEMAP_SHARDS_QUERY, [shard_size, False])
+        shards = {}
+        for shard, last_activity_at, count in cursor.fetchall():
+            # Some backends, such as SQLite, return aggregates of
+            # datetimes as strings
+            if isinstance(last_activity_at, basestring):
+                last_activity_at = typecast_timestamp(last_activity_at)
+            shards[shard] = (last_activity_at, count)
+        return shards
 
 class Question(models.Model):
     CLOSE_REASONS = (
@@ -144,6 +563,9 @@ class Question(models.Model):
     view_count           = models.PositiveIntegerField(default=0)
     offensive_flag_count = models.SmallIntegerField(default=0)
     favourite_count      = models.PositiveIntegerField(default=0)
+    author_edit_count    = models.PositiveIntegerField(default=0)
+    editor_count         = models.PositiveIntegerField(default=0)
+    unanswered           = models.BooleanField(default=True)
     last_edited_at       = models.DateTimeField(null=True, blank=True)
     last_edited_by       = models.ForeignKey(User, null=True, blank=True, related_name='last_edited_questions')
     last_activity_at     = models.DateTimeField()
@@ -169,6 +591,11 @@ class Question(models.Model):
                                                       self.author)
             self.tags.add(*tags)
             Tag.objects.update_use_counts(tags)
+            TagCooccurrence.objects.update_for_question(
+                [], [t.id for t in tags])
+            RelatedQuestion.objects.update_for_question(self)
+            DuplicateBucket.objects.update_for_question(self.id, self.title,
+                                                        self.html)
 
     def __unicode__(self):
         return self.title
@@ -188,6 +615,234 @@ class Question(models.Model):
         """Creates a list of Tag names from the ``tagnames`` attribute."""
         return [name for name in self.tagnames.split(u' ')]
 
+class RelatedQuestionManager(models.Manager):
+    CANDIDATES_QUERY = (
+        'SELECT DISTINCT soclone_question.id, soclone_question.title, '
+               'soclone_question.tagnames '
+        'FROM soclone_question '
+        'INNER JOIN soclone_question_tags '
+            'ON soclone_question_tags.question_id = soclone_question.id '
+        'WHERE soclone_question_tags.tag_id IN ('
+                'SELECT tag_id FROM soclone_question_tags '
+                'WHERE question_id = %%s'
+            ') '
+          'AND soclone_question.id <> %%s '
+          'AND soclone_question.deleted = %%s '
+        'ORDER BY soclone_question.id DESC '
+        'LIMIT %d')
+    INSERT_QUERY = (
+        'INSERT INTO soclone_relatedquestion '
+        '(question_id, related_id, similarity) VALUES (%s, %s, %s)')
+
+    def update_for_question(self, question):
+        """
+        Finds the Questions most similar to the given Question, based on
+        its title and tags, and stores them as its related Questions.
+
+        The given Question is also added to the related Questions of
+        those Questions if it is more similar to them than any they
+        already have.
+
+        Only the most recent Questions which share a Tag with the given
+        Question are considered.
+        """
+        count = settings.RELATED_QUESTION_COUNT
+        cursor = connection.cursor()
+        cursor.execute(
+            self.CANDIDATES_QUERY % settings.RELATED_QUESTION_CANDIDATES,
+            [question.id, question.id, False])
+        related = top_similar(
+            question_features(question.title, question.tagnames),
+            [(id, question_features(title, tagnames))
+             for id, title, tagnames in cursor.fetchall()],
+            count)
+
+        cursor.execute(
+            'DELETE FROM soclone_relatedquestion '
+            'WHERE question_id = %s OR related_id = %s',
+            [question.id, question.id])
+        inserts = [(question.id, id, similarity)
+                   for similarity, id in related]
+
+        # Add the Question to its related Questions' related Questions,
+        # displacing their least similar related Question if necessary.
+        existing = {}
+        for question_id, related_id, similarity in self.filter(
+                question__in=[id for similarity, id in related]).values_list(
+                'question', 'related', 'similarity'):
+            existing.setdefault(question_id, []).append((similarity,
+                                                         related_id))
+        for similarity, id in related:
+            others = existing.get(id, [])
+            if len(others) < count:
+                inserts.append((id, question.id, similarity))
+                continue
+            least_similar = min(others)
+            if similarity > least_similar[0]:
+                inserts.append((id, question.id, similarity))
+                cursor.execute(
+                    'DELETE FROM soclone_relatedquestion '
+                    'WHERE question_id = %s AND related_id = %s',
+                    [id, least_similar[1]])
+
+        if inserts:
+            cursor.executemany(self.INSERT_QUERY, inserts)
+        transaction.commit_unless_managed()
+
+    def rebuild(self):
+        """
+        Recalculates related Questions for every Question, using an
+        inverted index of Question features to avoid comparing every
+        pair of Questions.
+        """
+        index = SparseIndex(settings.RELATED_QUESTION_MAX_POSTINGS)
+        for id, title, tagnames in Question.objects.filter(
+                deleted=False).values_list('id', 'title',
+                                           'tagnames').iterator():
+            index.add(id, question_features(title, tagnames))
+
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM soclone_relatedquestion')
+        inserts = []
+        for id in index.vectors:
+            for similarity, related_id in index.top_similar(
+                    id, settings.RELATED_QUESTION_COUNT):
+                inserts.append((id, related_id, similarity))
+            if len(inserts) >= 1000:
+                cursor.executemany(self.INSERT_QUERY, inserts)
+                inserts = []
+        if inserts:
+            cursor.executemany(self.INSERT_QUERY, inserts)
+        transaction.commit_unless_managed()
+
+class RelatedQuestion(models.Model):
+    """A Question which is similar to another Question."""
+    question   = models.ForeignKey(Question, related_name='related_questions')
+    related    = models.ForeignKey(Question, related_name='related_to')
+    similarity = models.FloatField()
+
+    objects = RelatedQuestionManager()
+
+    class Meta:
+        ordering = ('-similarity',)
+
+class DuplicateBucketManager(models.Manager):
+    CANDIDATES_QUERY = (
+        'SELECT soclone_question.id, soclone_question.title, COUNT(*) '
+        'FROM soclone_duplicatebucket '
+        'INNER JOIN soclone_question '
+            'ON soclone_question.id = soclone_duplicatebucket.question_id '
+        'WHERE soclone_duplicatebucket.bucket IN (%s) '
+          'AND soclone_question.deleted = %%s '
+          '%s'
+        'GROUP BY soclone_question.id, soclone_question.title '
+        'HAVING COUNT(*) >= %%s '
+        'ORDER BY COUNT(*) DESC, soclone_question.id DESC '
+        'LIMIT %%s')
+    CLUSTER_PAIRS_QUERY = (
+        'SELECT a.question_id, b.question_id '
+        'FROM soclone_duplicatebucket a '
+        'INNER JOIN soclone_duplicatebucket b '
+            'ON b.bucket = a.bucket AND b.question_id > a.question_id '
+        'GROUP BY a.question_id, b.question_id '
+        'HAVING COUNT(*) >= %s')
+    INSERT_QUERY = (
+        'INSERT INTO soclone_duplicatebucket (question_id, bucket) '
+        'VALUES (%s, %s)')
+
+    def update_for_question(self, question_id, title, html):
+        """
+        Replaces the duplicate detection buckets for the Question with the
+        given id, based on its title and HTML.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'DELETE FROM soclone_duplicatebucket WHERE question_id = %s',
+            [question_id])
+        cursor.executemany(self.INSERT_QUERY,
+            [(question_id, bucket)
+             for bucket in set(minhash.buckets(duplicate_text(title, html)))])
+        transaction.commit_unless_managed()
+
+    def find_candidates(self, title, html, exclude_id=None):
+        """
+        Finds existing Questions which may be duplicates of a Question
+        with the given title and HTML, using a single query against the
+        bucket index.
+
+        Returns a list of (id, title, matching bucket count) three-tuples,
+        most likely duplicate first.
+        """
+        buckets = list(set(minhash.buckets(duplicate_text(title, html))))
+        params = buckets + [False]
+        exclude = ''
+        if exclude_id is not None:
+            exclude = 'AND soclone_question.id <> %s '
+            params.append(exclude_id)
+        params.extend([settings.DUPLICATE_MIN_MATCHING_BUCKETS,
+                       settings.DUPLICATE_CANDIDATE_COUNT])
+        cursor = connection.cursor()
+        cursor.execute(self.CANDIDATES_QUERY % (
+            ', '.join(['%s'] * len(buckets)), exclude), params)
+        return cursor.fetchall()
+
+    def find_clusters(self, min_matching_buckets):
+        """
+        Finds clusters of Questions which may be duplicates of each other
+        across the whole index - any two Questions which share at least
+        the given number of buckets are placed in the same cluster.
+
+        Returns a list of lists of Question ids.
+        """
+        cursor = connection.cursor()
+        cursor.execute(self.CLUSTER_PAIRS_QUERY, [min_matching_buckets])
+        # Union-find, with path halving
+        parents = {}
+        def find(id):
+            parents.setdefault(id, id)
+            while parents[id] != id:
+                parents[id] = parents[parents[id]]
+                id = parents[id]
+            return id
+        for a, b in cursor.fetchall():
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parents[max(root_a, root_b)] = min(root_a, root_b)
+        clusters = {}
+        for id in parents:
+            clusters.setdefault(find(id), []).append(id)
+        return [sorted(ids) for ids in clusters.itervalues()]
+
+    def rebuild(self):
+        """Recreates the duplicate detection buckets for all Questions."""
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM soclone_duplicatebucket')
+        inserts = []
+        for id, title, html in Question.objects.filter(
+                deleted=False).values_list('id', 'title', 'html').iterator():
+            inserts.extend([(id, bucket) for bucket in
+                set(minhash.buckets(duplicate_text(title, html)))])
+            if len(inserts) >= 1000:
+                cursor.executemany(self.INSERT_QUERY, inserts)
+                inserts = []
+        if inserts:
+            cursor.executemany(self.INSERT_QUERY, inserts)
+        transaction.commit_unless_managed()
+
+def duplicate_text(title, html):
+    """Creates the text used to compare Questions for duplication."""
+    return u'%s %s' % (title, strip_tags(html))
+
+class DuplicateBucket(models.Model):
+    """
+    A locality-sensitive hash bucket which a Question's text falls into,
+    used to find potential duplicate Questions.
+    """
+    question = models.ForeignKey(Question, related_name='duplicate_buckets')
+    bucket   = models.IntegerField(db_index=True)
+
+    objects = DuplicateBucketManager()
+
 class QuestionRevision(models.Model):
     """A revision of a Question."""
     question   = models.ForeignKey(Question, related_name='revisions')
@@ -244,11 +899,60 @@ class AnswerManager(models.Manager):
         Retrieves visibile answers for the given question. Delete answers
         are only visibile to the person who deleted them.
         """
+        # These conditions match the partial indexes defined for Answers
+        # in sql/answer.sql exactly, so they can be used.
         if user is None or not user.is_authenticated():
-            return self.filter(question=question, deleted=False)
+            return self.filter(question=question).extra(
+                where=['NOT soclone_answer.deleted'])
         else:
-            return self.filter(Q(question=question),
-                               Q(deleted=False) | Q(deleted_by=user))
+            return self.filter(question=question).extra(
+                where=['(NOT soclone_answer.deleted OR '
+                       'soclone_answer.deleted_by_id = %s)'],
+                params=[user.id])
+
+    def soft_delete(self, answer, user):
+        """
+        Deletes an Answer while keeping it and everything related to it
+        in the database, so it can be undeleted.
+
+        Its votes and comments stay in place to be restored on
+        undeletion, but can't be added to while it's deleted. Its
+        Question's answer count and unanswered status are updated.
+
+        Returns ``True`` if the Answer was deleted, ``False`` if it had
+        already been deleted.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE soclone_answer '
+            'SET deleted = %s, deleted_at = %s, deleted_by_id = %s '
+            'WHERE id = %s AND deleted = %s',
+            [True, datetime.datetime.now(), user.id, answer.id, False])
+        deleted = cursor.rowcount > 0
+        if deleted:
+            ModerationQueueItem.objects.resolve_for_post(Answer, answer.id)
+        transaction.commit_unless_managed()
+        if deleted:
+            Question.objects.adjust_answer_count(answer.question_id, -1)
+        return deleted
+
+    def undelete(self, answer):
+        """
+        Undeletes an Answer.
+
+        Returns ``True`` if the Answer was undeleted, ``False`` if it
+        wasn't deleted.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE soclone_answer '
+            'SET deleted = %s, deleted_at = NULL, deleted_by_id = NULL '
+            'WHERE id = %s AND deleted = %s', [False, answer.id, True])
+        undeleted = cursor.rowcount > 0
+        transaction.commit_unless_managed()
+        if undeleted:
+            Question.objects.adjust_answer_count(answer.question_id, 1)
+        return undeleted
 
 class Answer(models.Model):
     """An answer to a Question."""
@@ -260,6 +964,7 @@ class Answer(models.Model):
     wikified_at = models.DateTimeField(null=True, blank=True)
     accepted    = models.BooleanField(default=False)
     deleted     = models.BooleanField(default=False)
+    deleted_at  = models.DateTimeField(null=True, blank=True)
     deleted_by  = models.ForeignKey(User, null=True, blank=True, related_name='deleted_answers')
     locked      = models.BooleanField(default=False)
     locked_by   = models.ForeignKey(User, null=True, blank=True, related_name='locked_answers')
@@ -268,6 +973,8 @@ class Answer(models.Model):
     score                = models.IntegerField(default=0)
     comment_count        = models.PositiveIntegerField(default=0)
     offensive_flag_count = models.SmallIntegerField(default=0)
+    author_edit_count    = models.PositiveIntegerField(default=0)
+    editor_count         = models.PositiveIntegerField(default=0)
     last_edited_at       = models.DateTimeField(null=True, blank=True)
     last_edited_by       = models.ForeignKey(User, null=True, blank=True, related_name='last_edited_answers')
     html                 = models.TextField()
@@ -277,6 +984,9 @@ class Answer(models.Model):
     def get_absolute_url(self):
         return reverse('answer', args=[self.id])
 
+    def get_revision_url(self):
+        return reverse('answer_revisions', args=[self.id])
+
     def get_latest_revision(self):
         """Convenience method to grab the latest revision."""
         return self.revisions.all()[0]
@@ -301,52 +1011,154 @@ class AnswerRevision(models.Model):
                                                 flat=True)[0] + 1
         super(AnswerRevision, self).save(**kwargs)
 
-class VoteManager(models.Manager):
-    def get_for_question_and_answers(self, user, question, answers):
+class PostEditorManager(models.Manager):
+    def record_edit(self, post, user, body_edited=True):
         """
-        Attempts to retrieve votes made by a User for a Question and some
-        of its Answers.
+        Records an edit to a Question or Answer by the given User, updating
+        its count of edits by its author or of distinct other editors.
 
-        Returns a two-tuple of (Question Vote, Answer Vote dict), where
-        the Question Vote will be ``None`` if no Vote was present and the
-        Answer Vote dict is keyed with Answer ids and contains ``None``
-        when a Vote was not present for a particular Answer.
+        Only edits which changed the body of a post count towards its
+        author's edit count.
         """
-        question_vote = None
-        answer_votes = collections.defaultdict(lambda: None)
+        content_type = ContentType.objects.get_for_model(post)
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE soclone_posteditor SET edit_count = edit_count + 1 '
+            'WHERE content_type_id = %s AND object_id = %s AND user_id = %s',
+            [content_type.id, post.id, user.id])
+        new_editor = cursor.rowcount == 0
+        if new_editor:
+            cursor.execute(
+                'INSERT INTO soclone_posteditor '
+                '(content_type_id, object_id, user_id, edit_count) '
+                'VALUES (%s, %s, %s, %s)',
+                [content_type.id, post.id, user.id, 1])
+
+        counter = None
+        if user.id == post.author_id:
+            if body_edited:
+                counter = 'author_edit_count'
+        elif new_editor:
+            counter = 'editor_count'
+        if counter is not None:
+            cursor.execute('UPDATE %s SET %s = %s + 1 WHERE id = %%s' % (
+                post._meta.db_table, counter, counter), [post.id])
+        transaction.commit_unless_managed()
 
-        # No need to check the database for anonymous users
-        if not user.is_authenticated():
-            return question_vote, answer_votes
+    def wikify_if_edited(self, post, author_edit_count, editor_count,
+                         wikified_at):
+        """
+        Puts a Question or Answer into wiki mode if it has been edited by
+        its author or by distinct other editors at least the given number
+        of times.
 
-        question_ct = ContentType.objects.get_for_model(Question)
+        Returns ``True`` if the post was put into wiki mode.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE %s SET wiki = %%s, wikified_at = %%s '
+            'WHERE id = %%s AND wiki = %%s '
+              'AND (author_edit_count >= %%s OR editor_count >= %%s)' %
+            post._meta.db_table,
+            [True, wikified_at, post.id, False, author_edit_count,
+             editor_count])
+        wikified = cursor.rowcount > 0
+        transaction.commit_unless_managed()
+        return wikified
+
+    REBUILD_EDITORS_QUERY = (
+        'INSERT INTO soclone_posteditor '
+        '(content_type_id, object_id, user_id, edit_count) '
+        'SELECT %%s, %(post)s_id, author_id, COUNT(*) '
+        'FROM soclone_%(post)srevision '
+        'WHERE revision > 1 '
+        'GROUP BY %(post)s_id, author_id')
+    REBUILD_COUNTS_QUERY = (
+        'UPDATE soclone_%(post)s SET '
+        'author_edit_count = COALESCE(('
+            'SELECT edit_count FROM soclone_posteditor '
+            'WHERE content_type_id = %%s '
+              'AND object_id = soclone_%(post)s.id '
+              'AND user_id = soclone_%(post)s.author_id'
+        '), 0), '
+        'editor_count = ('
+            'SELECT COUNT(*) FROM soclone_posteditor '
+            'WHERE content_type_id = %%s '
+              'AND object_id = soclone_%(post)s.id '
+              'AND user_id <> soclone_%(post)s.author_id'
+        ')')
+
+    def rebuild(self):
+        """
+        Recreates all editor records and edit counters from Question and
+        Answer revisions. Every revision after the first is counted as an
+        edit to the body of the post.
+        """
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM soclone_posteditor')
+        for model, post in ((Question, 'question'), (Answer, 'answer')):
+            content_type_id = ContentType.objects.get_for_model(model).id
+            cursor.execute(self.REBUILD_EDITORS_QUERY % {'post': post},
+                           [content_type_id])
+            cursor.execute(self.REBUILD_COUNTS_QUERY % {'post': post},
+                           [content_type_id, content_type_id])
+        transaction.commit_unless_managed()
 
-        # Simpler case when only retrieving votes for a Question
-        if not answers:
-            try:
-                question_vote = self.get(
-                    content_type = question_ct,
-                    object_id    = question.id,
-                    user         = user
-                )
-            except Vote.DoesNotExist:
-                pass
-            return question_vote, answer_votes
+class PostEditor(models.Model):
+    """A User who has edited a Question or Answer."""
+    content_type   = models.ForeignKey(ContentType)
+    object_id      = models.PositiveIntegerField()
+    content_object = generic.GenericForeignKey('content_type', 'object_id')
+    user           = models.ForeignKey(User, related_name='edited_posts')
+    edit_count     = models.PositiveIntegerField(default=0)
 
+    objects = PostEditorManager()
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'user')
+
+class VoteManager(models.Manager):
+    INTERACTION_STATE_QUERY = (
+        'SELECT content_type_id, object_id, vote FROM soclone_vote '
+        'WHERE user_id = %s AND ('
+            '(content_type_id = %s AND object_id = %s) OR '
+            '(content_type_id = %s AND object_id IN ('
+                'SELECT id FROM soclone_answer WHERE question_id = %s'
+            '))'
+        ') '
+        'UNION ALL '
+        'SELECT 0, question_id, 0 FROM soclone_favouritequestion '
+        'WHERE user_id = %s AND question_id = %s')
+
+    def get_interaction_state(self, user, question_id):
+        """
+        Retrieves the state of a User's interactions with a Question and
+        all of its Answers with a single query.
+
+        Returns a dict containing the User's Question vote (``None`` if
+        they haven't voted on it), a dict of their Answer votes keyed by
+        Answer id and whether or not they have favourited the Question.
+        Votes are given as ``Vote.VOTE_UP`` or ``Vote.VOTE_DOWN``.
+        """
+        question_ct = ContentType.objects.get_for_model(Question)
         answer_ct = ContentType.objects.get_for_model(Answer)
-        votes = self.filter(
-            Q(content_type=question_ct, object_id=question.id) |
-            Q(content_type=answer_ct,
-              object_id__in=[answer.id for answer in answers]),
-            user = user
-        )
-
-        for vote in votes:
-            if vote.content_type_id == answer_ct.id:
-                answer_votes[vote.object_id] = vote
+        state = {
+            'question_vote': None,
+            'answer_votes': {},
+            'favourite': False,
+        }
+        cursor = connection.cursor()
+        cursor.execute(self.INTERACTION_STATE_QUERY, [
+            user.id, question_ct.id, question_id, answer_ct.id, question_id,
+            user.id, question_id])
+        for content_type_id, object_id, vote in cursor.fetchall():
+            if content_type_id == answer_ct.id:
+                state['answer_votes'][object_id] = vote
+            elif content_type_id == question_ct.id:
+                state['question_vote'] = vote
             else:
-                question_vote = vote
-        return question_vote, answer_votes
+                state['favourite'] = True
+        return state
 
 class Vote(models.Model):
     """An up or down vote on a Question or Answer."""
@@ -392,6 +1204,8 @@ def update_post_score(instance, **kwargs):
             'post_table': instance.content_type.model_class()._meta.db_table,
         }, [instance.content_type_id, instance.object_id])
     transaction.commit_unless_managed()
+    if instance.content_type.model_class() is Answer:
+        Question.objects.update_unanswered_for_answer(instance.object_id)
 
 post_save.connect(update_post_score, sender=Vote)
 post_delete.connect(update_post_score, sender=Vote)
@@ -441,27 +1255,177 @@ class FlaggedItem(models.Model):
     class Meta:
         unique_together = ('content_type', 'object_id', 'user')
 
-def update_post_offensive_flag_count(instance, **kwargs):
+# Weights used when prioritising flagged posts for moderation
+FLAG_COUNT_WEIGHT = 1.0
+FLAG_VELOCITY_WEIGHT = 2.0
+POST_RECENCY_WEIGHT = 5.0
+
+def moderation_priority(flag_count, first_flagged_at, flagged_at,
+                        post_added_at):
     """
-    Updates the offensive flag count for the Question or Answer related
-    to the given FlaggedItem.
+    Calculates the priority of a flagged post in the moderation queue.
+
+    Posts with more flags, which are being flagged more quickly and which
+    were posted more recently are given a higher priority.
     """
-    if kwargs.get('raw', False):
-        return
+    flagging_time = flagged_at - first_flagged_at
+    flagging_hours = max(flagging_time.days * 24 +
+                         flagging_time.seconds / 3600.0, 1.0)
+    post_age_days = max((flagged_at - post_added_at).days, 0)
+    return (FLAG_COUNT_WEIGHT * flag_count +
+            FLAG_VELOCITY_WEIGHT * flag_count / flagging_hours +
+            POST_RECENCY_WEIGHT / (1.0 + post_age_days))
+
+class ModerationQueueItemManager(models.Manager):
+    def record_flags(self, content_type_id, object_id, flag_count,
+                     flagged_at, post_added_at, hidden):
+        """
+        Updates the moderation queue entry for a Question or Answer with
+        its current offensive flag count, creating the entry if this is
+        the first time the post has been flagged or removing it if the
+        post no longer has any flags.
+        """
+        cursor = connection.cursor()
+        if not flag_count:
+            cursor.execute(
+                'DELETE FROM soclone_moderationqueueitem '
+                'WHERE content_type_id = %s AND object_id = %s',
+                [content_type_id, object_id])
+            return
+
+        cursor.execute(
+            'SELECT first_flagged_at FROM soclone_moderationqueueitem '
+            'WHERE content_type_id = %s AND object_id = %s',
+            [content_type_id, object_id])
+        row = cursor.fetchone()
+        if row is None:
+            first_flagged_at = flagged_at
+        else:
+            first_flagged_at = row[0]
+        priority = moderation_priority(flag_count, first_flagged_at,
+                                       flagged_at, post_added_at)
+        if row is None:
+            cursor.execute(
+                'INSERT INTO soclone_moderationqueueitem '
+                '(content_type_id, object_id, flag_count, first_flagged_at, '
+                 'last_flagged_at, priority, hidden, resolved) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s, %s)',
+                [content_type_id, object_id, flag_count, flagged_at,
+                 flagged_at, priority, hidden, False])
+        else:
+            # New flags put a post back into the queue
+            cursor.execute(
+                'UPDATE soclone_moderationqueueitem '
+                'SET flag_count = %s, last_flagged_at = %s, priority = %s, '
+                    'hidden = %s, resolved = %s '
+                'WHERE content_type_id = %s AND object_id = %s',
+                [flag_count, flagged_at, priority, hidden, False,
+                 content_type_id, object_id])
+
+    def resolve_for_post(self, model, object_id):
+        """Resolves the queue entry for a Question or Answer."""
+        self.filter(content_type=ContentType.objects.get_for_model(model),
+                    object_id=object_id).update(resolved=True)
+
+    def resolve_for_question(self, question_id):
+        """
+        Resolves the queue entries for a Question and all of its Answers
+        with a single query.
+        """
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE soclone_moderationqueueitem SET resolved = %s '
+            'WHERE (content_type_id = %s AND object_id = %s) '
+               'OR (content_type_id = %s AND object_id IN ('
+                   'SELECT id FROM soclone_answer WHERE question_id = %s))',
+            [True, ContentType.objects.get_for_model(Question).id,
+             question_id, ContentType.objects.get_for_model(Answer).id,
+             question_id])
+
+class ModerationQueueItem(models.Model):
+    """
+    A Question or Answer which has been flagged as offensive, awaiting
+    attention from a moderator.
+
+    Entries are kept up to date as flags are added, so the queue can be
+    read in priority order using the partial index defined in
+    sql/moderationqueueitem.sql.
+    """
+    content_type     = models.ForeignKey(ContentType)
+    object_id        = models.PositiveIntegerField()
+    content_object   = generic.GenericForeignKey('content_type', 'object_id')
+    flag_count       = models.PositiveIntegerField(default=0)
+    first_flagged_at = models.DateTimeField()
+    last_flagged_at  = models.DateTimeField()
+    priority         = models.FloatField(default=0)
+    hidden           = models.BooleanField(default=False)
+    resolved         = models.BooleanField(default=False)
+
+    objects = ModerationQueueItemManager()
+
+    class Meta:
+        ordering = ('-priority',)
+        unique_together = ('content_type', 'object_id')
+
+def update_post_offensive_flag_count(instance, delta):
+    """
+    Applies a change in offensive flag count caused by the addition or
+    removal of the given FlaggedItem to its Question or Answer and to the
+    moderation queue, without recounting flags.
+
+    Posts which reach ``OFFENSIVE_FLAG_HIDE_THRESHOLD`` flags are hidden by
+    deleting them on behalf of the User whose flag hid them, adjusting
+    the same denormalised counts as ``soft_delete``. They stay in the
+    moderation queue until a moderator resolves them.
+    """
+    post_model = instance.content_type.model_class()
+    post_table = post_model._meta.db_table
     cursor = connection.cursor()
     cursor.execute(
-        'UPDATE %(post_table)s SET offensive_flag_count = ('
-            'SELECT COUNT(*) from soclone_flaggeditem '
-            'WHERE soclone_flaggeditem.content_type_id = %%s '
-              'AND soclone_flaggeditem.object_id = %(post_table)s.id'
-        ') '
-        'WHERE id = %%s' % {
-            'post_table': instance.content_type.model_class()._meta.db_table,
-        }, [instance.content_type_id, instance.object_id])
+        'UPDATE %s SET offensive_flag_count = offensive_flag_count + %%s '
+        'WHERE id = %%s' % post_table, [delta, instance.object_id])
+    cursor.execute(
+        'SELECT offensive_flag_count, added_at FROM %s '
+        'WHERE id = %%s' % post_table, [instance.object_id])
+    row = cursor.fetchone()
+    if row is None:
+        transaction.commit_unless_managed()
+        return
+    flag_count, post_added_at = row
+
+    hidden = False
+    if delta > 0 and flag_count >= settings.OFFENSIVE_FLAG_HIDE_THRESHOLD:
+        cursor.execute(
+            'UPDATE %s '
+            'SET deleted = %%s, deleted_at = %%s, deleted_by_id = %%s '
+            'WHERE id = %%s AND deleted = %%s' % post_table,
+            [True, instance.flagged_at, instance.user_id, instance.object_id,
+             False])
+        hidden = cursor.rowcount > 0
+        if hidden and post_model is Question:
+            cursor.execute(Tag.objects.ADJUST_USE_COUNTS_QUERY,
+                           [-1, instance.object_id])
+
+    ModerationQueueItem.objects.record_flags(instance.content_type_id,
+        instance.object_id, flag_count, instance.flagged_at, post_added_at,
+        hidden)
     transaction.commit_unless_managed()
 
-post_save.connect(update_post_offensive_flag_count, sender=FlaggedItem)
-post_delete.connect(update_post_offensive_flag_count, sender=FlaggedItem)
+    if hidden and post_model is Answer:
+        Question.objects.adjust_answer_count(Answer.objects.filter(
+            id=instance.object_id).values_list('question_id', flat=True)[0],
+            -1)
+
+def add_post_offensive_flag(instance, created, **kwargs):
+    if kwargs.get('raw', False) or not created:
+        return
+    update_post_offensive_flag_count(instance, 1)
+
+def remove_post_offensive_flag(instance, **kwargs):
+    update_post_offensive_flag_count(instance, -1)
+
+post_save.connect(add_post_offensive_flag, sender=FlaggedItem)
+post_delete.connect(remove_post_offensive_flag, sender=FlaggedItem)
 
 class Badge(models.Model):
     """Awarded for notable actions performed on the site by Users."""
@@ -527,12 +1491,211 @@ def update_badge_award_counts(instance, **kwargs):
             'SELECT COUNT(*) FROM soclone_award '
             'WHERE soclone_award.badge_id = soclone_badge.id'
         ') '
-        'WHERE id = %%s', [instance.badge_id])
+        'WHERE id = %s', [instance.badge_id])
     transaction.commit_unless_managed()
 
 post_save.connect(update_badge_award_counts, sender=Award)
 post_delete.connect(update_badge_award_counts, sender=Award)
 
+class ActivityManager(models.Manager):
+    INSERT_QUERY = (
+        'INSERT INTO soclone_activity '
+        '(user_id, question_id, type, content_type_id, object_id, '
+         'occurred_at) '
+        'VALUES (%s, %s, %s, %s, %s, %s)')
+    PRUNE_QUERY = (
+        'DELETE FROM soclone_activity WHERE id IN ('
+            'SELECT id FROM soclone_activity '
+            'WHERE occurred_at < %%s%s '
+            'LIMIT %%s'
+        ')')
+
+    def insert_many(self, rows):
+        """
+        Inserts Activities from a list of (user id, Question id, type,
+        ContentType id, object id, occurred at) six-tuples in one batch.
+        """
+        if not rows:
+            return
+        cursor = connection.cursor()
+        cursor.executemany(self.INSERT_QUERY, rows)
+        transaction.commit_unless_managed()
+
+    def prune(self, before, types=None, chunk_size=1000):
+        """
+        Deletes Activities which occurred before the given datetime,
+        optionally restricted to the given types, a chunk at a time.
+
+        Returns the number of Activities deleted.
+        """
+        type_condition = ''
+        params = [before]
+        if types:
+            type_condition = ' AND type IN (%s)' % ','.join(['%s'] * len(types))
+            params.extend(types)
+        params.append(chunk_size)
+        query = self.PRUNE_QUERY % type_condition
+        cursor = connection.cursor()
+        deleted = 0
+        while True:
+            cursor.execute(query, params)
+            transaction.commit_unless_managed()
+            if cursor.rowcount <= 0:
+                break
+            deleted += cursor.rowcount
+        return deleted
+
+class Activity(models.Model):
+    """
+    Something a User did, recorded in an append-only log.
+
+    The log is read newest first by User and by Question using the
+    composite indexes defined in sql/activity.sql, paging by id.
+    """
+    ASKED     = 1
+    ANSWERED  = 2
+    EDITED    = 3
+    COMMENTED = 4
+    VOTED     = 5
+    AWARDED   = 6
+    TYPE_CHOICES = (
+        (ASKED,     u'asked'),
+        (ANSWERED,  u'answered'),
+        (EDITED,    u'edited'),
+        (COMMENTED, u'commented'),
+        (VOTED,     u'voted'),
+        (AWARDED,   u'awarded'),
+    )
+
+    user           = models.ForeignKey(User, related_name='activities')
+    question       = models.ForeignKey(Question, null=True, blank=True, related_name='activities')
+    type           = models.SmallIntegerField(choices=TYPE_CHOICES)
+    content_type   = models.ForeignKey(ContentType)
+    object_id      = models.PositiveIntegerField()
+    content_object = generic.GenericForeignKey('content_type', 'object_id')
+    occurred_at    = models.DateTimeField(default=datetime.datetime.now, db_index=True)
+
+    objects = ActivityManager()
+
+    class Meta:
+        ordering = ('-id',)
+
+class NotificationManager(models.Manager):
+    INSERT_QUERY = (
+        'INSERT INTO soclone_notification '
+        '(user_id, question_id, type, content_type_id, object_id, '
+         'created_at, read) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s)')
+    UNNOTIFIED_AWARDS_QUERY = (
+        'SELECT id, user_id, badge_id, awarded_at FROM soclone_award '
+        'WHERE NOT notified ORDER BY id LIMIT %s')
+    CLAIM_AWARDS_QUERY = (
+        'UPDATE soclone_award SET notified = %%s '
+        'WHERE id IN (%s) AND NOT notified')
+
+    def insert_many(self, rows):
+        """
+        Inserts Notifications from a list of (User id, Question id, type,
+        ContentType id, object id, created at) six-tuples in one batch.
+        """
+        if not rows:
+            return
+        cursor = connection.cursor()
+        cursor.executemany(self.INSERT_QUERY,
+                           [tuple(row) + (False,) for row in rows])
+        transaction.commit_unless_managed()
+
+    def unread(self, user_id):
+        """
+        Creates a QuerySet of the given User's unread Notifications, using
+        a condition which matches the partial index defined in
+        sql/notification.sql.
+        """
+        return self.filter(user=user_id).extra(
+            where=['NOT soclone_notification.read'])
+
+    def unread_count(self, user_id):
+        return self.unread(user_id).count()
+
+    def mark_read(self, user_id, ids=None):
+        """
+        Marks the given User's Notifications as read in a single query -
+        all of them, or only those with the given ids.
+
+        Returns the number of Notifications which were marked as read.
+        """
+        query = ('UPDATE soclone_notification SET read = %s '
+                 'WHERE user_id = %s AND NOT read')
+        params = [True, user_id]
+        if ids is not None:
+            if not ids:
+                return 0
+            query += ' AND id IN (%s)' % ','.join(['%s'] * len(ids))
+            params.extend(ids)
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        transaction.commit_unless_managed()
+        return cursor.rowcount
+
+    def dispatch_awards(self, chunk_size=1000):
+        """
+        Creates Notifications for up to ``chunk_size`` Awards which Users
+        haven't been notified of yet, marking the Awards as notified in
+        the same transaction.
+
+        Returns a list of the ids of the Users who were notified, with an
+        id for each Notification created.
+        """
+        cursor = connection.cursor()
+        while True:
+            cursor.execute(self.UNNOTIFIED_AWARDS_QUERY, [chunk_size])
+            awards = cursor.fetchall()
+            if not awards:
+                break
+            cursor.execute(
+                self.CLAIM_AWARDS_QUERY % ','.join(['%s'] * len(awards)),
+                [True] + [award[0] for award in awards])
+            if cursor.rowcount == len(awards):
+                badge_type_id = ContentType.objects.get_for_model(Badge).id
+                cursor.executemany(self.INSERT_QUERY, [
+                    (user_id, None, Notification.BADGE_AWARDED,
+                     badge_type_id, badge_id, awarded_at, False)
+                    for award_id, user_id, badge_id, awarded_at in awards])
+                break
+            # Another process claimed some of the Awards first - let it
+            # have them and try again with the ones which are left.
+            transaction.rollback_unless_managed()
+        transaction.commit_unless_managed()
+        return [award[1] for award in awards]
+
+class Notification(models.Model):
+    """
+    Tells a User about something which happened while they weren't
+    looking.
+    """
+    BADGE_AWARDED = 1
+    NEW_ANSWER    = 2
+    NEW_COMMENT   = 3
+    TYPE_CHOICES = (
+        (BADGE_AWARDED, u'You were awarded the badge'),
+        (NEW_ANSWER,    u'New answer to your question'),
+        (NEW_COMMENT,   u'New comment on your post in'),
+    )
+
+    user           = models.ForeignKey(User, related_name='notifications')
+    question       = models.ForeignKey(Question, null=True, blank=True, related_name='notifications')
+    type           = models.SmallIntegerField(choices=TYPE_CHOICES)
+    content_type   = models.ForeignKey(ContentType)
+    object_id      = models.PositiveIntegerField()
+    content_object = generic.GenericForeignKey('content_type', 'object_id')
+    created_at     = models.DateTimeField(default=datetime.datetime.now)
+    read           = models.BooleanField(default=False)
+
+    objects = NotificationManager()
+
+    class Meta:
+        ordering = ('-id',)
+
 #                .-"""-.
 #              _/-=-.   \
 #             (_|a a/   |_
@@ -572,6 +1735,25 @@ def update_reputation(manager, changes):
 
 UserManager.update_reputation = update_reputation
 
+def update_last_seen(manager, seen, chunk_size=500):
+    """
+    Updates when Users were last seen, where times are specified as
+    two-tuples of (User id, last seen datetime), with a query per
+    ``chunk_size`` Users.
+    """
+    cursor = connection.cursor()
+    for i in xrange(0, len(seen), chunk_size):
+        chunk = seen[i:i + chunk_size]
+        cursor.execute(
+            'UPDATE auth_user SET last_seen = CASE %s ELSE last_seen END '
+            'WHERE id IN (%s)' % (
+            ' '.join(['WHEN id = %s THEN %s'] * len(chunk)),
+            ','.join(['%s'] * len(chunk))),
+            flatten(chunk) + [c[0] for c in chunk])
+    transaction.commit_unless_managed()
+
+UserManager.update_last_seen = update_last_seen
+
 # Monkeypatch additional profile fields into User
 QUESTIONS_PER_PAGE_CHOICES = (
    (10, u'10'),
@@ -0,0 +1,152 @@
+"""
+Notifications telling Users about things which happened while they
+weren't looking - Badges they were awarded, Answers to their Questions
+and Comments on their posts.
+
+Notifications for events in views are queued in memory and delivered in
+batches, once ``NOTIFICATION_BATCH_SIZE`` have been queued or the oldest
+has been waiting for ``NOTIFICATION_DISPATCH_INTERVAL`` seconds. Awards
+are picked up in batches by bin/dispatch-notifications.py.
+
+Each User's unread count is kept in the cache, so it can be displayed on
+every page without a query, and is deleted whenever Notifications are
+delivered to or read by the User, to be reloaded when next needed.
+
+Deleting a count is only seen by every process if the cache is shared
+between them, so counts aren't cached at all unless ``CACHE_BACKEND`` is a
+shared cache such as memcached.
+"""
+import atexit
+import datetime
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.template.defaultfilters import slugify
+
+from soclone.models import Badge, Notification
+from soclone.utils.buffer import BatchBuffer
+from soclone.utils.cache import is_shared_cache
+
+_queue = BatchBuffer(settings.NOTIFICATION_BATCH_SIZE,
+                     settings.NOTIFICATION_DISPATCH_INTERVAL)
+
+_enabled = is_shared_cache(settings.CACHE_BACKEND)
+
+def _cache_key(user_id):
+    return 'notifications:unread:%s' % user_id
+
+def unread_count(user):
+    """
+    Retrieves the number of unread Notifications for the given User,
+    loading and caching it if necessary.
+
+    Anonymous users always have none, without the database or cache
+    being used.
+    """
+    if not user.is_authenticated():
+        return 0
+    if not _enabled:
+        return Notification.objects.unread_count(user.id)
+    key = _cache_key(user.id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.unread_count(user.id)
+        cache.set(key, count, settings.NOTIFICATION_COUNT_TIMEOUT)
+    return count
+
+def _invalidate_unread_counts(user_ids):
+    """Deletes the cached unread counts of the Users with the given ids."""
+    if _enabled:
+        for user_id in set(user_ids):
+            cache.delete(_cache_key(user_id))
+
+def notify(user_id, notification_type, obj, question_id=None,
+           created_at=None):
+    """
+    Queues a Notification for the given User about the given object,
+    which relates to the Question with the given id, if any.
+    """
+    if created_at is None:
+        created_at = datetime.datetime.now()
+    _queue.append((user_id, question_id, notification_type,
+                   ContentType.objects.get_for_model(obj).id, obj.id,
+                   created_at))
+
+def dispatch(force=False):
+    """
+    Delivers queued Notifications if there are enough of them or they've
+    been waiting long enough, or if ``force`` is ``True``.
+    """
+    rows = _queue.take(force)
+    if rows:
+        Notification.objects.insert_many(rows)
+        _invalidate_unread_counts([row[0] for row in rows])
+
+atexit.register(dispatch, True)
+
+def dispatch_awards(chunk_size=1000):
+    """
+    Delivers Notifications for all Awards which Users haven't been
+    notified of yet, ``chunk_size`` at a time.
+
+    Returns the number of Notifications delivered.
+    """
+    delivered = 0
+    while True:
+        user_ids = Notification.objects.dispatch_awards(chunk_size)
+        if not user_ids:
+            break
+        _invalidate_unread_counts(user_ids)
+        delivered += len(user_ids)
+    return delivered
+
+def mark_read(user_id, ids=None):
+    """
+    Marks the given User's Notifications as read - all of them, or only
+    those with the given ids.
+
+    Returns the number of Notifications which were marked as read.
+    """
+    marked = Notification.objects.mark_read(user_id, ids)
+    if marked:
+        _invalidate_unread_counts([user_id])
+    return marked
+
+def describe(notifications):
+    """
+    Creates a list of dicts describing Notifications from a QuerySet of
+    them, using a query for Notifications and one for any Badges.
+    """
+    rows = list(notifications.values('id', 'type', 'question__id',
+        'question__title', 'object_id', 'created_at', 'read'))
+    badges = Badge.objects.in_bulk([row['object_id'] for row in rows
+        if row['type'] == Notification.BADGE_AWARDED])
+    types = dict(Notification.TYPE_CHOICES)
+    described = []
+    for row in rows:
+        item = {
+            'id': row['id'],
+            'type': types[row['type']],
+            'created_at': row['created_at'],
+            'read': row['read'],
+        }
+        if row['type'] == Notification.BADGE_AWARDED:
+            badge = badges.get(row['object_id'])
+            if badge is None:
+                continue
+            item['title'] = badge.name
+            item['url'] = badge.get_absolute_url()
+        elif row['question__id'] is not None:
+            item['title'] = row['question__title']
+            if row['type'] == Notification.NEW_ANSWER:
+                item['url'] = reverse('answer', args=[row['object_id']])
+            else:
+                item['url'] = '%s%s/' % (
+                    reverse('question', args=[row['question__id']]),
+                    slugify(row['question__title']))
+        else:
+            continue
+        described.append(item)
+    return described
@@ -0,0 +1,234 @@
+"""
+A pool of database connections which are kept open between requests.
+
+Django opens a database connection for each request and closes it when
+the request finishes. When ``DATABASE_POOL_SIZE`` is set,
+``ConnectionPoolMiddleware`` installs signal handlers which instead check
+a connection out of a pool for each request thread when the request
+starts, and return it to the pool when the request finishes.
+
+At most ``DATABASE_POOL_SIZE`` connections are open at once - when they
+are all checked out, requests wait up to ``DATABASE_POOL_TIMEOUT``
+seconds for one to be returned. Connections are replaced once they are
+``DATABASE_POOL_MAX_AGE`` seconds old, and checked with a simple query
+before being reused if they've been idle for ``DATABASE_POOL_CHECK_IDLE``
+seconds.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core import signals
+from django.db import close_connection, connection
+
+class PoolTimeout(Exception):
+    """Raised when no connection was returned to a full pool in time."""
+
+class ConnectionPool(object):
+    """
+    A thread-safe pool of at most ``max_size`` connections, created by
+    calling ``connect``.
+
+    Counts of checkouts, waits and other events are kept in ``stats``.
+    """
+    def __init__(self, connect, max_size, timeout=10, max_age=None,
+                 check_idle=None, check_query='SELECT 1'):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check_idle = check_idle
+        self.check_query = check_query
+        self._condition = threading.Condition()
+        # [connection, created at, returned at] lists, most recently
+        # returned last.
+        self._idle = []
+        # Maps ids of checked out connections to when they were created
+        self._created = {}
+        # Number of connections open or being opened
+        self._size = 0
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'recycled': 0,
+            'failed_checks': 0,
+        }
+
+    def _count(self, stat, amount=1):
+        self._condition.acquire()
+        try:
+            self.stats[stat] += amount
+        finally:
+            self._condition.release()
+
+    def checkout(self):
+        """
+        Checks out a connection, waiting for one to be returned if the
+        pool is full.
+        """
+        self._condition.acquire()
+        try:
+            self.stats['checkouts'] += 1
+            waiting_since = None
+            while not self._idle and self._size >= self.max_size:
+                now = time.time()
+                if waiting_since is None:
+                    waiting_since = now
+                    self.stats['waits'] += 1
+                remaining = self.timeout - (now - waiting_since)
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    self.stats['wait_time'] += now - waiting_since
+                    raise PoolTimeout('No database connection available '
+                                      'after %s seconds' % self.timeout)
+                self._condition.wait(remaining)
+            if waiting_since is not None:
+                self.stats['wait_time'] += time.time() - waiting_since
+            if self._idle:
+                entry = self._idle.pop()
+            else:
+                entry = None
+                self._size += 1
+        finally:
+            self._condition.release()
+
+        if entry is not None:
+            conn, created_at, returned_at = entry
+            if self._usable(conn, created_at, returned_at):
+                self._created[id(conn)] = created_at
+                return conn
+            self._close(conn)
+        # Open a new connection in the slot reserved or freed above
+        try:
+            conn = self.connect()
+        except:
+            self._release_slot()
+            raise
+        self._count('connects')
+        self._created[id(conn)] = time.time()
+        return conn
+
+    def _usable(self, conn, created_at, returned_at):
+        """
+        Determines whether or not an idle connection can be reused, based
+        on its age and, if it's been idle for long enough, whether it
+        responds to a query.
+        """
+        now = time.time()
+        if self.max_age is not None and now - created_at >= self.max_age:
+            self._count('recycled')
+            return False
+        if self.check_idle is not None and now - returned_at >= self.check_idle:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.check_query)
+                cursor.fetchall()
+                cursor.close()
+                conn.rollback()
+            except Exception:
+                self._count('failed_checks')
+                return False
+        return True
+
+    def checkin(self, conn):
+        """
+        Returns a checked out connection to the pool, rolling back anything
+        which wasn't committed. Connections which can't be rolled back are
+        closed instead.
+        """
+        created_at = self._created.pop(id(conn), None)
+        if created_at is None:
+            # Not one of ours
+            self._close(conn)
+            return
+        try:
+            conn.rollback()
+        except Exception:
+            self._close(conn)
+            self._release_slot()
+            return
+        self._condition.acquire()
+        try:
+            self._idle.append([conn, created_at, time.time()])
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def _release_slot(self):
+        self._condition.acquire()
+        try:
+            self._size -= 1
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        """Closes all idle connections."""
+        self._condition.acquire()
+        try:
+            idle = self._idle
+            self._idle = []
+            self._size -= len(idle)
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+        for conn, created_at, returned_at in idle:
+            self._close(conn)
+
+def open_connection():
+    """
+    Opens a new connection to the main database the way Django would, so
+    it's set up the same way.
+    """
+    connection.connection = None
+    connection.cursor().close()
+    conn = connection.connection
+    connection.connection = None
+    return conn
+
+_pool = None
+_install_lock = threading.Lock()
+
+def get_pool():
+    return _pool
+
+def checkout_connection(**kwargs):
+    """Gives the current thread a connection from the pool."""
+    if connection.connection is None:
+        connection.connection = _pool.checkout()
+
+def checkin_connection(**kwargs):
+    """Returns the current thread's connection to the pool."""
+    conn = connection.connection
+    if conn is not None:
+        connection.connection = None
+        _pool.checkin(conn)
+
+def install():
+    """
+    Creates the pool and replaces Django's closing of connections when
+    requests finish with checking them out and in.
+    """
+    global _pool
+    _install_lock.acquire()
+    try:
+        if _pool is not None:
+            return
+        _pool = ConnectionPool(open_connection, settings.DATABASE_POOL_SIZE,
+            timeout=settings.DATABASE_POOL_TIMEOUT,
+            max_age=settings.DATABASE_POOL_MAX_AGE,
+            check_idle=settings.DATABASE_POOL_CHECK_IDLE)
+        signals.request_finished.disconnect(close_connection)
+        signals.request_started.connect(checkout_connection)
+        signals.request_finished.connect(checkin_connection)
+    finally:
+        _install_lock.release()
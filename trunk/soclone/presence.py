@@ -0,0 +1,115 @@
+"""
+Tracking of when Users were last seen, without writing to the database on
+every request.
+
+Each process records the time it last saw each User in memory, ignoring
+Users it already recorded less than ``LAST_SEEN_INTERVAL`` seconds ago,
+so each User is written at most once per interval. A background thread
+writes pending times in bulk every ``LAST_SEEN_FLUSH_INTERVAL`` seconds.
+If ``LAST_SEEN_FLUSH_INTERVAL`` is ``None``, as it is when testing, times
+are written as they're recorded instead, and no thread is started.
+"""
+import atexit
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+
+_lock = threading.Lock()
+# Maps User ids to the last seen times which haven't been written yet
+_pending = {}
+# Maps User ids to the time they were last recorded by this process
+_recorded = {}
+_flusher = None
+# The database pending times are to be written to
+_database_name = None
+
+def record(user_id):
+    """Records that the User with the given id has just been seen."""
+    global _flusher, _database_name
+    now = time.time()
+    seen_at = datetime.datetime.now()
+    _lock.acquire()
+    try:
+        recorded_at = _recorded.get(user_id)
+        if (recorded_at is not None and
+            now - recorded_at < settings.LAST_SEEN_INTERVAL):
+            return
+        _recorded[user_id] = now
+        if settings.LAST_SEEN_FLUSH_INTERVAL is not None:
+            _pending[user_id] = seen_at
+            if _flusher is None:
+                _database_name = settings.DATABASE_NAME
+                _flusher = threading.Thread(target=_flush_periodically)
+                _flusher.setDaemon(True)
+                _flusher.start()
+            return
+    finally:
+        _lock.release()
+    User.objects.update_last_seen([(user_id, seen_at)])
+
+def _take_pending():
+    """
+    Empties and returns the pending last seen times, forgetting Users who
+    would be recorded again anyway the next time they're seen.
+    """
+    global _pending
+    cutoff = time.time() - settings.LAST_SEEN_INTERVAL
+    _lock.acquire()
+    try:
+        pending = _pending
+        _pending = {}
+        for user_id, recorded_at in _recorded.items():
+            if recorded_at < cutoff:
+                del _recorded[user_id]
+        return pending
+    finally:
+        _lock.release()
+
+def _restore_pending(pending):
+    """
+    Puts last seen times which couldn't be written back to be written
+    later, unless the User has been seen again since.
+    """
+    _lock.acquire()
+    try:
+        for user_id, seen_at in pending.items():
+            _pending.setdefault(user_id, seen_at)
+    finally:
+        _lock.release()
+
+def flush():
+    """Writes all pending last seen times."""
+    pending = _take_pending()
+    if pending:
+        try:
+            User.objects.update_last_seen(pending.items())
+        except Exception:
+            _restore_pending(pending)
+            raise
+
+def _flush_at_exit():
+    # Don't write to a different database from the one the times were
+    # recorded against, such as the real database once a test run has
+    # destroyed its test database.
+    if _database_name == settings.DATABASE_NAME:
+        flush()
+
+atexit.register(_flush_at_exit)
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.LAST_SEEN_FLUSH_INTERVAL)
+        try:
+            try:
+                flush()
+            except Exception:
+                # The times are kept to be written next time, which isn't
+                # worth stopping the thread over.
+                pass
+        finally:
+            # Each thread has its own database connection
+            connection.close()
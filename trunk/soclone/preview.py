@@ -0,0 +1,77 @@
+"""
+Rendering of Markdown-formatted user input for previews.
+
+Rendered previews are cached by the hash of the input text, and
+concurrent requests to render the same text are coalesced so that only
+one of them performs the conversion and sanitisation while the others
+wait for its result.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from markdown2 import Markdown
+
+from soclone.utils.cache import LRUCache
+from soclone.utils.html import sanitize_html
+
+_previews = LRUCache(settings.PREVIEW_CACHE_SIZE)
+_in_progress = {}
+_lock = threading.Lock()
+
+class PreviewTooLong(Exception):
+    pass
+
+def render_markdown(text):
+    """Converts Markdown-formatted text to sanitised HTML."""
+    # Markdown instances hold state while converting, so a new one is used
+    # for each conversion rather than sharing one between threads.
+    return sanitize_html(Markdown(html4tags=True).convert(text))
+
+def render_preview(text):
+    """
+    Renders a preview of the given Markdown-formatted text.
+
+    Raises ``PreviewTooLong`` if the text is longer than the
+    ``PREVIEW_MAX_LENGTH`` setting allows.
+    """
+    if len(text) > settings.PREVIEW_MAX_LENGTH:
+        raise PreviewTooLong
+    key = hashlib.md5(text.encode('utf-8')).hexdigest()
+    html = _previews.get(key)
+    if html is not None:
+        return html
+
+    _lock.acquire()
+    try:
+        # Check again in case another thread finished while we waited
+        html = _previews.get(key)
+        if html is not None:
+            return html
+        finished = _in_progress.get(key, None)
+        rendering = finished is None
+        if rendering:
+            finished = _in_progress[key] = threading.Event()
+    finally:
+        _lock.release()
+
+    if not rendering:
+        # Another thread is already rendering this text - wait for it
+        finished.wait(settings.PREVIEW_WAIT_TIMEOUT)
+        html = _previews.get(key)
+        if html is None:
+            # The other thread failed or took too long
+            html = render_markdown(text)
+        return html
+
+    try:
+        html = render_markdown(text)
+        _previews.set(key, html)
+    finally:
+        _lock.acquire()
+        try:
+            del _in_progress[key]
+        finally:
+            _lock.release()
+        finished.set()
+    return html
@@ -0,0 +1,166 @@
+"""
+Profiling of individual requests in production.
+
+A request is profiled when it carries a token signed with ``SECRET_KEY``
+in a ``profile`` parameter or an ``X-Profile`` header, which staff can
+get from the profile list page, or when it's picked at random with
+probability ``PROFILE_SAMPLE_RATE``. The whole view is run under
+cProfile, including template rendering, and profiles are saved to
+``PROFILE_ROOT``, where only the latest ``PROFILE_RING_SIZE`` are kept.
+"""
+import cProfile
+import datetime
+import hashlib
+import hmac
+import os
+import pstats
+import random
+import re
+import time
+from cStringIO import StringIO
+
+from django.conf import settings
+from django.utils import simplejson
+
+PROFILE_ID_RE = re.compile(r'^\d{14}-\d{6}-\d+$')
+SORT_ORDERS = ('cumulative', 'time', 'calls')
+
+def _signature(expires):
+    return hmac.new(settings.SECRET_KEY, 'profile:%s' % expires,
+                    hashlib.sha1).hexdigest()
+
+def _equals(a, b):
+    """Compares strings in time which doesn't depend on their contents."""
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+def create_token(seconds=None):
+    """Creates a token which enables profiling for the given time."""
+    if seconds is None:
+        seconds = settings.PROFILE_TOKEN_SECONDS
+    expires = int(time.time()) + seconds
+    return '%s-%s' % (expires, _signature(expires))
+
+def check_token(token):
+    """Determines if a profiling token is genuine and hasn't expired."""
+    try:
+        expires, signature = token.split('-', 1)
+        expires = int(expires)
+    except ValueError:
+        return False
+    return (expires >= time.time() and
+            _equals(str(signature), _signature(expires)))
+
+def should_profile(request):
+    token = request.GET.get('profile') or request.META.get('HTTP_X_PROFILE')
+    if token:
+        return check_token(token)
+    return (settings.PROFILE_SAMPLE_RATE and
+            random.random() < settings.PROFILE_SAMPLE_RATE)
+
+def start(request, view_func):
+    """Starts profiling the handling of a request by the given view."""
+    profiler = cProfile.Profile()
+    request._profile = (profiler, '%s.%s' % (view_func.__module__,
+                                             view_func.__name__),
+                        time.time())
+    profiler.enable()
+
+def finish(request, response=None):
+    """
+    Stops profiling a request, if it's being profiled, and saves its
+    profile. ``response`` is ``None`` if the view raised an exception.
+    """
+    profile = getattr(request, '_profile', None)
+    if profile is None:
+        return
+    del request._profile
+    profiler, view, started_at = profile
+    profiler.disable()
+    save(profiler, {
+        'view': view,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response is not None and response.status_code or None,
+        'elapsed': time.time() - started_at,
+    })
+
+def _path(profile_id, extension):
+    return os.path.join(settings.PROFILE_ROOT,
+                        '%s.%s' % (profile_id, extension))
+
+def save(profiler, details):
+    """
+    Saves a profile and its details, discarding the oldest profiles once
+    there are more than ``PROFILE_RING_SIZE``.
+    """
+    if not os.path.isdir(settings.PROFILE_ROOT):
+        os.makedirs(settings.PROFILE_ROOT)
+    now = datetime.datetime.now()
+    profile_id = '%s-%06d-%s' % (now.strftime('%Y%m%d%H%M%S'),
+                                 now.microsecond, os.getpid())
+    details['profiled_at'] = now.strftime('%Y-%m-%d %H:%M:%S')
+    profiler.dump_stats(_path(profile_id, 'prof'))
+    f = open(_path(profile_id, 'json'), 'w')
+    try:
+        simplejson.dump(details, f)
+    finally:
+        f.close()
+    for old_id in profile_ids()[settings.PROFILE_RING_SIZE:]:
+        for extension in ('prof', 'json'):
+            try:
+                os.remove(_path(old_id, extension))
+            except OSError:
+                # Already removed by another process
+                pass
+
+def profile_ids():
+    """Lists the ids of saved profiles, newest first."""
+    if not os.path.isdir(settings.PROFILE_ROOT):
+        return []
+    ids = [filename[:-5] for filename in os.listdir(settings.PROFILE_ROOT)
+           if filename.endswith('.prof')]
+    ids.sort(reverse=True)
+    return ids
+
+def get_details(profile_id):
+    """
+    Loads the details of a saved profile, or returns ``None`` if there's
+    no such profile.
+    """
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    try:
+        f = open(_path(profile_id, 'json'))
+    except IOError:
+        return None
+    try:
+        details = simplejson.load(f)
+    finally:
+        f.close()
+    details['id'] = profile_id
+    return details
+
+def get_data(profile_id):
+    """Loads the raw data of a saved profile, in pstats format."""
+    f = open(_path(profile_id, 'prof'), 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+def top_functions(profile_id, sort='cumulative', count=None):
+    """
+    Renders a saved profile's statistics for the top ``count`` functions
+    in the given order as text.
+    """
+    if count is None:
+        count = settings.PROFILE_TOP_FUNCTIONS
+    output = StringIO()
+    stats = pstats.Stats(_path(profile_id, 'prof'), stream=output)
+    stats.sort_stats(sort).print_stats(count)
+    return output.getvalue()
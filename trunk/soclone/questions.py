@@ -30,7 +30,34 @@ class OrderedQuestionView(QuestionView):
         super(OrderedQuestionView, self).__init__(**kwargs)
 
     def get_queryset(self):
-        return Question.objects.all().order_by(*self.ordering)
+        # This condition matches the partial indexes defined for Questions
+        # in sql/question.sql exactly, so they can be used.
+        return Question.objects.extra(
+            where=['NOT soclone_question.deleted']).order_by(*self.ordering)
+
+class UnansweredQuestionView(OrderedQuestionView):
+    """
+    A view in which unanswered Questions have a simple order applied.
+
+    Questions are unanswered if they have no accepted Answer and no
+    Answers with a positive score.
+    """
+    def get_queryset(self):
+        # This condition matches the partial indexes defined for Questions
+        # in sql/question.sql exactly, so they can be used.
+        return Question.objects.extra(
+            where=['soclone_question.unanswered',
+                   'NOT soclone_question.deleted']).order_by(*self.ordering)
+
+class TaggedQuestionView(QuestionView):
+    """Restricts another view of Questions to those with a given Tag."""
+    def __init__(self, view, tag):
+        self.__dict__.update(view.__dict__)
+        self.view = view
+        self.tag = tag
+
+    def get_queryset(self):
+        return self.view.get_queryset().filter(tags=self.tag)
 
 class HotQuestionView(QuestionView):
     """
@@ -84,8 +111,46 @@ all_question_views = (
     )
 )
 
-# TODO Implement unanswered views
-unanswered_question_views = all_question_views
+unanswered_question_views = (
+    UnansweredQuestionView(
+        id          = 'newest',
+        page_title  = 'Newest Unanswered Questions',
+        tab_title   = 'Newest',
+        tab_tooltip = 'The most recently asked unanswered questions',
+        description = 'sorted by the <strong>date they were asked</strong>. '
+                      'The newest, most recently asked questions will appear '
+                      'first',
+        ordering    = ('-added_at',)
+    ),
+    UnansweredQuestionView(
+        id          = 'votes',
+        page_title  = 'Highest Voted Unanswered Questions',
+        tab_title   = 'Votes',
+        tab_tooltip = 'Unanswered questions with the most votes',
+        description = 'sorted by <strong>votes</strong>. The questions with '
+                      ' the highest vote scores (up votes minus down votes) '
+                      'will appear first.',
+        ordering    = ('-score', '-added_at'),
+    ),
+    UnansweredQuestionView(
+        id           = 'activity',
+        page_title   = 'Recently Active Unanswered Questions',
+        tab_title    = 'Activity',
+        tab_tooltip  = 'Unanswered questions that have recent activity',
+        description  = 'sorted by <strong>activity</strong>. Questions with '
+                       'the most recent activity &mdash; either through new '
+                       'answers or recent edits &mdash; will appear first.',
+        ordering     = ('-last_activity_at',),
+        user         = 'last_activity_by',
+        user_action  = 'modified',
+        time         = 'last_activity_at'
+    )
+)
+
+index_question_views = tuple([view for view in all_question_views
+                              if view.id in ('activity', 'newest', 'votes')])
 
-# TODO Implement index views
-index_question_views = all_question_views
+def tagged_question_views(tag):
+    """Creates views of the Questions with the given Tag."""
+    return tuple([TaggedQuestionView(view, tag) for view in all_question_views
+                  if isinstance(view, OrderedQuestionView)])
@@ -0,0 +1,60 @@
+"""
+Routing of reads to a replica database.
+
+If ``REPLICA_DATABASE`` is set, it gives the settings which differ for a
+replica of the main database, in the same form as the ``DATABASE_*``
+settings - for example, ``{'DATABASE_HOST': 'replica.example.com'}``.
+Locally, a copy of the database file can stand in for a replica with
+``{'DATABASE_NAME': '/path/to/replica.db'}``.
+
+``ReplicaMiddleware`` decides per request whether reads may go to the
+replica, and views route their read-only QuerySets with ``route()``.
+Reads from Users who have just made changes go to the main database for
+``REPLICA_STICKY_SECONDS`` so they always see their own writes.
+"""
+import threading
+
+from django.conf import settings
+from django.core import signals
+from django.db import backend
+
+_state = threading.local()
+
+class ReplicaSettings(object):
+    """Settings with replica database settings in place."""
+    def __getattr__(self, name):
+        return settings.REPLICA_DATABASE.get(name, getattr(settings, name))
+
+class ReplicaDatabaseWrapper(backend.DatabaseWrapper):
+    """A connection to the replica database."""
+    def cursor(self):
+        cursor = self._cursor(ReplicaSettings())
+        if settings.DEBUG:
+            return self.make_debug_cursor(cursor)
+        return cursor
+
+if settings.REPLICA_DATABASE:
+    # Like the main connection, this has a separate connection per thread
+    replica_connection = ReplicaDatabaseWrapper(**settings.DATABASE_OPTIONS)
+
+    def close_replica_connection(**kwargs):
+        replica_connection.close()
+
+    signals.request_finished.connect(close_replica_connection)
+else:
+    replica_connection = None
+
+def use_replica(enabled):
+    """Sets whether reads in the current thread may go to the replica."""
+    _state.use_replica = enabled
+
+def route(queryset):
+    """
+    Routes a QuerySet's queries to the replica if reads in the current
+    thread may go to it.
+    """
+    if replica_connection is None or not getattr(_state, 'use_replica', False):
+        return queryset
+    queryset = queryset._clone()
+    queryset.query.connection = replica_connection
+    return queryset
@@ -20,6 +20,22 @@ the ``local_settings`` module::
    # Make this unique and don't share it with anybody
    SECRET_KEY = ''
 
+   # Address of the site, with no trailing slash
+   SITE_URL = 'http://example.com'
+
+   # A cache shared between processes, which can also hold sessions so
+   # authenticated requests don't need a database query to load them.
+   # This is required for Users' vote and favourite state to be cached.
+   CACHE_BACKEND = 'memcached://127.0.0.1:11211/'
+   SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+
+   # Settings which differ for a replica database to send reads to, if any
+   REPLICA_DATABASE = {'DATABASE_HOST': ''}
+
+   # Number of connections to keep open between requests - pooling can't
+   # be used with SQLite, as its connections can't be shared by threads
+   DATABASE_POOL_SIZE = 20
+
 """
 import os
 
@@ -63,6 +79,7 @@ TEMPLATE_LOADERS = (
 # only parameter and returns a dictionary to add to the context.
 TEMPLATE_CONTEXT_PROCESSORS = (
     'soclone.context_processors.auth',
+    'soclone.context_processors.notifications',
     'django.core.context_processors.debug',
     'django.core.context_processors.media',
     'soclone.context_processors.request_path',
@@ -72,11 +89,18 @@ TEMPLATE_CONTEXT_PROCESSORS = (
 # this middleware classes will be applied in the order given, and in the
 # response phase the middleware will be applied in reverse order.
 MIDDLEWARE_CLASSES = (
+    'soclone.middleware.ConnectionPoolMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'soclone.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'soclone.middleware.AuthenticationMiddleware',
     'django.middleware.doc.XViewMiddleware',
-    'django.middleware.transaction.TransactionMiddleware',
+    'soclone.middleware.LastSeenMiddleware',
+    'soclone.middleware.ActivityMiddleware',
+    'soclone.middleware.NotificationMiddleware',
+    'soclone.middleware.FeedMiddleware',
+    'soclone.middleware.TransactionMiddleware',
+    'soclone.middleware.ProfilingMiddleware',
 )
 
 ROOT_URLCONF = 'soclone.urls'
@@ -97,6 +121,154 @@ INSTALLED_APPS = (
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_URL = '/logout/'
+# Cookie set while a User is logged in, so requests without it can be
+# treated as anonymous without loading their session
+AUTH_COOKIE_NAME = 'soclone_auth'
+
+# Maximum length of text which may be submitted for a Markdown preview
+PREVIEW_MAX_LENGTH = 30000
+# Number of rendered previews to keep in memory
+PREVIEW_CACHE_SIZE = 500
+# Seconds to wait for another request which is rendering the same preview
+PREVIEW_WAIT_TIMEOUT = 5
+
+# Number of rendered User cards and reputation displays to keep in memory
+USER_CARD_CACHE_SIZE = 5000
+
+# Seconds for which a User's votes and favourite for a Question are cached -
+# they're only cached if CACHE_BACKEND is shared between processes
+INTERACTION_STATE_TIMEOUT = 60 * 60
+
+# Number of Questions, popular Tags and recent Awards on the index page
+INDEX_QUESTION_COUNT = 50
+INDEX_TAG_COUNT = 30
+INDEX_AWARD_COUNT = 10
+# Seconds after which the index page snapshot is rebuilt in the background
+INDEX_SNAPSHOT_REFRESH = 60
+# Seconds after which the index page snapshot may no longer be served
+INDEX_SNAPSHOT_MAX_AGE = 5 * 60
+
+# Number of related Questions stored and displayed for each Question
+RELATED_QUESTION_COUNT = 10
+# Number of recent Questions sharing a Tag which are compared with a
+# Question when it is asked or edited
+RELATED_QUESTION_CANDIDATES = 500
+# Features used by more Questions than this are ignored when rebuilding
+# all related Questions
+RELATED_QUESTION_MAX_POSTINGS = 1000
+
+# Number of potential duplicates shown when a Question is being asked
+DUPLICATE_CANDIDATE_COUNT = 5
+# Number of LSH buckets a Question must share with a new Question to be
+# considered a potential duplicate of it
+DUPLICATE_MIN_MATCHING_BUCKETS = 2
+
+# Number of related Tags displayed for a Tag or set of Tags
+RELATED_TAG_COUNT = 20
+# Seconds after which the in-memory Tag co-occurrence matrix is reloaded
+TAG_MATRIX_REFRESH = 5 * 60
+
+# Seconds after which the in-memory Tag synonym map is reloaded, to pick up
+# removed synonyms - it's reloaded immediately when synonyms are added
+TAG_SYNONYM_REFRESH = 60
+# Number of Questions moved at a time when merging Tags, and seconds to
+# pause between each batch
+TAG_MERGE_CHUNK_SIZE = 500
+TAG_MERGE_DELAY = 0.5
+
+# Number of offensive flags at which a Question or Answer is hidden
+OFFENSIVE_FLAG_HIDE_THRESHOLD = 6
+
+# Number of Activities to collect, or seconds to wait, before inserting
+# them in a batch
+ACTIVITY_BUFFER_SIZE = 100
+ACTIVITY_FLUSH_INTERVAL = 5
+# Number of Activities displayed per page of a timeline
+ACTIVITY_PAGE_SIZE = 30
+# Days for which vote Activities and all other Activities are kept
+ACTIVITY_VOTE_RETENTION_DAYS = 30
+ACTIVITY_RETENTION_DAYS = 2 * 365
+
+# Number of Notifications to queue, or seconds to wait, before delivering
+# them in a batch
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_DISPATCH_INTERVAL = 5
+# Seconds to cache each User's unread Notification count for - this limits
+# how stale counts can be if the cache isn't shared between processes
+NOTIFICATION_COUNT_TIMEOUT = 300
+# Number of Awards to create Notifications for in each batch
+NOTIFICATION_AWARD_CHUNK_SIZE = 1000
+
+# Seconds within which a User's last seen time won't be updated again
+LAST_SEEN_INTERVAL = 300
+# Seconds between writes of pending last seen times, or None to write them
+# as they're recorded
+LAST_SEEN_FLUSH_INTERVAL = 60
+
+# Settings which differ for a replica database to send reads to - no reads
+# are sent to a replica if this is empty
+REPLICA_DATABASE = {}
+# Cookie set after a User makes changes, so their reads go to the main
+# database for long enough for the replica to catch up
+REPLICA_STICKY_COOKIE_NAME = 'soclone_primary'
+REPLICA_STICKY_SECONDS = 30
+
+# Maximum number of database connections to keep open between requests -
+# connections aren't pooled if this is 0
+DATABASE_POOL_SIZE = 0
+# Seconds to wait for a connection when they're all in use
+DATABASE_POOL_TIMEOUT = 10
+# Seconds after which pooled connections are replaced
+DATABASE_POOL_MAX_AGE = 3600
+# Seconds after which idle pooled connections are checked before use
+DATABASE_POOL_CHECK_IDLE = 30
+
+# Default and maximum number of items in each page of API results
+API_PAGE_SIZE = 30
+API_MAX_PAGE_SIZE = 100
+# Seconds to cache API responses for - they aren't cached if this is 0
+API_CACHE_TIMEOUT = 60
+
+# Number of entries in each Atom feed
+FEED_ENTRY_COUNT = 30
+# Seconds to cache feed entries for, after which edits and deletions show
+FEED_CACHE_TIMEOUT = 15 * 60
+
+# Address of the site, used to make absolute URLs where there's no request
+SITE_URL = 'http://localhost:8000'
+# Directory bin/build-sitemaps.py writes sitemaps to, the URL it's served
+# from, relative to SITE_URL, and the maximum number of URLs in each file
+SITEMAP_ROOT = os.path.join(MEDIA_ROOT, 'sitemaps')
+SITEMAP_URL = '/media/sitemaps/'
+SITEMAP_SHARD_SIZE = 50000
+
+# Directory profiles of requests are saved in and the number to keep
+PROFILE_ROOT = os.path.join(DIRNAME, 'profiles')
+PROFILE_RING_SIZE = 100
+# Proportion of requests to profile at random, from 0 to 1
+PROFILE_SAMPLE_RATE = 0
+# Seconds the profiling tokens given to staff are valid for
+PROFILE_TOKEN_SECONDS = 60 * 60
+# Number of functions to show for each profile
+PROFILE_TOP_FUNCTIONS = 40
+
+# Included in page ETags - change this when deploying template changes so
+# clients don't keep using pages rendered with the old templates
+PAGE_STAMP_VERSION = '1'
+
+# JavaScript and CSS files to be combined into bundles by bin/build-media.py,
+# relative to MEDIA_ROOT. The WMD editor isn't bundled, as it loads its
+# other scripts from the directory it was loaded from.
+MEDIA_BUNDLES = {
+    'base.css': ('css/reset.css', 'css/soclone.css'),
+    'base.js': ('js/jquery-1.2.6.min.js', 'js/soclone.js'),
+    'editor.css': ('css/prettify.css', 'css/textarearesizer.css'),
+    'editor.js': ('js/typewatch-2.0.0.js', 'js/textarearesizer-1.0.4.js',
+                  'js/prettify.js'),
+}
+# Seconds after which the bundle manifest is reloaded, to pick up newly
+# built bundles
+MEDIA_MANIFEST_REFRESH = 60
 
 try:
     from soclone.local_settings import *
@@ -0,0 +1,170 @@
+"""
+Generation of sitemaps for every Question, split into gzipped shards of
+up to ``SITEMAP_SHARD_SIZE`` URLs with an index pointing to them.
+
+Shards hold fixed blocks of Question ids, so a Question always belongs to
+the same shard. The latest activity and number of Questions in each shard
+are recorded in a state file, so later runs only rewrite the shards
+which have changed. Questions are read in id order in chunks, so memory
+use doesn't grow with the number of Questions.
+"""
+import gzip
+import os
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.template.defaultfilters import slugify
+from django.utils import simplejson
+
+from soclone.models import Question
+
+STATE_FILE = 'state.json'
+INDEX_FILE = 'sitemap-index.xml'
+LASTMOD_FORMAT = '%Y-%m-%d'
+
+def shard_filename(shard):
+    return 'sitemap-%s.xml.gz' % shard
+
+def iter_questions(first_id, last_id, chunk_size=1000):
+    """
+    Yields ``(id, title, last_activity_at)`` for undeleted Questions with
+    ids in the given range, in id order, retrieving ``chunk_size`` at a
+    time.
+    """
+    while True:
+        rows = list(Question.objects.filter(id__gte=first_id,
+            id__lte=last_id).extra(where=['NOT soclone_question.deleted']
+            ).order_by('id').values_list(
+            'id', 'title', 'last_activity_at')[:chunk_size])
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            return
+        first_id = rows[-1][0] + 1
+
+def _write_atomically(path, write):
+    """
+    Writes a file with the given function, which is passed a temporary
+    path to write to, replacing any existing file only once it's complete.
+    """
+    temp_path = '%s.tmp' % path
+    write(temp_path)
+    os.rename(temp_path, path)
+
+def write_shard(path, shard, site_url, shard_size=None):
+    """Writes a gzipped sitemap for the Questions in a shard."""
+    if shard_size is None:
+        shard_size = settings.SITEMAP_SHARD_SIZE
+    question_url = '%s%s' % (site_url, reverse('questions'))
+    def write(temp_path):
+        output = open(temp_path, 'wb')
+        f = gzip.GzipFile(os.path.basename(path)[:-3], 'wb', fileobj=output)
+        try:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for question_id, title, last_activity_at in iter_questions(
+                    shard * shard_size + 1, (shard + 1) * shard_size):
+                # Equivalent to Question.get_absolute_url(), without
+                # reversing a URL for every Question.
+                loc = u'%s%s/%s/' % (question_url, question_id,
+                                     slugify(title))
+                f.write('<url><loc>%s</loc><lastmod>%s</lastmod></url>\n' % (
+                    escape(loc).encode('utf-8'),
+                    last_activity_at.strftime(LASTMOD_FORMAT)))
+            f.write('</urlset>\n')
+        finally:
+            f.close()
+            output.close()
+    _write_atomically(path, write)
+
+def write_index(path, shards, sitemap_url):
+    """
+    Writes a sitemap index listing shards, given as a dict mapping shard
+    numbers to the time of their latest activity.
+    """
+    def write(temp_path):
+        f = open(temp_path, 'wb')
+        try:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for shard, last_activity_at in sorted(shards.items()):
+                f.write('<sitemap><loc>%s%s</loc><lastmod>%s</lastmod></sitemap>\n'
+                        % (escape(sitemap_url), shard_filename(shard),
+                           last_activity_at.strftime(LASTMOD_FORMAT)))
+            f.write('</sitemapindex>\n')
+        finally:
+            f.close()
+    _write_atomically(path, write)
+
+def load_state(directory):
+    """
+    Loads the state recorded by the last run, as a dict mapping shard
+    numbers to two-tuples of the string form of their latest activity
+    and their number of Questions.
+    """
+    try:
+        f = open(os.path.join(directory, STATE_FILE))
+    except IOError:
+        return {}
+    try:
+        return dict([(int(shard), tuple(value)) for shard, value
+                     in simplejson.load(f).items()])
+    finally:
+        f.close()
+
+def save_state(directory, state):
+    def write(temp_path):
+        f = open(temp_path, 'w')
+        try:
+            simplejson.dump(dict([(str(shard), value)
+                                  for shard, value in state.items()]), f)
+        finally:
+            f.close()
+    _write_atomically(os.path.join(directory, STATE_FILE), write)
+
+def build(directory=None, site_url=None, sitemap_url=None, force=False,
+          log=None):
+    """
+    Brings the sitemaps in a directory up to date, writing shards whose
+    Questions have changed since the last run, or all shards if ``force``
+    is ``True``, deleting shards which no longer have any Questions and
+    rewriting the index.
+
+    Returns a list of the numbers of the shards which were written.
+    """
+    if directory is None:
+        directory = settings.SITEMAP_ROOT
+    if site_url is None:
+        site_url = settings.SITE_URL
+    if sitemap_url is None:
+        sitemap_url = '%s%s' % (site_url, settings.SITEMAP_URL)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    previous_state = load_state(directory)
+    shards = Question.objects.sitemap_shards(settings.SITEMAP_SHARD_SIZE)
+    state = dict([(shard, (str(last_activity_at), count))
+                  for shard, (last_activity_at, count) in shards.items()])
+    written = []
+    for shard in sorted(state):
+        path = os.path.join(directory, shard_filename(shard))
+        if (force or previous_state.get(shard) != state[shard] or
+            not os.path.exists(path)):
+            write_shard(path, shard, site_url)
+            written.append(shard)
+            if log is not None:
+                log('Wrote %s (%s questions)' % (shard_filename(shard),
+                                                 state[shard][1]))
+    for shard in previous_state:
+        path = os.path.join(directory, shard_filename(shard))
+        if shard not in state and os.path.exists(path):
+            os.remove(path)
+            if log is not None:
+                log('Removed %s' % shard_filename(shard))
+
+    write_index(os.path.join(directory, INDEX_FILE),
+                dict([(shard, last_activity_at) for shard, (last_activity_at,
+                      count) in shards.items()]), sitemap_url)
+    save_state(directory, state)
+    return written
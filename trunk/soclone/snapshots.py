@@ -0,0 +1,78 @@
+"""
+Precomputed snapshots of the data displayed on the index page.
+
+A snapshot holds the Questions for each index view along with the
+sidebar data, and is replaced as a whole when rebuilt, so the index page
+can be served from memory without touching the database.
+
+Once a snapshot is older than ``INDEX_SNAPSHOT_REFRESH`` seconds, the
+next request to use it will start rebuilding it in the background while
+the current snapshot continues to be served. If a snapshot gets older
+than ``INDEX_SNAPSHOT_MAX_AGE`` seconds, requests will wait for a fresh
+one to be built instead.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+
+from soclone.models import Award, Tag
+from soclone.questions import index_question_views
+from soclone.utils.cache import ReloadingValue
+from soclone.utils.models import populate_foreign_key_caches
+
+class IndexSnapshot(object):
+    """
+    Data for the index page, which must be treated as read-only once
+    built as it is shared between threads.
+    """
+    def __init__(self, questions, tags, awards):
+        self.questions = questions
+        self.tags = tags
+        self.awards = awards
+        self.built_at = time.time()
+
+    def age(self):
+        return time.time() - self.built_at
+
+def build_index_snapshot():
+    """Retrieves all the data required for the index page."""
+    questions = {}
+    for view in index_question_views:
+        view_questions = tuple(
+            view.get_queryset()[:settings.INDEX_QUESTION_COUNT])
+        # The index page always displays the last User to be active
+        user_attrs = tuple(set((view.user, 'last_activity_by')))
+        populate_foreign_key_caches(User, ((view_questions, user_attrs),),
+                                    fields=view.user_fields)
+        questions[view.id] = view_questions
+
+    tags = tuple(Tag.objects.values('name', 'use_count')[
+        :settings.INDEX_TAG_COUNT])
+
+    awards = []
+    for award in Award.objects.order_by('-awarded_at').values(
+            'awarded_at', 'user__id', 'user__username', 'badge__id',
+            'badge__name', 'badge__type', 'badge__slug')[
+            :settings.INDEX_AWARD_COUNT]:
+        awards.append({
+            'awarded_at': award['awarded_at'],
+            'username': award['user__username'],
+            'user_url': '%s%s/' % (reverse('user', args=[award['user__id']]),
+                                   award['user__username']),
+            'badge_name': award['badge__name'],
+            'badge_type': award['badge__type'],
+            'badge_url': '%s%s/' % (reverse('badge', args=[award['badge__id']]),
+                                    award['badge__slug']),
+        })
+
+    return IndexSnapshot(questions, tags, tuple(awards))
+
+_snapshot = ReloadingValue(build_index_snapshot,
+                           settings.INDEX_SNAPSHOT_REFRESH,
+                           settings.INDEX_SNAPSHOT_MAX_AGE)
+
+def get_index_snapshot():
+    """Retrieves the current index page snapshot, rebuilding if stale."""
+    return _snapshot.get()
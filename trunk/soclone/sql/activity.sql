@@ -0,0 +1,4 @@
+-- Composite indexes covering timelines of Activities by User and by
+-- Question, which are read newest first a page at a time by id.
+CREATE INDEX soclone_activity_user_timeline ON soclone_activity (user_id, id);
+CREATE INDEX soclone_activity_question_timeline ON soclone_activity (question_id, id) WHERE question_id IS NOT NULL;
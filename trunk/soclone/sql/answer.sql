@@ -0,0 +1,9 @@
+-- Partial indexes covering each ordering of a Question's visible Answers,
+-- so deleted Answers never need to be read when displaying a Question.
+-- The bare "NOT deleted" condition must match the one used by
+-- soclone.models.AnswerManager.for_question for these to be used.
+CREATE INDEX soclone_answer_visible_score ON soclone_answer (question_id, score, added_at) WHERE NOT deleted;
+CREATE INDEX soclone_answer_visible_added_at ON soclone_answer (question_id, added_at) WHERE NOT deleted;
+
+-- Deleted Answers are only displayed to the User who deleted them
+CREATE INDEX soclone_answer_deleted_by ON soclone_answer (deleted_by_id, question_id) WHERE deleted;
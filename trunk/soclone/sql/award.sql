@@ -0,0 +1,3 @@
+-- Partial index covering Awards which Users haven't been notified of yet,
+-- which are picked up in batches by bin/dispatch-notifications.py.
+CREATE INDEX soclone_award_unnotified ON soclone_award (id) WHERE NOT notified;
@@ -0,0 +1,3 @@
+-- Partial index covering the moderation queue, which only ever displays
+-- unresolved items in priority order.
+CREATE INDEX soclone_moderationqueueitem_unresolved_priority ON soclone_moderationqueueitem (priority) WHERE NOT resolved;
@@ -0,0 +1,5 @@
+-- Partial index covering the unread Notification count which is loaded
+-- for each User, and a composite index covering their Notification list,
+-- which is displayed newest first.
+CREATE INDEX soclone_notification_unread ON soclone_notification (user_id) WHERE NOT read;
+CREATE INDEX soclone_notification_user_list ON soclone_notification (user_id, id);
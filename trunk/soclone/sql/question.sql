@@ -0,0 +1,14 @@
+-- Partial indexes covering each ordering of Question views, which never
+-- display deleted Questions. The bare "NOT deleted" condition must match
+-- the one used by soclone.questions.OrderedQuestionView for these to be
+-- used.
+CREATE INDEX soclone_question_visible_added_at ON soclone_question (added_at) WHERE NOT deleted;
+CREATE INDEX soclone_question_visible_score ON soclone_question (score, added_at) WHERE NOT deleted;
+CREATE INDEX soclone_question_visible_last_activity_at ON soclone_question (last_activity_at) WHERE NOT deleted;
+
+-- Partial indexes covering each ordering of unanswered Question views.
+-- The bare "unanswered" and "NOT deleted" conditions must match those
+-- used by soclone.questions.UnansweredQuestionView for these to be used.
+CREATE INDEX soclone_question_unanswered_added_at ON soclone_question (added_at) WHERE unanswered AND NOT deleted;
+CREATE INDEX soclone_question_unanswered_score ON soclone_question (score, added_at) WHERE unanswered AND NOT deleted;
+CREATE INDEX soclone_question_unanswered_last_activity_at ON soclone_question (last_activity_at) WHERE unanswered AND NOT deleted;
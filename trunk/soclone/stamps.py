@@ -0,0 +1,111 @@
+"""
+Cheap version stamps for pages, used to answer conditional GET requests
+with 304 Not Modified before doing the work of building the page.
+
+A stamp is built from the narrow columns which affect how a page looks,
+so it changes whenever the page would, without loading Question and
+Answer text or rendering anything. This includes the reputation and
+badge counts shown on the cards of the Users displayed, and a page's
+related Questions. Stamps are read from the same database as the page, so
+while the replica is behind, the ETag describes the stale page which was
+sent rather than a fresh one. Stamps are only used for anonymous
+requests, as pages for authenticated Users also depend on their votes,
+reputation and Notifications.
+"""
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from soclone import replica
+from soclone.middleware import SAFE_METHODS, might_be_authenticated
+from soclone.models import Answer, Question, RelatedQuestion
+
+# Fields of the Users whose cards are displayed
+CARD_STAMP_FIELDS = ('reputation', 'gold', 'silver', 'bronze')
+
+def _card_fields(user_field):
+    return tuple(['%s__%s' % (user_field, field)
+                  for field in CARD_STAMP_FIELDS])
+
+QUESTION_STAMP_FIELDS = ('title', 'tagnames', 'score', 'answer_count',
+    'comment_count', 'favourite_count', 'answer_accepted', 'wiki', 'closed',
+    'deleted', 'locked', 'last_edited_at',
+    'last_activity_at') + _card_fields('author')
+ANSWER_STAMP_FIELDS = ('id', 'score', 'comment_count', 'accepted', 'wiki',
+    'deleted', 'locked', 'last_edited_at') + _card_fields('author')
+RELATED_QUESTION_STAMP_FIELDS = ('related__id', 'related__title',
+    'related__score')
+QUESTION_LIST_STAMP_FIELDS = ('id', 'title', 'tagnames', 'score',
+    'answer_count', 'answer_accepted', 'closed', 'last_activity_at')
+
+def question_stamp(question_id):
+    """
+    Creates a stamp for a Question's page, or returns ``None`` if the
+    Question doesn't exist.
+    """
+    question = list(replica.route(Question.objects.filter(
+        id=question_id)).values_list(*QUESTION_STAMP_FIELDS))
+    if not question:
+        return None
+    answers = replica.route(Answer.objects.filter(
+        question=question_id)).order_by('id').values_list(
+        *ANSWER_STAMP_FIELDS)
+    related = replica.route(RelatedQuestion.objects.filter(
+        question=question_id, related__deleted=False)).values_list(
+        *RELATED_QUESTION_STAMP_FIELDS)[:settings.RELATED_QUESTION_COUNT]
+    return repr((question[0], list(answers), list(related)))
+
+def question_list_stamp(page, user_field):
+    """
+    Creates a stamp for a page of a Question list, where the User
+    displayed for each Question is held in ``user_field``.
+
+    The page's QuerySet is already routed to the database it's displayed
+    from.
+    """
+    return repr((page.paginator.count, list(page.object_list.values_list(
+        *(QUESTION_LIST_STAMP_FIELDS + (user_field,) +
+          _card_fields(user_field))))))
+
+def parse_etags(header):
+    """
+    Parses the ETags in an If-None-Match header.
+
+    >>> parse_etags('"a", "b"')
+    ['"a"', '"b"']
+    """
+    return [etag.strip() for etag in header.split(',') if etag.strip()]
+
+def check(request, stamp_function, *args):
+    """
+    Checks a conditional GET request for a page against its current
+    stamp, which is created by calling ``stamp_function`` with any
+    additional arguments given.
+
+    Returns a two-tuple of the ETag for the page, which is ``None`` if
+    clients can't cache it, and a 304 response if the client already has
+    the current version, otherwise ``None``.
+    """
+    if (request.method not in SAFE_METHODS or
+        might_be_authenticated(request)):
+        return None, None
+    stamp = stamp_function(*args)
+    if stamp is None:
+        return None, None
+    etag = '"%s"' % hashlib.md5('%s:%s:%s' % (settings.PAGE_STAMP_VERSION,
+        request.get_full_path(), stamp)).hexdigest()
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in etags or '*' in etags:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return etag, response
+    return etag, None
+
+def set_etag(response, etag):
+    """Adds an ETag from ``check()``, if there is one, to a response."""
+    if etag is not None and response.status_code == 200:
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Cookie',))
+    return response
@@ -2,12 +2,11 @@ import re
 import urllib
 
 from django import template
-from django.contrib.humanize.templatetags.humanize import intcomma
-from django.template.defaultfilters import pluralize
 from django.utils.safestring import mark_safe
+from django.utils.timesince import timesince
 
-from soclone import auth
-from soclone.models import Badge, QUESTIONS_PER_PAGE_CHOICES
+from soclone import auth, bundles, cards
+from soclone.models import QUESTIONS_PER_PAGE_CHOICES, Vote
 
 register = template.Library()
 
@@ -80,6 +79,10 @@ def can_retag_questions(user):
 def can_edit_post(user, post):
     return auth.can_edit_post(user, post)
 
+@register.filter
+def can_delete_post(user, post):
+    return auth.can_delete_post(user, post)
+
 @register.filter
 def can_delete_comment(user, comment):
     return auth.can_delete_comment(user, comment)
@@ -96,34 +99,95 @@ def can_close_question(user, question):
 def can_lock_posts(user):
     return auth.can_lock_posts(user)
 
-##################
-# Inclusion tags #
-##################
+@register.filter
+def is_upvote(vote):
+    return vote == Vote.VOTE_UP
 
-@register.inclusion_tag('question_list_user_details.html')
-def question_list_user_details(question, view):
-    return {
-        'question': question,
-        'display_user': getattr(question, view.user),
-        'display_time': getattr(question, view.time),
-        'view': view,
-    }
-
-@register.inclusion_tag('post_user_details.html')
-def post_user_details(post):
-    return {
-        'post': post,
-        'display_editor': (post.wiki or
-                           post.last_edited_by_id != post.author_id),
-    }
+@register.filter
+def is_downvote(vote):
+    return vote == Vote.VOTE_DOWN
 
 ########
 # Tags #
 ########
 
-GRAVATAR_TEMPLATE = ('<img width="%(size)s" height="%(size)s" '
-                     'src="http://www.gravatar.com/avatar/%(gravatar_hash)s'
-                     '?s=%(size)s&d=identicon&r=PG">')
+QUESTION_LIST_USER_DETAILS_TEMPLATE = (
+    '<div class="user-details">\n'
+    '%s\n'
+    '</div>')
+QUESTION_LIST_WIKI_TEMPLATE = (
+    '<span class="wiki" title="This question is owned by the community. '
+    'Votes do not generate reputation, and this question is editable by '
+    'anyone with 750 rep">community wiki</span>')
+POST_TIME_TEMPLATE = '<div class="post-time">%s <strong>%s ago</strong></div>'
+
+@register.simple_tag
+def question_list_user_details(question, view):
+    """
+    Creates details of the User and time associated with a Question in
+    a list of Questions, as determined by the given QuestionView.
+    """
+    if question.wiki:
+        html = QUESTION_LIST_WIKI_TEMPLATE
+    else:
+        html = u'%s\n%s' % (
+            POST_TIME_TEMPLATE % (view.user_action,
+                                  timesince(getattr(question, view.time))),
+            cards.render_card(getattr(question, view.user)))
+    return mark_safe(QUESTION_LIST_USER_DETAILS_TEMPLATE % html)
+
+POST_EDITOR_TEMPLATE = (
+    '<div class="post-user-details post-editor">\n'
+    '<div class="post-time">edited <strong>%(time)s ago</strong></div>\n'
+    '%(card)s\n'
+    '</div>\n')
+POST_EDITOR_REVISIONS_TIME_TEMPLATE = '<a href="%s">%s</a>'
+POST_AUTHOR_TEMPLATE = (
+    '<div class="post-user-details post-author">\n'
+    '%s\n'
+    '</div>')
+POST_WIKI_TEMPLATE = (
+    '<span class="wiki" title="This post is owned by the community. Votes '
+    'do not generate reputation, and this post is editable by anyone with '
+    '750 rep">community wiki</span>')
+
+@register.simple_tag
+def post_user_details(post):
+    """
+    Creates details of the author of a Question or Answer and of its
+    last editor, if it has been edited.
+    """
+    html = []
+    if post.last_edited_at:
+        edited = timesince(post.last_edited_at)
+        if hasattr(post, 'get_revision_url'):
+            edited = POST_EDITOR_REVISIONS_TIME_TEMPLATE % (
+                post.get_revision_url(), edited)
+        if post.wiki or post.last_edited_by_id != post.author_id:
+            card = cards.render_card(post.last_edited_by,
+                                     show_reputation=not post.wiki)
+        else:
+            card = u''
+        html.append(POST_EDITOR_TEMPLATE % {'time': edited, 'card': card})
+    if post.wiki:
+        author = POST_WIKI_TEMPLATE
+    else:
+        author = u'%s\n%s' % (
+            POST_TIME_TEMPLATE % (u'added', timesince(post.added_at)),
+            cards.render_card(post.author))
+    html.append(POST_AUTHOR_TEMPLATE % author)
+    return mark_safe(u''.join(html))
+
+@register.simple_tag
+def user_card(user, size):
+    """
+    Creates a User's gravatar, profile link, reputation score and badge
+    counts.
+
+    This tag can accept a User object, or a dict containing the
+    appropriate values.
+    """
+    return cards.render_card(user, int(size))
 
 @register.simple_tag
 def gravatar(user, size):
@@ -133,20 +197,8 @@ def gravatar(user, size):
     This tag can accept a User object, or a dict containing the
     appropriate values.
     """
-    try:
-        gravatar = user['gravatar']
-    except (TypeError, AttributeError, KeyError):
-        gravatar = user.gravatar
-    return mark_safe(GRAVATAR_TEMPLATE % {
-        'size': size,
-        'gravatar_hash': gravatar,
-    })
-
-REPUTATION_TEMPLATE = '<span class="reputation-score">%s</span>'
-BADGE_TEMPLATE = ('<span title="%(count)s %(name)s badge%(plural)s">'
-                    '<span class="badge%(id)s">&bull;</span>'
-                    '<span class="badgecount">%(count)s</span>'
-                  '</span>')
+    return cards.render_gravatar(cards.user_details(user, ('gravatar',))[0],
+                                 size)
 
 @register.simple_tag
 def reputation(user):
@@ -157,23 +209,16 @@ def reputation(user):
     This tag can accept a User object, or a dict containing the
     appropriate values.
     """
-    try:
-        reputation, gold, silver, bronze = (user['reputation'], user['gold'],
-                                            user['silver'], user['bronze'])
-    except (TypeError, AttributeError, KeyError):
-        reputation, gold, silver, bronze = (user.reputation, user.gold,
-                                            user.silver, user.bronze)
-    spans = [REPUTATION_TEMPLATE % intcomma(reputation)]
-    for badge, count in zip(Badge.TYPE_CHOICES, (gold, silver, bronze)):
-        if not count:
-            continue
-        spans.append(BADGE_TEMPLATE % {
-            'id': badge[0],
-            'name': badge[1],
-            'count': count,
-            'plural': pluralize(count),
-        })
-    return mark_safe(u''.join(spans))
+    return cards.render_reputation(*cards.user_details(user,
+        ('reputation', 'gold', 'silver', 'bronze')))
+
+@register.simple_tag
+def bundle(name):
+    """
+    Creates tags which link to the given JavaScript or CSS bundle, or to
+    its individual files if it hasn't been built.
+    """
+    return bundles.render_bundle(name)
 
 class PagerNode(template.Node):
     def __init__(self, page_var, extra_params):
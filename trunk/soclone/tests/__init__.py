@@ -1,10 +1,16 @@
 import doctest
 import unittest
 
+from django.conf import settings
+
 from soclone.tests import doctests
 from soclone.tests import testcases
 
 def suite():
+    # Write last seen times as they're recorded, so none are left to be
+    # written in the background or at exit, once the test database has
+    # been destroyed.
+    settings.LAST_SEEN_FLUSH_INTERVAL = None
     s = unittest.TestSuite()
     s.addTest(doctest.DocTestSuite(doctests))
     s.addTest(unittest.defaultTestLoader.loadTestsFromModule(testcases))
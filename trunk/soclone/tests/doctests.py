@@ -0,0 +1,14 @@
+from soclone import api
+from soclone import bundles
+from soclone import stamps
+from soclone.utils import cache
+
+__test__ = {
+    'decode_cursor': api.decode_cursor,
+    'encode_cursor': api.encode_cursor,
+    'is_shared_cache': cache.is_shared_cache,
+    'minify_css': bundles.minify_css,
+    'minify_js': bundles.minify_js,
+    'parse_etags': stamps.parse_etags,
+    'ReloadingValue': cache.ReloadingValue,
+}
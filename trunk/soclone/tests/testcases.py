@@ -0,0 +1,707 @@
+import cProfile
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.test import TestCase
+from django.utils import simplejson
+
+from soclone import activity
+from soclone import bundles
+from soclone import feeds
+from soclone import notifications
+from soclone import pool
+from soclone import presence
+from soclone import profiling
+from soclone import sitemaps
+from soclone.middleware import ReplicaMiddleware
+from soclone.models import (Activity, Answer, Award, Badge, FlaggedItem,
+    Notification, Question, Tag, TagSynonym)
+
+def create_user(username, reputation=1):
+    user = User.objects.create_user(username, '%s@example.com' % username,
+                                    'password')
+    user.reputation = reputation
+    user.save()
+    return user
+
+def create_question(author, tagnames, title=u'How do I test this?',
+                    **kwargs):
+    now = datetime.datetime.now()
+    question = Question(title=title, author=author, added_at=now,
+                        last_activity_at=now, last_activity_by=author,
+                        tagnames=tagnames, html=u'<p>Like this.</p>',
+                        summary=u'Like this.', **kwargs)
+    question.save()
+    return question
+
+def create_answer(question, author):
+    answer = Answer.objects.create(question=question, author=author,
+                                   html=u'<p>Like that.</p>')
+    Question.objects.adjust_answer_count(question.id, 1)
+    return answer
+
+def log_in(client, user):
+    """
+    Logs a test Client in as a User, setting the cookie which marks
+    requests as possibly authenticated.
+    """
+    client.login(username=user.username, password='password')
+    client.cookies[settings.AUTH_COOKIE_NAME] = '1'
+
+class TagMergeTestCase(TestCase):
+    def setUp(self):
+        self.user = create_user('merger')
+        self.both = create_question(self.user, u'py python')
+        self.source_only = create_question(self.user, u'py')
+        self.target_only = create_question(self.user, u'python')
+        self.source = Tag.objects.get(name='py')
+        self.target = Tag.objects.get(name='python')
+        TagSynonym.objects.clear_cache()
+
+    def test_merge_moves_questions(self):
+        Tag.objects.merge(self.source, self.target, chunk_size=1, delay=0)
+        self.assertEquals(Tag.objects.filter(name='py').count(), 0)
+        for question in (self.both, self.source_only, self.target_only):
+            question = Question.objects.get(id=question.id)
+            self.assertEquals(question.tagnames, u'python')
+            self.assertEquals([tag.name for tag in question.tags.all()],
+                              [u'python'])
+        self.assertEquals(Tag.objects.get(name='python').use_count, 3)
+
+    def test_merged_name_becomes_synonym(self):
+        Tag.objects.merge(self.source, self.target, chunk_size=1, delay=0)
+        self.assertEquals(TagSynonym.objects.get_synonyms(),
+                          {u'py': u'python'})
+        tags = Tag.objects.get_or_create_multiple([u'py'], self.user)
+        self.assertEquals([tag.id for tag in tags], [self.target.id])
+
+    def test_synonyms_of_source_are_moved(self):
+        TagSynonym.objects.create(source=u'pyy', target=self.source)
+        Tag.objects.merge(self.source, self.target, chunk_size=1, delay=0)
+        self.assertEquals(TagSynonym.objects.resolve([u'pyy', u'python']),
+                          [u'python'])
+
+    def test_new_synonyms_are_seen_immediately(self):
+        self.assertEquals(TagSynonym.objects.get_synonyms(), {})
+        # As if added by another process, without clearing this one's map
+        TagSynonym.objects.create(source=u'py3', target=self.target)
+        self.assertEquals(TagSynonym.objects.get_synonyms(),
+                          {u'py3': u'python'})
+
+class SoftDeleteTestCase(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.moderator = create_user('moderator', reputation=10000)
+        self.question = create_question(self.author, u'python django')
+        self.answer = create_answer(self.question, self.author)
+
+    def use_counts(self):
+        return dict(Tag.objects.values_list('name', 'use_count'))
+
+    def test_question_delete_adjusts_tag_use_counts(self):
+        create_question(self.author, u'python')
+        self.assertTrue(Question.objects.soft_delete(self.question,
+                                                     self.moderator))
+        self.assertEquals(self.use_counts(), {u'python': 1, u'django': 0})
+        # Recounting agrees with the adjustment
+        Tag.objects.update_use_counts(list(Tag.objects.all()))
+        self.assertEquals(self.use_counts(), {u'python': 1, u'django': 0})
+        # Deleting again changes nothing
+        self.assertFalse(Question.objects.soft_delete(self.question,
+                                                      self.moderator))
+        self.assertEquals(self.use_counts(), {u'python': 1, u'django': 0})
+
+    def test_question_undelete_restores_tag_use_counts(self):
+        Question.objects.soft_delete(self.question, self.moderator)
+        self.assertTrue(Question.objects.undelete(self.question))
+        self.assertFalse(Question.objects.undelete(self.question))
+        self.assertEquals(self.use_counts(), {u'python': 1, u'django': 1})
+        question = Question.objects.get(id=self.question.id)
+        self.assertFalse(question.deleted)
+        self.assertEquals(question.deleted_by, None)
+
+    def test_answer_delete_and_undelete_adjust_answer_count(self):
+        self.assertTrue(Answer.objects.soft_delete(self.answer,
+                                                   self.moderator))
+        self.assertEquals(
+            Question.objects.get(id=self.question.id).answer_count, 0)
+        self.assertEquals(Answer.objects.for_question(self.question).count(),
+                          0)
+        self.assertEquals(Answer.objects.for_question(self.question,
+                                                      self.moderator).count(),
+                          1)
+        self.assertTrue(Answer.objects.undelete(self.answer))
+        self.assertEquals(
+            Question.objects.get(id=self.question.id).answer_count, 1)
+
+    def test_deleted_answer_with_positive_score_stops_counting(self):
+        Answer.objects.filter(id=self.answer.id).update(score=1)
+        Question.objects.update_unanswered(self.question.id)
+        self.assertFalse(Question.objects.get(id=self.question.id).unanswered)
+        Answer.objects.soft_delete(self.answer, self.moderator)
+        self.assertTrue(Question.objects.get(id=self.question.id).unanswered)
+        Answer.objects.undelete(self.answer)
+        self.assertFalse(Question.objects.get(id=self.question.id).unanswered)
+
+    def test_question_page_counts_answers_deleted_by_viewer(self):
+        Answer.objects.soft_delete(self.answer, self.moderator)
+        url = self.question.get_absolute_url()
+        response = self.client.get(url)
+        self.assertEquals(response.context[0]['page'].paginator.count, 0)
+        log_in(self.client, self.moderator)
+        response = self.client.get(url)
+        self.assertEquals(response.context[0]['page'].paginator.count, 1)
+        self.assertEquals(len(response.context[0]['answers']), 1)
+
+    def test_flagged_question_is_hidden_like_a_deletion(self):
+        threshold = settings.OFFENSIVE_FLAG_HIDE_THRESHOLD
+        settings.OFFENSIVE_FLAG_HIDE_THRESHOLD = 1
+        try:
+            FlaggedItem.objects.create(content_object=self.question,
+                                       user=self.moderator)
+        finally:
+            settings.OFFENSIVE_FLAG_HIDE_THRESHOLD = threshold
+        question = Question.objects.get(id=self.question.id)
+        self.assertTrue(question.deleted)
+        self.assertEquals(question.deleted_by_id, self.moderator.id)
+        self.assertEquals(self.use_counts(), {u'python': 0, u'django': 0})
+        self.assertTrue(Question.objects.undelete(self.question))
+        self.assertEquals(self.use_counts(), {u'python': 1, u'django': 1})
+
+    def test_cannot_comment_on_deleted_posts(self):
+        Question.objects.soft_delete(self.question, self.moderator)
+        log_in(self.client, self.moderator)
+        response = self.client.post('/questions/%s/comment/' %
+                                    self.question.id, {'comment': u'Hello'})
+        self.assertEquals(response.status_code, 404)
+
+class TimelineTestCase(TestCase):
+    def setUp(self):
+        self.asker = create_user('asker')
+        self.voter = create_user('voter')
+        self.question = create_question(self.asker, u'python')
+        activity.record(Activity.ASKED, self.asker.id, self.question,
+                        self.question.id)
+        activity.record(Activity.VOTED, self.voter.id, self.question,
+                        self.question.id)
+        activity.flush(True)
+
+    def types(self, activities, viewer):
+        timeline, next_before = activity.get_timeline(activities,
+                                                      viewer=viewer)
+        return [item['type'] for item in timeline]
+
+    def test_votes_are_hidden_from_others(self):
+        activities = Activity.objects.filter(question=self.question)
+        self.assertEquals(self.types(activities, AnonymousUser()),
+                          [u'asked'])
+        self.assertEquals(self.types(activities, self.asker), [u'asked'])
+        self.assertEquals(self.types(Activity.objects.filter(
+            user=self.voter), self.asker), [])
+
+    def test_votes_are_shown_to_voter(self):
+        self.assertEquals(self.types(Activity.objects.filter(
+            question=self.question), self.voter), [u'voted', u'asked'])
+        self.assertEquals(self.types(Activity.objects.filter(
+            user=self.voter), self.voter), [u'voted'])
+
+    def test_user_page_hides_votes(self):
+        response = self.client.get('/users/%s/' % self.voter.id)
+        self.assertEquals(response.context[0]['timeline'], [])
+        log_in(self.client, self.voter)
+        response = self.client.get('/users/%s/' % self.voter.id)
+        self.assertEquals([item['type'] for item
+                           in response.context[0]['timeline']], [u'voted'])
+
+class AwardNotificationTestCase(TestCase):
+    def setUp(self):
+        self.first = create_user('first')
+        self.second = create_user('second')
+        self.badge = Badge.objects.create(name=u'Teacher', type=Badge.BRONZE,
+                                          description=u'Answered a question')
+        for user in (self.first, self.second, self.first):
+            Award.objects.create(user=user, badge=self.badge)
+        # Cache unread counts as if the cache were shared
+        self.enabled = notifications._enabled
+        notifications._enabled = True
+        for user in (self.first, self.second):
+            cache.delete(notifications._cache_key(user.id))
+
+    def tearDown(self):
+        notifications._enabled = self.enabled
+
+    def test_awards_are_claimed_in_chunks(self):
+        self.assertEquals(Notification.objects.dispatch_awards(2),
+                          [self.first.id, self.second.id])
+        self.assertEquals(Notification.objects.dispatch_awards(2),
+                          [self.first.id])
+        self.assertEquals(Notification.objects.dispatch_awards(2), [])
+        self.assertEquals(Award.objects.filter(notified=False).count(), 0)
+        self.assertEquals(
+            list(Notification.objects.order_by('id').values_list(
+                'user', 'type', 'object_id', 'read')),
+            [(self.first.id, Notification.BADGE_AWARDED, self.badge.id, False),
+             (self.second.id, Notification.BADGE_AWARDED, self.badge.id, False),
+             (self.first.id, Notification.BADGE_AWARDED, self.badge.id, False)])
+
+    def test_dispatch_refreshes_cached_unread_counts(self):
+        self.assertEquals(notifications.unread_count(self.first), 0)
+        self.assertEquals(notifications.dispatch_awards(chunk_size=2), 3)
+        self.assertEquals(notifications.unread_count(self.first), 2)
+        self.assertEquals(notifications.unread_count(self.second), 1)
+        self.assertEquals(notifications.dispatch_awards(chunk_size=2), 0)
+
+    def test_mark_read(self):
+        notifications.dispatch_awards()
+        ids = list(Notification.objects.unread(self.first.id).values_list(
+            'id', flat=True))
+        self.assertEquals(notifications.mark_read(self.first.id, ids[:1]), 1)
+        self.assertEquals(notifications.unread_count(self.first), 1)
+        self.assertEquals(notifications.mark_read(self.first.id), 1)
+        self.assertEquals(notifications.unread_count(self.first), 0)
+        self.assertEquals(Notification.objects.unread_count(self.first.id), 0)
+        self.assertEquals(notifications.mark_read(self.first.id), 0)
+
+class ReplicaMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.user = create_user('writer')
+
+    def sets_sticky_cookie(self, method, user, status_code=200):
+        request = HttpRequest()
+        request.method = method
+        if user is not None:
+            request.user = user
+        response = HttpResponse(status=status_code)
+        ReplicaMiddleware().process_response(request, response)
+        return settings.REPLICA_STICKY_COOKIE_NAME in response.cookies
+
+    def test_successful_writes_by_users_are_sticky(self):
+        self.assertTrue(self.sets_sticky_cookie('POST', self.user))
+        self.assertTrue(self.sets_sticky_cookie('POST', self.user, 302))
+
+    def test_other_requests_are_not_sticky(self):
+        self.assertFalse(self.sets_sticky_cookie('GET', self.user))
+        self.assertFalse(self.sets_sticky_cookie('POST', self.user, 403))
+        self.assertFalse(self.sets_sticky_cookie('POST', AnonymousUser()))
+        self.assertFalse(self.sets_sticky_cookie('POST', None, 301))
+
+class BundleManifestTestCase(TestCase):
+    def setUp(self):
+        self.media_root = settings.MEDIA_ROOT
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        os.mkdir(os.path.join(settings.MEDIA_ROOT, bundles.BUNDLE_DIR))
+        self.path = os.path.join(settings.MEDIA_ROOT, bundles.BUNDLE_DIR,
+                                 bundles.MANIFEST_FILENAME)
+        bundles._manifest.invalidate()
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT)
+        settings.MEDIA_ROOT = self.media_root
+        bundles._manifest.invalidate()
+
+    def write_manifest(self, manifest):
+        f = open(self.path, 'wb')
+        try:
+            f.write(simplejson.dumps(manifest))
+        finally:
+            f.close()
+
+    def test_manifest_is_reloaded(self):
+        self.assertEquals(bundles.get_manifest(), {})
+        self.write_manifest({'base.js': 'base.1.js'})
+        # Served from memory until it's reloaded
+        self.assertEquals(bundles.get_manifest(), {})
+        bundles._manifest.invalidate()
+        self.assertEquals(bundles.get_manifest(), {'base.js': 'base.1.js'})
+        self.write_manifest({'base.js': 'base.2.js'})
+        bundles._manifest.invalidate()
+        self.assertEquals(bundles.get_manifest(), {'base.js': 'base.2.js'})
+        os.remove(self.path)
+        bundles._manifest.invalidate()
+        self.assertEquals(bundles.get_manifest(), {})
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.user = create_user('asker')
+        self.question = create_question(self.user, u'python')
+        self.url = self.question.get_absolute_url()
+
+    def test_unchanged_question_page_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEquals(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+        self.assertEquals(response['ETag'], etag)
+
+    def test_changed_question_page_is_rebuilt(self):
+        etag = self.client.get(self.url)['ETag']
+        create_answer(self.question, self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertNotEquals(response['ETag'], etag)
+
+    def test_author_card_changes_rebuild_pages(self):
+        question_etag = self.client.get(self.url)['ETag']
+        list_etag = self.client.get('/questions/')['ETag']
+        User.objects.filter(id=self.user.id).update(reputation=100)
+        response = self.client.get(self.url,
+                                   HTTP_IF_NONE_MATCH=question_etag)
+        self.assertEquals(response.status_code, 200)
+        response = self.client.get('/questions/',
+                                   HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEquals(response.status_code, 200)
+
+    def test_unchanged_question_list_is_not_modified(self):
+        etag = self.client.get('/questions/')['ETag']
+        response = self.client.get('/questions/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+        Question.objects.filter(id=self.question.id).update(score=1)
+        response = self.client.get('/questions/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+
+    def test_authenticated_pages_have_no_etag(self):
+        log_in(self.client, self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='*')
+        self.assertEquals(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+class ApiCursorTestCase(TestCase):
+    def setUp(self):
+        self.api_cache_timeout = settings.API_CACHE_TIMEOUT
+        settings.API_CACHE_TIMEOUT = 0
+        user = create_user('asker')
+        self.questions = [create_question(user, u'python')
+                          for i in xrange(5)]
+        # Equal ordering values must be split by id
+        Question.objects.update(added_at=datetime.datetime(2008, 10, 1, 12))
+        for score, question in zip((2, 1, 1, 1, 0), self.questions):
+            Question.objects.filter(id=question.id).update(score=score)
+
+    def tearDown(self):
+        settings.API_CACHE_TIMEOUT = self.api_cache_timeout
+
+    def get(self, path, data):
+        response = self.client.get(path, data)
+        return response.status_code, simplejson.loads(response.content)
+
+    def all_pages(self, data):
+        ids = []
+        after = None
+        while True:
+            page_data = dict(data, count=2)
+            if after is not None:
+                page_data['after'] = after
+            status, content = self.get('/api/1/questions/', page_data)
+            self.assertEquals(status, 200)
+            self.assertTrue(len(content['questions']) <= 2)
+            ids.extend([item['id'] for item in content['questions']])
+            after = content['next']
+            if after is None:
+                return ids
+
+    def test_pages_follow_each_other(self):
+        ids = [question.id for question in self.questions]
+        ids.reverse()
+        self.assertEquals(self.all_pages({}), ids)
+
+    def test_pages_in_other_orders(self):
+        ids = [question.id for question in self.questions]
+        self.assertEquals(self.all_pages({'sort': 'votes'}),
+                          [ids[0], ids[3], ids[2], ids[1], ids[4]])
+
+    def test_invalid_cursor(self):
+        status, content = self.get('/api/1/questions/', {'after': 'x'})
+        self.assertEquals(status, 400)
+        self.assertEquals(content, {'error': u'Invalid cursor'})
+
+class FeedTestCase(TestCase):
+    def setUp(self):
+        # Cache feeds as if the cache were shared
+        self.enabled = feeds._enabled
+        feeds._enabled = True
+        for name in (u'questions', u'tag:python', u'tag:unknown'):
+            cache.delete(feeds._cache_key(name))
+        self.user = create_user('asker')
+        self.question = create_question(self.user, u'python')
+
+    def tearDown(self):
+        feeds.discard_invalidations()
+        feeds._enabled = self.enabled
+
+    def test_unknown_tag_is_not_found(self):
+        response = self.client.get('/feeds/questions/tagged/unknown/')
+        self.assertEquals(response.status_code, 404)
+        self.assertEquals(cache.get(feeds._cache_key(u'tag:unknown')), None)
+
+    def test_tagged_feed(self):
+        response = self.client.get('/feeds/questions/tagged/python/')
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(self.question.title in response.content)
+
+    def test_unchanged_feed_is_not_modified(self):
+        etag = self.client.get('/feeds/questions/')['ETag']
+        response = self.client.get('/feeds/questions/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+
+    def test_cached_feed_picks_up_new_question(self):
+        self.client.get('/feeds/questions/')
+        question = create_question(self.user, u'python',
+                                   title=u'How do I feed this?')
+        response = self.client.get('/feeds/questions/')
+        self.assertFalse(question.title in response.content)
+        feeds.invalidate_question(question)
+        feeds.flush_invalidations()
+        response = self.client.get('/feeds/questions/')
+        self.assertTrue(question.title in response.content)
+
+    def test_discarded_invalidations_leave_feed_cached(self):
+        self.client.get('/feeds/questions/')
+        feeds.invalidate_question(self.question)
+        feeds.discard_invalidations()
+        feeds.flush_invalidations()
+        self.assertNotEquals(cache.get(feeds._cache_key(u'questions')), None)
+
+class SitemapTestCase(TestCase):
+    def setUp(self):
+        self.shard_size = settings.SITEMAP_SHARD_SIZE
+        settings.SITEMAP_SHARD_SIZE = 2
+        self.directory = tempfile.mkdtemp()
+        user = create_user('asker')
+        self.questions = [create_question(user, u'python')
+                          for i in xrange(5)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        settings.SITEMAP_SHARD_SIZE = self.shard_size
+
+    def shard(self, question):
+        return (question.id - 1) // 2
+
+    def build(self, force=False):
+        return sitemaps.build(self.directory, 'http://example.com',
+                              'http://example.com/sitemaps/', force)
+
+    def test_only_changed_shards_are_rewritten(self):
+        shards = sorted(set([self.shard(q) for q in self.questions]))
+        self.assertEquals(self.build(), shards)
+        self.assertEquals(self.build(), [])
+        question = self.questions[0]
+        Question.objects.filter(id=question.id).update(
+            last_activity_at=datetime.datetime.now())
+        self.assertEquals(self.build(), [self.shard(question)])
+        self.assertEquals(self.build(force=True), shards)
+
+    def test_emptied_shards_are_removed(self):
+        self.build()
+        shard = self.shard(self.questions[-1])
+        path = os.path.join(self.directory, sitemaps.shard_filename(shard))
+        self.assertTrue(os.path.exists(path))
+        Question.objects.filter(id__in=[q.id for q in self.questions
+            if self.shard(q) == shard]).update(deleted=True)
+        self.assertEquals(self.build(), [])
+        self.assertFalse(os.path.exists(path))
+        index = open(os.path.join(self.directory, sitemaps.INDEX_FILE)).read()
+        self.assertFalse(sitemaps.shard_filename(shard) in index)
+
+    def test_shards_list_question_urls(self):
+        self.build()
+        question = self.questions[0]
+        f = gzip.open(os.path.join(self.directory,
+                                   sitemaps.shard_filename(self.shard(question))))
+        try:
+            content = f.read()
+        finally:
+            f.close()
+        self.assertTrue('<loc>http://example.com%s</loc>' %
+                        question.get_absolute_url() in content)
+
+class ProfilingTestCase(TestCase):
+    urls = 'soclone.tests.urls'
+
+    def setUp(self):
+        self.profile_root = settings.PROFILE_ROOT
+        self.ring_size = settings.PROFILE_RING_SIZE
+        settings.PROFILE_ROOT = tempfile.mkdtemp()
+        settings.PROFILE_RING_SIZE = 3
+
+    def tearDown(self):
+        shutil.rmtree(settings.PROFILE_ROOT)
+        settings.PROFILE_ROOT = self.profile_root
+        settings.PROFILE_RING_SIZE = self.ring_size
+
+    def test_tokens(self):
+        token = profiling.create_token()
+        self.assertTrue(profiling.check_token(token))
+        expires, signature = token.split('-')
+        self.assertFalse(profiling.check_token('%s-%s' % (int(expires) + 1,
+                                                          signature)))
+        self.assertFalse(profiling.check_token('%s-%s' % (expires,
+                                                          signature[::-1])))
+        self.assertFalse(profiling.check_token(profiling.create_token(-1)))
+        self.assertFalse(profiling.check_token('garbage'))
+
+    def test_only_latest_profiles_are_kept(self):
+        for i in xrange(5):
+            profiling.save(cProfile.Profile(), {'index': i})
+        ids = profiling.profile_ids()
+        self.assertEquals(len(ids), 3)
+        self.assertEquals([profiling.get_details(profile_id)['index']
+                           for profile_id in ids], [4, 3, 2])
+        self.assertEquals(len(os.listdir(settings.PROFILE_ROOT)), 6)
+        self.assertEquals(profiling.get_details('../../settings'), None)
+
+    def test_failing_profiled_view_commits_nothing(self):
+        create_user('profiled')
+        self.assertRaises(ValueError, self.client.post, '/write-and-fail/',
+                          {}, HTTP_X_PROFILE=profiling.create_token())
+        self.assertEquals(Tag.objects.filter(name=u'phantom').count(), 0)
+        ids = profiling.profile_ids()
+        self.assertEquals(len(ids), 1)
+        details = profiling.get_details(ids[0])
+        self.assertEquals(details['view'],
+                          'soclone.tests.urls.write_and_fail')
+        self.assertEquals(details['status'], None)
+
+class PresenceTestCase(TestCase):
+    def setUp(self):
+        self.user = create_user('visitor')
+        presence._recorded.clear()
+
+    def test_record_writes_immediately_without_flush_interval(self):
+        self.assertEquals(settings.LAST_SEEN_FLUSH_INTERVAL, None)
+        long_ago = datetime.datetime(2008, 10, 1, 12)
+        User.objects.filter(id=self.user.id).update(last_seen=long_ago)
+        presence.record(self.user.id)
+        self.assertTrue(User.objects.get(id=self.user.id).last_seen >
+                        long_ago)
+        self.assertEquals(presence._pending, {})
+        self.assertEquals(presence._flusher, None)
+
+    def test_failed_flush_keeps_pending_times(self):
+        seen_at = datetime.datetime(2008, 10, 1, 12)
+        later = datetime.datetime(2008, 10, 1, 13)
+        other_id = self.user.id + 1
+        presence._pending.update({self.user.id: seen_at, other_id: seen_at})
+        update_last_seen = User.objects.__class__.update_last_seen
+        def fail(manager, seen):
+            # Another User is seen again while the write is failing
+            presence._pending[other_id] = later
+            raise ValueError('Database unavailable')
+        User.objects.__class__.update_last_seen = fail
+        try:
+            self.assertRaises(ValueError, presence.flush)
+        finally:
+            User.objects.__class__.update_last_seen = update_last_seen
+        self.assertEquals(presence._pending, {self.user.id: seen_at,
+                                              other_id: later})
+        presence._pending.clear()
+
+class FakeCursor(object):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query):
+        if self.conn.fail_queries:
+            raise Exception('Connection lost')
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+class FakeConnection(object):
+    def __init__(self):
+        self.fail_queries = False
+        self.fail_rollbacks = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.fail_rollbacks:
+            raise Exception('Connection lost')
+
+    def close(self):
+        self.closed = True
+
+class ConnectionPoolTestCase(TestCase):
+    def setUp(self):
+        self.connections = []
+        self.fail_connects = False
+
+    def connect(self):
+        if self.fail_connects:
+            raise Exception('Database unavailable')
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+    def create_pool(self, max_size, **kwargs):
+        return pool.ConnectionPool(self.connect, max_size, timeout=0,
+                                   **kwargs)
+
+    def test_size_is_bounded(self):
+        p = self.create_pool(2)
+        first = p.checkout()
+        p.checkout()
+        self.assertRaises(pool.PoolTimeout, p.checkout)
+        self.assertEquals(p.stats['timeouts'], 1)
+        p.checkin(first)
+        self.assertTrue(p.checkout() is first)
+        self.assertEquals(p.stats['connects'], 2)
+
+    def test_old_connections_are_recycled(self):
+        p = self.create_pool(1, max_age=0)
+        first = p.checkout()
+        p.checkin(first)
+        second = p.checkout()
+        self.assertFalse(second is first)
+        self.assertTrue(first.closed)
+        self.assertEquals(p.stats['recycled'], 1)
+        self.assertEquals(p.stats['connects'], 2)
+
+    def test_failed_idle_check_releases_slot(self):
+        p = self.create_pool(1, check_idle=0)
+        first = p.checkout()
+        p.checkin(first)
+        first.fail_queries = True
+        self.fail_connects = True
+        self.assertRaises(Exception, p.checkout)
+        self.assertTrue(first.closed)
+        self.assertEquals(p.stats['failed_checks'], 1)
+        self.fail_connects = False
+        self.assertFalse(p.checkout() is first)
+
+    def test_failed_rollback_frees_slot(self):
+        p = self.create_pool(1)
+        first = p.checkout()
+        first.fail_rollbacks = True
+        p.checkin(first)
+        self.assertTrue(first.closed)
+        second = p.checkout()
+        self.assertFalse(second is first)
+        self.assertEquals(p.stats['connects'], 2)
+
+    def test_close_idle(self):
+        p = self.create_pool(2)
+        first = p.checkout()
+        second = p.checkout()
+        p.checkin(first)
+        p.checkin(second)
+        p.close_idle()
+        self.assertTrue(first.closed and second.closed)
+        p.checkout()
+        p.checkout()
+        self.assertRaises(pool.PoolTimeout, p.checkout)
+        self.assertEquals(p.stats['connects'], 4)
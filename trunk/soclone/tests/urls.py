@@ -0,0 +1,14 @@
+from django.conf.urls.defaults import *
+from django.contrib.auth.models import User
+
+from soclone.models import Tag
+
+def write_and_fail(request):
+    """Makes a change and then fails, which must leave nothing behind."""
+    Tag.objects.create(name=u'phantom',
+                       created_by=User.objects.get(username='profiled'))
+    raise ValueError('Failed after writing')
+
+urlpatterns = patterns('',
+    url(r'^write-and-fail/$', write_and_fail),
+)
@@ -10,8 +10,10 @@ urlpatterns = patterns('soclone.views',
     url(r'^search/$',                                    'search',             name='search'),
     url(r'^login/$',                                     'login',              name='login'),
     url(r'^logout/$',                                    'logout',             name='logout'),
+    url(r'^preview/$',                                   'preview',            name='preview'),
     url(r'^questions/$',                                 'questions',          name='questions'),
     url(r'^questions/ask/$',                             'ask_question',       name='ask_question'),
+    url(r'^questions/duplicates/$',                      'duplicate_questions', name='duplicate_questions'),
     url(r'^questions/tagged/(?P<tag_name>[^/]+)/$',      'tag',                name='tag'),
     url(r'^questions/(?P<question_id>\d+)/answer/$',     'add_answer',         name='add_answer'),
     url(r'^questions/(?P<question_id>\d+)/close/$',      'close_question',     name='close_question'),
@@ -19,6 +21,8 @@ urlpatterns = patterns('soclone.views',
     url(r'^questions/(?P<question_id>\d+)/delete/$',     'delete_question',    name='delete_question'),
     url(r'^questions/(?P<question_id>\d+)/favourite/$',  'favourite_question', name='favourite_question'),
     url(r'^questions/(?P<question_id>\d+)/revisions/$',  'question_revisions', name='question_revisions'),
+    url(r'^questions/(?P<question_id>\d+)/state/$',      'question_state',     name='question_state'),
+    url(r'^questions/(?P<question_id>\d+)/timeline/$',   'question_timeline',  name='question_timeline'),
     url(r'^questions/(?P<object_id>\d+)/comment/$',      'add_comment',        name='add_question_comment', kwargs={'model': Question}),
     url(r'^questions/(?P<object_id>\d+)/flag/$',         'flag_item',          name='flag_question', kwargs={'model': Question}),
     url(r'^questions/(?P<object_id>\d+)/vote/$',         'vote',               name='vote_on_question', kwargs={'model': Question}),
@@ -27,16 +31,38 @@ urlpatterns = patterns('soclone.views',
     url(r'^answers/(?P<answer_id>\d+)/$',                'answer_comments',    name='answer'),
     url(r'^answers/(?P<answer_id>\d+)/accept/$',         'accept_answer',      name='accept_answer'),
     url(r'^answers/(?P<answer_id>\d+)/edit/$',           'edit_answer',        name='edit_answer'),
+    url(r'^answers/(?P<answer_id>\d+)/delete/$',         'delete_answer',      name='delete_answer'),
     url(r'^answers/(?P<answer_id>\d+)/revisions/$',      'answer_revisions',   name='answer_revisions'),
     url(r'^answers/(?P<object_id>\d+)/comment/$',        'add_comment',        name='add_answer_comment', kwargs={'model': Answer}),
     url(r'^answers/(?P<object_id>\d+)/flag/$',           'flag_item',          name='flag_answer', kwargs={'model': Answer}),
     url(r'^answers/(?P<object_id>\d+)/vote/$',           'vote',               name='vote_on_answer', kwargs={'model': Answer}),
     url(r'^comments/(?P<comment_id>\d+)/delete/$',       'delete_comment',     name='delete_comment'),
     url(r'^tags/$',                                      'tags',               name='tags'),
+    url(r'^tags/related/$',                              'related_tags_json',  name='related_tags'),
     url(r'^users/$',                                     'users',              name='users'),
     url(r'^users/(?P<user_id>\d+)/(?:[^/]+/)?$',         'user',               name='user'),
+    url(r'^notifications/$',                            'user_notifications', name='notifications'),
     url(r'^badges/$',                                    'badges',             name='badges'),
     url(r'^badges/(?P<badge_id>\d+)/(?:[^/]+/)?$',       'badge',              name='badge'),
+    url(r'^moderation/flags/$',                          'moderation_queue',   name='moderation_queue'),
+    url(r'^moderation/flags/(?P<item_id>\d+)/resolve/$', 'resolve_moderation_item', name='resolve_moderation_item'),
+    url(r'^profiles/$',                                  'profiles',           name='profiles'),
+    url(r'^profiles/(?P<profile_id>[\d-]+)/$',           'profile',            name='profile'),
+    url(r'^profiles/(?P<profile_id>[\d-]+)/download/$',  'download_profile',   name='download_profile'),
+)
+
+urlpatterns += patterns('soclone.api',
+    url(r'^api/1/questions/$',                           'questions',          name='api_questions'),
+    url(r'^api/1/questions/(?P<question_id>\d+)/$',      'question',           name='api_question'),
+    url(r'^api/1/tags/$',                                'tags',               name='api_tags'),
+    url(r'^api/1/users/$',                               'users',              name='api_users'),
+    url(r'^api/1/users/(?P<user_id>\d+)/$',              'user',               name='api_user'),
+)
+
+urlpatterns += patterns('soclone.feeds',
+    url(r'^feeds/questions/$',                           'newest_questions',   name='questions_feed'),
+    url(r'^feeds/questions/tagged/(?P<tag_name>[^/]+)/$', 'tagged_questions',  name='tag_feed'),
+    url(r'^feeds/questions/(?P<question_id>\d+)/$',      'question_answers',   name='question_feed'),
 )
 
 if settings.DEBUG:
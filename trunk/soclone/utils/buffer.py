@@ -0,0 +1,58 @@
+"""Utilities for collecting items in memory to be processed in batches."""
+import threading
+import time
+
+class BatchBuffer(object):
+    """
+    A thread-safe buffer of items which becomes due to be processed once
+    it holds ``max_size`` items or its oldest item has been waiting for
+    ``max_age`` seconds.
+
+    >>> b = BatchBuffer(2, 60)
+    >>> b.append(1)
+    >>> b.take()
+    []
+    >>> b.append(2)
+    >>> b.take()
+    [1, 2]
+    >>> b.append(3)
+    >>> b.take(force=True)
+    [3]
+    """
+    def __init__(self, max_size, max_age):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._items = []
+        self._started_at = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def append(self, item):
+        self._lock.acquire()
+        try:
+            if not self._items:
+                self._started_at = time.time()
+            self._items.append(item)
+        finally:
+            self._lock.release()
+
+    def take(self, force=False):
+        """
+        Empties the buffer and returns its contents if it's due to be
+        processed or ``force`` is ``True``, otherwise returns an empty
+        list.
+        """
+        self._lock.acquire()
+        try:
+            if not self._items:
+                return []
+            if (not force and len(self._items) < self.max_size and
+                time.time() - self._started_at < self.max_age):
+                return []
+            items = self._items
+            self._items = []
+            return items
+        finally:
+            self._lock.release()
@@ -0,0 +1,218 @@
+"""Utilities for caching data in memory."""
+import threading
+import time
+
+from django.db import connection
+
+# Django cache backends which keep their data in each process
+PROCESS_CACHE_SCHEMES = ('locmem', 'simple', 'dummy')
+
+def is_shared_cache(backend):
+    """
+    Determines if a ``CACHE_BACKEND`` setting is for a cache which is
+    shared between processes, so changes made to its contents by one
+    process are seen by all of them.
+
+    >>> is_shared_cache('memcached://127.0.0.1:11211/')
+    True
+    >>> is_shared_cache('locmem:///')
+    False
+    """
+    return backend.split(':', 1)[0] not in PROCESS_CACHE_SCHEMES
+
+class LRUCache(object):
+    """
+    A thread-safe, dict-like cache which holds at most ``max_size``
+    items, discarding the least recently used item when full.
+
+    >>> c = LRUCache(2)
+    >>> c.set('a', 1)
+    >>> c.set('b', 2)
+    >>> c.get('a')
+    1
+    >>> c.set('c', 3)
+    >>> c.get('b') is None
+    True
+    >>> c.get('a'), c.get('c')
+    (1, 3)
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # Maps keys to [previous link, next link, key, value] links in a
+        # circular doubly linked list, most recently used first.
+        self._map = {}
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+    def __len__(self):
+        return len(self._map)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def get(self, key, default=None):
+        """
+        Retrieves the item with the given key, marking it as the most
+        recently used, or returns ``default`` if it isn't present.
+        """
+        self._lock.acquire()
+        try:
+            link = self._map.get(key, None)
+            if link is None:
+                return default
+            self._move_to_front(link)
+            return link[3]
+        finally:
+            self._lock.release()
+
+    def get_many(self, keys):
+        """
+        Retrieves a dict of items for those of the given keys which are
+        present in the cache.
+        """
+        found = {}
+        self._lock.acquire()
+        try:
+            for key in keys:
+                link = self._map.get(key, None)
+                if link is not None:
+                    self._move_to_front(link)
+                    found[key] = link[3]
+        finally:
+            self._lock.release()
+        return found
+
+    def set(self, key, value):
+        """
+        Stores an item with the given key, discarding the least recently
+        used item if the cache is full.
+        """
+        self._lock.acquire()
+        try:
+            link = self._map.get(key, None)
+            if link is not None:
+                link[3] = value
+                self._move_to_front(link)
+                return
+            if len(self._map) >= self.max_size:
+                oldest = self._root[0]
+                self._unlink(oldest)
+                del self._map[oldest[2]]
+            root = self._root
+            link = [root, root[1], key, value]
+            root[1][0] = link
+            root[1] = link
+            self._map[key] = link
+        finally:
+            self._lock.release()
+
+    def delete(self, key):
+        """Removes the item with the given key, if present."""
+        self._lock.acquire()
+        try:
+            link = self._map.pop(key, None)
+            if link is not None:
+                self._unlink(link)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Removes all items."""
+        self._lock.acquire()
+        try:
+            self._map.clear()
+            self._root[:] = [self._root, self._root, None, None]
+        finally:
+            self._lock.release()
+
+    def _unlink(self, link):
+        link[0][1] = link[1]
+        link[1][0] = link[0]
+
+    def _move_to_front(self, link):
+        self._unlink(link)
+        root = self._root
+        link[0] = root
+        link[1] = root[1]
+        root[1][0] = link
+        root[1] = link
+
+class ReloadingValue(object):
+    """
+    Holds a value which is expensive to load, such as data precomputed
+    from the database, reloading it once it's older than ``refresh``
+    seconds.
+
+    The current value continues to be served while a single background
+    thread loads its replacement, unless it's older than ``max_age``
+    seconds, when callers wait for a fresh value instead. Callers always
+    wait when there's no value yet.
+
+    >>> loads = []
+    >>> def load():
+    ...     loads.append(1)
+    ...     return len(loads)
+    >>> value = ReloadingValue(load, 60)
+    >>> value.get(), value.get()
+    (1, 1)
+    >>> value.invalidate()
+    >>> value.get()
+    2
+    """
+    def __init__(self, load, refresh, max_age=None):
+        self.load = load
+        self.refresh = refresh
+        self.max_age = max_age
+        # A two-tuple of the value and the time it was loaded, replaced
+        # as a whole so threads always see a consistent pair.
+        self._current = None
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        """
+        Loads a new value and swaps it in. Must be called with the lock
+        held, which will be released.
+        """
+        try:
+            self._current = (self.load(), time.time())
+        finally:
+            self._lock.release()
+
+    def _reload_in_background(self):
+        try:
+            self._reload()
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
+    def get(self):
+        """Retrieves the current value, reloading it if stale."""
+        current = self._current
+        if current is not None:
+            age = time.time() - current[1]
+            if age < self.refresh:
+                return current[0]
+
+        if (current is None or
+            (self.max_age is not None and age >= self.max_age)):
+            # Wait for a fresh value, unless another thread loaded one
+            # while we were waiting.
+            self._lock.acquire()
+            if self._current is not current:
+                self._lock.release()
+            else:
+                self._reload()
+            return self._current[0]
+
+        # Serve the stale value, reloading in the background if no other
+        # thread is already doing so.
+        if self._lock.acquire(False):
+            thread = threading.Thread(target=self._reload_in_background)
+            thread.setDaemon(True)
+            thread.start()
+        return current[0]
+
+    def invalidate(self):
+        """Discards the current value, so the next caller loads a new one."""
+        self._current = None
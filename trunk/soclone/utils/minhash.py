@@ -0,0 +1,78 @@
+"""
+MinHash signatures and locality-sensitive hashing, used to find pieces
+of text which are likely to be near-duplicates without comparing them
+all against each other.
+
+Text is broken into overlapping word shingles and summarised by a MinHash
+signature. The signature is split into bands, each of which is hashed
+into a bucket - texts which share a bucket are candidate duplicates, and
+the more buckets they share, the more similar they are likely to be.
+"""
+import random
+import re
+import zlib
+
+word_re = re.compile(r'[a-z0-9][a-z0-9+#.]*')
+
+SHINGLE_SIZE = 3
+MAX_WORDS = 500
+BANDS = 16
+ROWS_PER_BAND = 4
+SIGNATURE_SIZE = BANDS * ROWS_PER_BAND
+
+# Hash functions are of the form (a * x + b) % PRIME. The coefficients
+# must be the same in every process, so they're generated from a fixed
+# seed.
+PRIME = (1 << 61) - 1
+_random = random.Random(1729)
+_coefficients = [(_random.randint(1, PRIME - 1), _random.randint(0, PRIME - 1))
+                 for i in xrange(SIGNATURE_SIZE)]
+del _random
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Creates a set of hashed word shingles from the given text, using at
+    most ``MAX_WORDS`` words.
+
+    >>> len(shingles(u'one two three four'))
+    2
+    >>> shingles(u'One, two') == shingles(u'one two')
+    True
+    """
+    words = word_re.findall(text.lower())[:MAX_WORDS]
+    if len(words) < size:
+        words = [u' '.join(words)]
+        size = 1
+    return set([zlib.crc32(u' '.join(words[i:i + size]).encode('utf-8'))
+                & 0xffffffff
+                for i in xrange(len(words) - size + 1)])
+
+def signature(hashed_shingles):
+    """Creates a MinHash signature from a set of hashed shingles."""
+    if not hashed_shingles:
+        return [PRIME] * SIGNATURE_SIZE
+    return [min([(a * x + b) % PRIME for x in hashed_shingles])
+            for a, b in _coefficients]
+
+def buckets(text):
+    """
+    Creates a list of LSH bucket numbers for the given text, one for each
+    band of its MinHash signature.
+
+    >>> a = buckets(u'How do I parse an XML file with Python?')
+    >>> len(a)
+    16
+    >>> a == buckets(u'How do I parse an XML file with Python')
+    True
+    >>> text = u' '.join([u'word%s' % i for i in range(100)])
+    >>> c = buckets(text + u' How do I parse an XML file?')
+    >>> 8 < len(set(c) & set(buckets(text))) < 16
+    True
+    """
+    sig = signature(shingles(text))
+    result = []
+    for band in xrange(BANDS):
+        rows = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        result.append(zlib.crc32('%d:%s' % (band, ','.join(map(str, rows))))
+                      & 0x7fffffff)
+    return result
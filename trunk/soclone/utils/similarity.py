@@ -0,0 +1,117 @@
+"""Utilities for measuring the similarity of pieces of text."""
+import heapq
+import math
+import re
+
+word_re = re.compile(r'[a-z0-9][a-z0-9+#.]*')
+
+STOP_WORDS = frozenset((
+    'a', 'about', 'an', 'and', 'are', 'as', 'at', 'be', 'best', 'by', 'can',
+    'do', 'does', 'for', 'from', 'get', 'how', 'i', 'if', 'in', 'is', 'it',
+    'my', 'not', 'of', 'on', 'or', 'should', 'that', 'the', 'there', 'this',
+    'to', 'using', 'was', 'way', 'what', 'when', 'where', 'which', 'while',
+    'who', 'why', 'will', 'with', 'without', 'you', 'your',
+))
+
+TAG_WEIGHT = 2.0
+TITLE_WORD_WEIGHT = 1.0
+
+def words(text):
+    """
+    Splits text into lowercase words, excluding common words.
+
+    >>> words(u'How do I parse XML in C#?')
+    [u'parse', u'xml', u'c#']
+    """
+    return [word for word in word_re.findall(text.lower())
+            if word not in STOP_WORDS]
+
+def question_features(title, tagnames):
+    """
+    Creates a sparse vector of features for a Question as a dict of
+    feature weights keyed by feature, normalised to unit length.
+
+    >>> f = question_features(u'Parsing XML', u'python xml')
+    >>> sorted(f.keys())
+    [u't:python', u't:xml', u'w:parsing', u'w:xml']
+    >>> round(sum(w * w for w in f.values()), 6)
+    1.0
+    """
+    features = {}
+    for tagname in tagnames.split():
+        features[u't:%s' % tagname] = TAG_WEIGHT
+    for word in words(title):
+        features[u'w:%s' % word] = TITLE_WORD_WEIGHT
+    return normalise(features)
+
+def normalise(vector):
+    """Normalises a sparse vector to unit length."""
+    length = math.sqrt(sum([w * w for w in vector.itervalues()]))
+    if not length:
+        return vector
+    return dict([(f, w / length) for f, w in vector.iteritems()])
+
+def cosine_similarity(a, b):
+    """
+    Calculates the similarity of two normalised sparse vectors.
+
+    >>> a = question_features(u'Parsing XML', u'python xml')
+    >>> round(cosine_similarity(a, a), 6)
+    1.0
+    >>> cosine_similarity(a, question_features(u'Ruby loops', u'ruby'))
+    0
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    return sum([w * b[f] for f, w in a.iteritems() if f in b])
+
+def top_similar(vector, candidates, count, minimum=0.0):
+    """
+    Finds the ``count`` items most similar to the given normalised sparse
+    vector from an iterable of (item, vector) two-tuples.
+
+    Returns a list of (similarity, item) two-tuples, most similar first.
+    """
+    scored = []
+    for item, candidate in candidates:
+        score = cosine_similarity(vector, candidate)
+        if score > minimum:
+            scored.append((score, item))
+    return heapq.nlargest(count, scored)
+
+class SparseIndex(object):
+    """
+    An inverted index of normalised sparse vectors, used to find the most
+    similar vectors for many vectors at once without comparing every
+    pair of vectors.
+
+    Features which appear in more than ``max_postings`` vectors are too
+    common to help distinguish between them and are ignored.
+    """
+    def __init__(self, max_postings=1000):
+        self.max_postings = max_postings
+        self.vectors = {}
+        self.postings = {}
+
+    def add(self, item, vector):
+        self.vectors[item] = vector
+        for feature, weight in vector.iteritems():
+            self.postings.setdefault(feature, []).append((item, weight))
+
+    def top_similar(self, item, count, minimum=0.0):
+        """
+        Finds the ``count`` items most similar to the given indexed item,
+        returning a list of (similarity, item) two-tuples, most similar
+        first.
+        """
+        scores = {}
+        for feature, weight in self.vectors[item].iteritems():
+            postings = self.postings[feature]
+            if len(postings) > self.max_postings:
+                continue
+            for other, other_weight in postings:
+                scores[other] = scores.get(other, 0.0) + weight * other_weight
+        scores.pop(item, None)
+        return heapq.nlargest(count, [(score, other) for other, score
+                                      in scores.iteritems()
+                                      if score > minimum])
@@ -1,36 +1,55 @@
 """SOClone views."""
+import collections
 import datetime
 import itertools
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import views as auth_views
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator, InvalidPage
-from django.http import Http404, HttpResponseRedirect
+from django.core.urlresolvers import reverse
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render_to_response
 from django.template import RequestContext
+from django.template.defaultfilters import slugify
 from django.utils.html import strip_tags
 from django.utils.safestring import mark_safe
 
 from lxml.html.diff import htmldiff
 from markdown2 import Markdown
+from soclone import activity
 from soclone import auth
+from soclone import cards
 from soclone import diff
+from soclone import feeds
+from soclone import interaction
+from soclone import notifications
+from soclone import profiling
+from soclone import replica
+from soclone import stamps
+from soclone.cooccurrence import related_tags
 from soclone.forms import (AddAnswerForm, AskQuestionForm, CloseQuestionForm,
     CommentForm, EditAnswerForm, EditQuestionForm, RetagQuestionForm,
     RevisionForm)
 from soclone.http import JsonResponse
-from soclone.models import (Answer, AnswerRevision, Badge, Comment,
-    FavouriteQuestion, Question, QuestionRevision, Tag, Vote)
+from soclone.models import (Activity, Answer, AnswerRevision, Badge, Comment,
+    DuplicateBucket, FavouriteQuestion, FlaggedItem, ModerationQueueItem,
+    Notification, PostEditor, Question, QuestionRevision, RelatedQuestion,
+    Tag, Vote)
+from soclone.preview import PreviewTooLong, render_preview
 from soclone.questions import (all_question_views, index_question_views,
-    unanswered_question_views)
+    tagged_question_views, unanswered_question_views)
 from soclone.shortcuts import get_page
+from soclone.snapshots import get_index_snapshot
 from soclone.utils.html import sanitize_html
 from soclone.utils.models import populate_foreign_key_caches
 
 markdowner = Markdown(html4tags=True)
 
 AUTO_WIKI_ANSWER_COUNT = 30
+AUTO_WIKI_AUTHOR_EDIT_COUNT = 5
+AUTO_WIKI_EDITOR_COUNT = 4
 
 def get_questions_per_page(user):
     if user.is_authenticated():
@@ -50,13 +69,21 @@ def question_list(request, question_views, template, questions_per_page=None,
                                                          question_views[0])
     if questions_per_page is None:
         questions_per_page = get_questions_per_page(request.user)
-    paginator = Paginator(view.get_queryset(), questions_per_page)
+    paginator = Paginator(replica.route(view.get_queryset()),
+                          questions_per_page)
     if page_number is None:
         page = get_page(request, paginator)
     else:
         page = paginator.page(page_number)
+    etag, response = stamps.check(request, stamps.question_list_stamp, page,
+                                  view.user)
+    if response is not None:
+        return response
     populate_foreign_key_caches(User, ((page.object_list, (view.user,)),),
                                 fields=view.user_fields)
+    # Render User cards for the whole page at once, ready for the template
+    cards.cache_cards([getattr(question, view.user)
+                       for question in page.object_list])
     context = {
         'title': view.page_title,
         'page': page,
@@ -66,17 +93,29 @@ def question_list(request, question_views, template, questions_per_page=None,
     }
     if extra_context is not None:
         context.update(extra_context)
-    return render_to_response(template, context,
-                              context_instance=RequestContext(request))
+    return stamps.set_etag(render_to_response(template, context,
+        context_instance=RequestContext(request)), etag)
 
 def index(request):
-    """A condensed version of the main Question list."""
-    extra_context = {
-        # TODO Retrieve extra context required for index page
-    }
-    return question_list(request, index_question_views, 'index.html',
-                         questions_per_page=50, page_number=1,
-                         extra_context=extra_context)
+    """
+    A condensed version of the main Question list, served from a
+    periodically rebuilt snapshot.
+    """
+    snapshot = get_index_snapshot()
+    etag, response = stamps.check(request, lambda: str(snapshot.built_at))
+    if response is not None:
+        return response
+    view_id = request.GET.get('sort', None)
+    view = dict([(q.id, q) for q in index_question_views]).get(
+        view_id, index_question_views[0])
+    return stamps.set_etag(render_to_response('index.html', {
+        'title': view.page_title,
+        'questions': snapshot.questions[view.id],
+        'current_view': view,
+        'question_views': index_question_views,
+        'tags': snapshot.tags,
+        'awards': snapshot.awards,
+    }, context_instance=RequestContext(request)), etag)
 
 def about(request):
     """About SOClone."""
@@ -91,12 +130,21 @@ def search(request):
     raise NotImplementedError
 
 def login(request):
-    """Logs in."""
-    return auth_views.login(request, template_name='login.html')
+    """
+    Logs in, setting the cookie which tells the authentication middleware
+    to look up the User.
+    """
+    response = auth_views.login(request, template_name='login.html')
+    if request.method == 'POST' and request.user.is_authenticated():
+        response.set_cookie(settings.AUTH_COOKIE_NAME, '1',
+                            max_age=settings.SESSION_COOKIE_AGE)
+    return response
 
 def logout(request):
-    """Logs out."""
-    return auth_views.logout(request, template_name='logged_out.html')
+    """Logs out, removing the cookie set when logging in."""
+    response = auth_views.logout(request, template_name='logged_out.html')
+    response.delete_cookie(settings.AUTH_COOKIE_NAME)
+    return response
 
 def questions(request):
     """All Questions list."""
@@ -116,20 +164,14 @@ DEFAULT_ANSWER_SORT = 'votes'
 
 def question(request, question_id):
     """Displays a Question."""
-    if not request.user.is_authenticated():
-        question = get_object_or_404(Question, id=question_id)
-        favourite = False
-    else:
-        question = get_object_or_404(Question.objects.extra(
-            select={
-                'user_favourite_id': (
-                    'SELECT id FROM soclone_favouritequestion '
-                    'WHERE question_id = soclone_question.id '
-                      'AND user_id = %s'),
-            },
-            select_params=[request.user.id]
-        ), id=question_id)
-        favourite = (question.user_favourite_id is not None)
+    etag, response = stamps.check(request, stamps.question_stamp,
+                                  question_id)
+    if response is not None:
+        return response
+    question = get_object_or_404(replica.route(Question.objects.all()),
+                                 id=question_id)
+    if question.deleted and not auth.can_delete_post(request.user, question):
+        raise Http404
 
     if 'showcomments' in request.GET:
         return question_comments(request, question)
@@ -138,11 +180,15 @@ def question(request, question_id):
     if answer_sort_type not in ANSWER_SORT:
         answer_sort_type = DEFAULT_ANSWER_SORT
     order_by = ANSWER_SORT[answer_sort_type]
-    paginator = Paginator(Answer.objects.for_question(
-                              question, request.user).order_by(*order_by),
+    paginator = Paginator(replica.route(Answer.objects.for_question(
+                              question, request.user).order_by(*order_by)),
                           AUTO_WIKI_ANSWER_COUNT)
-    # Save ourselves a COUNT() query by using the denormalised count
+    # Save ourselves a COUNT() query by using the denormalised count, which
+    # doesn't include the deleted Answers the User may be able to see.
     paginator._count = question.answer_count
+    if request.user.is_authenticated():
+        paginator._count += Answer.objects.filter(question=question,
+            deleted=True, deleted_by=request.user).count()
     page = get_page(request, paginator)
     answers = page.object_list
 
@@ -152,27 +198,66 @@ def question(request, question_id):
          ),
          fields=('username', 'gravatar', 'reputation', 'gold', 'silver',
                  'bronze'))
-
-    # Look up vote status for the current user
-    question_vote, answer_votes = Vote.objects.get_for_question_and_answers(
-        request.user, question, page.object_list)
+    cards.cache_cards([post.author for post in itertools.chain((question,),
+                                                               answers)])
+
+    # Look up vote and favourite status for the current user
+    state = interaction.get_state(request.user, question.id)
+    answer_votes = collections.defaultdict(lambda: None,
+                                           state['answer_votes'])
+
+    related_questions = []
+    for related in replica.route(RelatedQuestion.objects.filter(
+            question=question, related__deleted=False)).values(
+            'related__id', 'related__title', 'related__score')[
+            :settings.RELATED_QUESTION_COUNT]:
+        related_questions.append({
+            'title': related['related__title'],
+            'score': related['related__score'],
+            'url': '%s%s/' % (reverse('question',
+                                      args=[related['related__id']]),
+                              slugify(related['related__title'])),
+        })
 
     title = question.title
     if question.closed:
         title = '%s [closed]' % title
-    return render_to_response('question.html', {
+    return stamps.set_etag(render_to_response('question.html', {
         'title': title,
         'question': question,
-        'question_vote': question_vote,
-        'favourite': favourite,
+        'question_vote': state['question_vote'],
+        'favourite': state['favourite'],
         'answers': page.object_list,
         'answer_votes': answer_votes,
         'page': page,
         'answer_sort': answer_sort_type,
         'answer_form': AddAnswerForm(),
         'tags': question.tags.all(),
+        'related_questions': related_questions,
+    }, context_instance=RequestContext(request)), etag)
+
+def question_timeline(request, question_id):
+    """Displays recent Activity in a Question."""
+    question = get_object_or_404(Question, id=question_id, deleted=False)
+    timeline, next_before = activity.get_timeline(
+        Activity.objects.filter(question=question), _get_before(request),
+        viewer=request.user)
+    return render_to_response('question_timeline.html', {
+        'title': u'Timeline for %s' % question.title,
+        'question': question,
+        'timeline': timeline,
+        'next_before': next_before,
     }, context_instance=RequestContext(request))
 
+def question_state(request, question_id):
+    """
+    Retrieves the current user's votes on a Question and its Answers and
+    whether or not they have favourited the Question.
+    """
+    if not request.user.is_authenticated():
+        raise Http404
+    return JsonResponse(interaction.get_state(request.user, int(question_id)))
+
 def question_comments(request, question, form=None):
     """
     Displays a Question and any Comments on it.
@@ -202,16 +287,28 @@ def question_comments(request, question, form=None):
     }, context_instance=RequestContext(request))
 
 def ask_question(request):
-    """Adds a Question."""
+    """
+    Adds a Question.
+
+    If the Question looks like a duplicate of any existing Questions, they
+    are displayed and the user must confirm that it isn't a duplicate
+    before it will be added.
+    """
     preview = None
+    duplicates = []
     if request.method == 'POST':
         form = AskQuestionForm(request.POST)
         if form.is_valid():
             html = sanitize_html(markdowner.convert(form.cleaned_data['text']))
+            if ('submit' in request.POST and
+                not form.cleaned_data['not_duplicate']):
+                # Make the user confirm they're not asking a duplicate
+                duplicates = _duplicate_questions(form.cleaned_data['title'],
+                                                  html)
             if 'preview' in request.POST:
                 # The user submitted the form to preview the formatted question
                 preview = mark_safe(html)
-            elif 'submit' in request.POST:
+            elif 'submit' in request.POST and not duplicates:
                 added_at = datetime.datetime.now()
                 # Create the Question
                 question = Question(
@@ -242,6 +339,9 @@ def ask_question(request):
                     summary    = u'asked question',
                     text       = form.cleaned_data['text']
                 )
+                activity.record(Activity.ASKED, request.user.id, question,
+                                question.id, added_at)
+                feeds.invalidate_question(question)
                 # TODO Badges related to Tag usage
                 # TODO Badges related to asking Questions
                 return HttpResponseRedirect(question.get_absolute_url())
@@ -251,8 +351,60 @@ def ask_question(request):
         'title': u'Ask a Question',
         'form': form,
         'preview': preview,
+        'duplicates': duplicates,
     }, context_instance=RequestContext(request))
 
+def _duplicate_questions(title, html, exclude_id=None):
+    """
+    Finds Questions which may be duplicates of a Question with the given
+    title and HTML, returning their titles and URLs.
+    """
+    return [{
+        'title': duplicate_title,
+        'url': '%s%s/' % (reverse('question', args=[id]),
+                          slugify(duplicate_title)),
+    } for id, duplicate_title, matches in
+      DuplicateBucket.objects.find_candidates(title, html, exclude_id)]
+
+def duplicate_questions(request):
+    """
+    Finds Questions which may be duplicates of a Question with the given
+    title and text while it's being asked.
+    """
+    if request.method != 'POST':
+        raise Http404
+    title = request.POST.get('title', u'')
+    text = request.POST.get('text', u'')
+    if not title.strip():
+        return JsonResponse({'success': True, 'questions': []})
+    try:
+        html = render_preview(text)
+    except PreviewTooLong:
+        return JsonResponse({'success': False, 'errors': {
+            'text': [u'Text may be no more than %s characters long.' %
+                     settings.PREVIEW_MAX_LENGTH],
+        }})
+    return JsonResponse({
+        'success': True,
+        'questions': _duplicate_questions(title, html),
+    })
+
+def preview(request):
+    """
+    Renders a preview of Markdown-formatted text for display while a
+    Question or Answer is being written or edited.
+    """
+    if request.method != 'POST':
+        raise Http404
+    try:
+        html = render_preview(request.POST.get('text', u''))
+    except PreviewTooLong:
+        return JsonResponse({'success': False, 'errors': {
+            'text': [u'Text may be no more than %s characters long.' %
+                     settings.PREVIEW_MAX_LENGTH],
+        }})
+    return JsonResponse({'success': True, 'html': html})
+
 def edit_question(request, question_id):
     """
     Entry point for editing a question.
@@ -326,10 +478,24 @@ def _edit_question(request, question):
                             updated_fields['wikified_at'] = edited_at
                         Question.objects.filter(
                             id=question.id).update(**updated_fields)
-                        # Update the Question's tag associations
+                        title_changed = (question.title !=
+                                         updated_fields['title'])
+                        question.title = updated_fields['title']
+                        previous_tagnames = question.tagnames
+                        # Update the Question's tag associations, which
+                        # also updates its related Questions.
                         if tags_changed:
                             tags_updated = Question.objects.update_tags(
-                                question, question.tagnames, request.user)
+                                question, updated_fields['tagnames'],
+                                request.user)
+                        if not tags_updated and title_changed:
+                            question.tagnames = updated_fields['tagnames']
+                            RelatedQuestion.objects.update_for_question(
+                                question)
+                        if (title_changed or
+                            latest_revision.text != form.cleaned_data['text']):
+                            DuplicateBucket.objects.update_for_question(
+                                question.id, updated_fields['title'], html)
                         # Create a new revision
                         revision = QuestionRevision(
                             question   = question,
@@ -347,8 +513,15 @@ def _edit_question(request, question):
                                     latest_revision, revision,
                                     ('wiki' in updated_fields))
                         revision.save()
-                        # TODO 5 body edits by the author = automatic wiki mode
-                        # TODO 4 individual editors = automatic wiki mode
+                        PostEditor.objects.record_edit(question, request.user,
+                            latest_revision.text != form.cleaned_data['text'])
+                        PostEditor.objects.wikify_if_edited(question,
+                            AUTO_WIKI_AUTHOR_EDIT_COUNT,
+                            AUTO_WIKI_EDITOR_COUNT, edited_at)
+                        activity.record(Activity.EDITED, request.user.id,
+                                        question, question.id, edited_at)
+                        question.tagnames = updated_fields['tagnames']
+                        feeds.invalidate_question(question, previous_tagnames)
                         # TODO Badges related to Tag usage
                         # TODO Badges related to editing Questions
                     return HttpResponseRedirect(question.get_absolute_url())
@@ -384,6 +557,7 @@ def _retag_question(request, question):
             if form.has_changed():
                 latest_revision = question.get_latest_revision()
                 retagged_at = datetime.datetime.now()
+                previous_tagnames = question.tagnames
                 # Update the Question itself
                 Question.objects.filter(id=question.id).update(
                     tagnames         = form.cleaned_data['tags'],
@@ -405,6 +579,14 @@ def _retag_question(request, question):
                     summary    = u'modified tags',
                     text       = latest_revision.text
                 )
+                PostEditor.objects.record_edit(question, request.user, False)
+                PostEditor.objects.wikify_if_edited(question,
+                    AUTO_WIKI_AUTHOR_EDIT_COUNT, AUTO_WIKI_EDITOR_COUNT,
+                    retagged_at)
+                activity.record(Activity.EDITED, request.user.id, question,
+                                question.id, retagged_at)
+                question.tagnames = form.cleaned_data['tags']
+                feeds.invalidate_question(question, previous_tagnames)
                 # TODO Badges related to retagging / Tag usage
                 # TODO Badges related to editing Questions
             return HttpResponseRedirect(question.get_absolute_url())
@@ -495,7 +677,40 @@ def _reopen_question(request, question):
 
 def delete_question(request, question_id):
     """Deletes or undeletes a Question."""
-    raise NotImplementedError
+    question = get_object_or_404(Question, id=question_id)
+    if not auth.can_delete_post(request.user, question):
+        raise Http404
+    return _delete_post(request, question, Question.objects)
+
+def _delete_post(request, post, manager):
+    """
+    Deletes or undeletes a Question or Answer based on its current deleted
+    status, after confirmation.
+    """
+    action = post.deleted and 'undelete' or 'delete'
+    if request.method == 'POST' and action in request.POST:
+        if post.deleted:
+            manager.undelete(post)
+        else:
+            manager.soft_delete(post, request.user)
+        if isinstance(post, Question):
+            feeds.invalidate_question(post)
+        else:
+            feeds.invalidate_answer(post)
+        if request.is_ajax():
+            return JsonResponse({'success': True})
+        else:
+            return HttpResponseRedirect(post.get_absolute_url())
+    elif request.is_ajax():
+        raise Http404
+    return render_to_response('delete_post.html', {
+        'title': u'%s %s' % (action.capitalize(),
+                             post._meta.verbose_name.capitalize()),
+        'post': post,
+        'post_type': post._meta.verbose_name,
+        'action': action,
+        'delete_url': request.path,
+    }, context_instance=RequestContext(request))
 
 def favourite_question(request, question_id):
     """
@@ -512,6 +727,7 @@ def favourite_question(request, question_id):
         user=request.user, question=question)
     if not created:
         favourite.delete()
+    interaction.record_favourite(request.user.id, question.id, created)
 
     if request.is_ajax():
         return JsonResponse({'success': True, 'favourited': created})
@@ -526,7 +742,7 @@ def add_answer(request, question_id):
     its Answers will enter wiki mode and all subsequent Answers will be in
     wiki mode.
     """
-    question = get_object_or_404(Question, id=question_id)
+    question = get_object_or_404(Question, id=question_id, deleted=False)
     preview = None
     if request.method == 'POST':
         form = AddAnswerForm(request.POST)
@@ -561,10 +777,18 @@ def add_answer(request, question_id):
                     summary    = u'added answer',
                     text       = form.cleaned_data['text']
                 )
-                Question.objects.update_answer_count(question)
+                Question.objects.adjust_answer_count(question.id, 1)
+                # Put the Question and all its Answers into wiki mode once
+                # it has enough Answers.
+                Question.objects.wikify(question.id, added_at,
+                                        AUTO_WIKI_ANSWER_COUNT)
+                activity.record(Activity.ANSWERED, request.user.id, answer,
+                                question.id, added_at)
+                feeds.invalidate_answer(answer)
+                if question.author_id != request.user.id:
+                    notifications.notify(question.author_id,
+                        Notification.NEW_ANSWER, answer, question.id, added_at)
                 # TODO Badges related to answering Questions
-                # TODO If this is answer 30, put question and all answers into
-                #      wiki mode.
                 # TODO Redirect needs to handle paging
                 return HttpResponseRedirect(question.get_absolute_url())
     else:
@@ -665,8 +889,13 @@ def edit_answer(request, answer_id):
                                     latest_revision, revision,
                                     ('wiki' in updated_fields))
                         revision.save()
-                        # TODO 5 body edits by the asker = automatic wiki mode
-                        # TODO 4 individual editors = automatic wiki mode
+                        PostEditor.objects.record_edit(answer, request.user)
+                        PostEditor.objects.wikify_if_edited(answer,
+                            AUTO_WIKI_AUTHOR_EDIT_COUNT,
+                            AUTO_WIKI_EDITOR_COUNT, edited_at)
+                        activity.record(Activity.EDITED, request.user.id,
+                                        answer, answer.question_id, edited_at)
+                        feeds.invalidate_answer(answer)
                         # TODO Badges related to editing Answers
                     return HttpResponseRedirect(answer.get_absolute_url())
     else:
@@ -709,12 +938,41 @@ def answer_revisions(request, answer_id):
     }, context_instance=RequestContext(request))
 
 def accept_answer(request, answer_id):
-    """Marks an Answer as accepted."""
-    raise NotImplementedError
+    """
+    Marks an Answer as accepted, or withdraws acceptance if it's already
+    accepted.
+
+    Only one Answer to a Question may be accepted at a time.
+    """
+    if request.method != 'POST':
+        raise Http404
+
+    answer = get_object_or_404(Answer, id=answer_id, deleted=False)
+    question = answer.question
+    if not auth.can_accept_answer(request.user, question):
+        raise Http404
+
+    accepted = not answer.accepted
+    if accepted:
+        Answer.objects.filter(question=question,
+                              accepted=True).update(accepted=False)
+    Answer.objects.filter(id=answer.id).update(accepted=accepted)
+    Question.objects.filter(id=question.id).update(answer_accepted=accepted)
+    Question.objects.update_unanswered(question.id)
+    # TODO Reputation management
+    # TODO Badges related to accepted Answers
+
+    if request.is_ajax():
+        return JsonResponse({'success': True, 'accepted': accepted})
+    else:
+        return HttpResponseRedirect(question.get_absolute_url())
 
 def delete_answer(request, answer_id):
     """Deletes or undeletes an Answer."""
-    raise NotImplementedError
+    answer = get_object_or_404(Answer, id=answer_id)
+    if not auth.can_delete_post(request.user, answer):
+        raise Http404
+    return _delete_post(request, answer, Answer.objects)
 
 def vote(request, model, object_id):
     """
@@ -747,12 +1005,17 @@ def vote(request, model, object_id):
                             object_id=object_id,
                             user=request.user,
                             vote=vote_type)
+        interaction.record_vote(request.user.id, obj, vote_type)
+        _record_vote_activity(request.user, obj)
     else:
         if vote_type == existing_vote.vote:
+            # Deletion invalidates the user's cached interaction state
             existing_vote.delete()
         else:
             existing_vote.vote = vote_type
             existing_vote.save()
+            interaction.record_vote(request.user.id, obj, vote_type)
+            _record_vote_activity(request.user, obj)
 
     # TODO Reputation management
 
@@ -765,23 +1028,174 @@ def vote(request, model, object_id):
     else:
         return HttpResponseRedirect(obj.get_absolute_url())
 
+def _question_id(post):
+    """Returns the id of the Question a Question or Answer belongs to."""
+    if isinstance(post, Question):
+        return post.id
+    return post.question_id
+
+def _record_vote_activity(user, post):
+    """Records a User voting on a Question or Answer as an Activity."""
+    activity.record(Activity.VOTED, user.id, post, _question_id(post))
+
 def flag_item(request, model, object_id):
-    """Flag a Question or Answer as containing offensive content."""
-    raise NotImplementedError
+    """
+    Flag a Question or Answer as containing offensive content.
+
+    Flagging requires confirmation, as it can't be undone by the user.
+    """
+    if not auth.can_flag_offensive(request.user):
+        raise Http404
+    obj = get_object_or_404(model, id=object_id, deleted=False)
+    content_type = ContentType.objects.get_for_model(model)
+    if request.method == 'POST' and 'flag' in request.POST:
+        errors = []
+        if obj.author_id == request.user.id:
+            errors.append(u'You may not flag your own posts.')
+        elif FlaggedItem.objects.filter(content_type=content_type,
+                                        object_id=obj.id,
+                                        user=request.user).count():
+            errors.append(u'You have already flagged this post.')
+        else:
+            FlaggedItem.objects.create(content_type=content_type,
+                                       object_id=obj.id, user=request.user)
+        if request.is_ajax():
+            return JsonResponse({'success': not errors, 'errors': errors})
+        else:
+            return HttpResponseRedirect(obj.get_absolute_url())
+    elif request.is_ajax():
+        raise Http404
+    return render_to_response('flag_item.html', {
+        'title': u'Flag as Offensive',
+        'post': obj,
+        'post_type': model._meta.verbose_name,
+        'flag_url': request.path,
+    }, context_instance=RequestContext(request))
+
+def moderation_queue(request):
+    """
+    Lists Questions and Answers which have been flagged as offensive,
+    highest priority first.
+    """
+    if not auth.can_view_offensive_flags(request.user):
+        raise Http404
+    paginator = Paginator(ModerationQueueItem.objects.extra(
+        where=['NOT soclone_moderationqueueitem.resolved']), 50)
+    page = get_page(request, paginator)
+    items = list(page.object_list)
+
+    # Look up details of the flagged posts with a query per post type
+    question_type = ContentType.objects.get_for_model(Question)
+    answer_type = ContentType.objects.get_for_model(Answer)
+    questions = dict([(q['id'], q) for q in Question.objects.filter(
+        id__in=[item.object_id for item in items
+                if item.content_type_id == question_type.id]).values(
+        'id', 'title', 'deleted')])
+    answers = dict([(a['id'], a) for a in Answer.objects.filter(
+        id__in=[item.object_id for item in items
+                if item.content_type_id == answer_type.id]).values(
+        'id', 'question__title', 'deleted')])
+    for item in items:
+        if item.content_type_id == question_type.id:
+            post = questions.get(item.object_id)
+            if post is not None:
+                item.post_title = post['title']
+                item.post_url = '%s%s/' % (reverse('question',
+                                                   args=[item.object_id]),
+                                           slugify(post['title']))
+        else:
+            post = answers.get(item.object_id)
+            if post is not None:
+                item.post_title = post['question__title']
+                item.post_url = reverse('answer', args=[item.object_id])
+        item.post_deleted = post is not None and post['deleted']
+
+    return render_to_response('moderation_queue.html', {
+        'title': u'Flagged Posts',
+        'items': items,
+        'page': page,
+    }, context_instance=RequestContext(request))
+
+def resolve_moderation_item(request, item_id):
+    """
+    Removes a flagged post from the moderation queue until it is flagged
+    again.
+    """
+    if (request.method != 'POST' or
+        not auth.can_view_offensive_flags(request.user)):
+        raise Http404
+    ModerationQueueItem.objects.filter(id=item_id).update(resolved=True)
+    if request.is_ajax():
+        return JsonResponse({'success': True})
+    else:
+        return HttpResponseRedirect(reverse('moderation_queue'))
+
+def profiles(request):
+    """
+    Lists saved profiles of requests, newest first, along with a token
+    which can be used to profile requests.
+    """
+    if not auth.can_view_profiles(request.user):
+        raise Http404
+    details = []
+    for profile_id in profiling.profile_ids():
+        profile_details = profiling.get_details(profile_id)
+        if profile_details is not None:
+            details.append(profile_details)
+    return render_to_response('profiles.html', {
+        'title': u'Profiles',
+        'profiles': details,
+        'token': profiling.create_token(),
+        'token_seconds': settings.PROFILE_TOKEN_SECONDS,
+    }, context_instance=RequestContext(request))
+
+def profile(request, profile_id):
+    """Displays the functions which took the most time in a profile."""
+    if not auth.can_view_profiles(request.user):
+        raise Http404
+    details = profiling.get_details(profile_id)
+    if details is None:
+        raise Http404
+    sort = request.GET.get('sort', profiling.SORT_ORDERS[0])
+    if sort not in profiling.SORT_ORDERS:
+        sort = profiling.SORT_ORDERS[0]
+    return render_to_response('profile.html', {
+        'title': u'Profile of %s' % details['path'],
+        'profile': details,
+        'sort': sort,
+        'sort_orders': profiling.SORT_ORDERS,
+        'stats': profiling.top_functions(profile_id, sort),
+    }, context_instance=RequestContext(request))
+
+def download_profile(request, profile_id):
+    """Downloads a profile for use with pstats and other tools."""
+    if (not auth.can_view_profiles(request.user) or
+        profiling.get_details(profile_id) is None):
+        raise Http404
+    response = HttpResponse(profiling.get_data(profile_id),
+                            mimetype='application/octet-stream')
+    response['Content-Disposition'] = ('attachment; filename=%s.prof' %
+                                       profile_id)
+    return response
 
 def add_comment(request, model, object_id):
     """Adds a comment to a Question or Answer."""
-    obj = get_object_or_404(model, id=object_id)
+    obj = get_object_or_404(model, id=object_id, deleted=False)
     if request.method == "POST":
         form = CommentForm(request.POST)
         if form.is_valid():
-            Comment.objects.create(
+            comment = Comment.objects.create(
                 content_type = ContentType.objects.get_for_model(model),
                 object_id    = object_id,
                 author       = request.user,
                 added_at     = datetime.datetime.now(),
                 comment      = form.cleaned_data['comment']
             )
+            activity.record(Activity.COMMENTED, request.user.id, comment,
+                            _question_id(obj), comment.added_at)
+            if obj.author_id != request.user.id:
+                notifications.notify(obj.author_id, Notification.NEW_COMMENT,
+                    comment, _question_id(obj), comment.added_at)
             if request.is_ajax():
                 return JsonResponse({'success': True})
             else:
@@ -813,7 +1227,7 @@ def tags(request):
     sort_type = request.GET.get('sort', DEFAULT_TAG_SORT)
     if sort_type not in TAG_SORT:
         sort_type = DEFAULT_TAG_SORT
-    tags = Tag.objects.all().order_by(*TAG_SORT[sort_type])
+    tags = replica.route(Tag.objects.all()).order_by(*TAG_SORT[sort_type])
     name_filter = request.GET.get('filter', '')
     if name_filter:
         tags = tags.filter(name__icontains=name_filter)
@@ -829,13 +1243,32 @@ def tags(request):
 
 def tag(request, tag_name):
     """Displayed Questions for a Tag."""
-    raise NotImplementedError
+    tag = get_object_or_404(replica.route(Tag.objects.all()), name=tag_name)
+    return question_list(request, tagged_question_views(tag), 'tag.html',
+                         extra_context={
+                             'title': u"Questions tagged '%s'" % tag.name,
+                             'tag': tag,
+                             'related_tags': related_tags([tag.name]),
+                         })
+
+def related_tags_json(request):
+    """
+    Retrieves the Tags most often used along with a space-separated list
+    of Tag names.
+    """
+    tagnames = request.GET.get('tags', u'').split()
+    return JsonResponse({
+        'success': True,
+        'tags': [{'name': name, 'count': score}
+                 for name, score in related_tags(tagnames)],
+    })
 
 USER_SORT = {
     'reputation': ('-reputation', '-date_joined'),
     'newest': ('-date_joined',),
     'oldest': ('date_joined',),
     'name': ('username',),
+    'active': ('-last_seen',),
 }
 
 DEFAULT_USER_SORT = 'reputation'
@@ -845,7 +1278,8 @@ def users(request):
     sort_type = request.GET.get('sort', DEFAULT_USER_SORT)
     if sort_type not in USER_SORT:
         sort_type = DEFAULT_USER_SORT
-    users = User.objects.all().order_by(*USER_SORT[sort_type])
+    users = replica.route(User.objects.all()).order_by(
+        *USER_SORT[sort_type])
     name_filter = request.GET.get('filter', '')
     if name_filter:
         users = users.filter(username__icontains=name_filter)
@@ -861,21 +1295,69 @@ def users(request):
         'filter': name_filter,
     }, context_instance=RequestContext(request))
 
+def _get_before(request):
+    """
+    Gets the id of the Activity to start a page of a timeline after, or
+    ``None`` for the first page.
+    """
+    try:
+        return int(request.GET['before'])
+    except (KeyError, ValueError):
+        return None
+
 def user(request, user_id):
     """Displays a User and various information about them."""
-    raise NotImplementedError
+    user = get_object_or_404(User, id=user_id)
+    timeline, next_before = activity.get_timeline(
+        Activity.objects.filter(user=user), _get_before(request),
+        viewer=request.user)
+    return render_to_response('user.html', {
+        'title': user.username,
+        'profile': user,
+        'timeline': timeline,
+        'next_before': next_before,
+    }, context_instance=RequestContext(request))
+
+def user_notifications(request):
+    """
+    Lists the current User's Notifications, newest first.
+
+    Submitting the list marks the Notifications with the given ids as
+    read, or all of them if no ids are given.
+    """
+    if not request.user.is_authenticated():
+        raise Http404
+    if request.method == 'POST':
+        ids = [int(notification_id) for notification_id
+               in request.POST.getlist('id') if notification_id.isdigit()]
+        marked = notifications.mark_read(request.user.id, ids or None)
+        if request.is_ajax():
+            return JsonResponse({
+                'success': True,
+                'marked': marked,
+                'unread': notifications.unread_count(request.user),
+            })
+        return HttpResponseRedirect(reverse('notifications'))
+    paginator = Paginator(Notification.objects.filter(user=request.user), 30)
+    page = get_page(request, paginator)
+    return render_to_response('notifications.html', {
+        'title': u'Notifications',
+        'notifications': notifications.describe(page.object_list),
+        'page': page,
+    }, context_instance=RequestContext(request))
 
 def badges(request):
     """Badge list."""
     return render_to_response('badges.html', {
         'title': u'Badges',
-        'badges': Badge.objects.all(),
+        'badges': replica.route(Badge.objects.all()),
     }, context_instance=RequestContext(request))
 
 def badge(request, badge_id):
     """Displays a Badge and any Users who have recently been awarded it."""
-    badge = get_object_or_404(Badge, id=badge_id)
-    awarded_to = badge.awarded_to.all().order_by('-award__awarded_at').values(
+    badge = get_object_or_404(replica.route(Badge.objects.all()), id=badge_id)
+    awarded_to = replica.route(badge.awarded_to.all()).order_by(
+        '-award__awarded_at').values(
         'id', 'username', 'reputation', 'gold', 'silver', 'bronze')[:500]
     return render_to_response('badge.html', {
         'title': '%s Badge' % badge.name,